@@ -8,6 +8,9 @@ import "../events/EventsInterface.sol";
 //import "../identity/Identity.sol";
 import "../tokens/ERC1155.sol";
 import "../tokens/IERC20.sol";
+import "../tokens/IERC20Permit.sol";
+import "./EventsLibrary.sol";
+import "./PurchaseChecks.sol";
 
 /**
  * @title EventMasterService
@@ -22,22 +25,17 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
     uint256 basicPointFees = 0;
     uint256 basicPointGaslessPremium = 0;
 
-    struct SectionData {
-        uint16 size;
-        uint256 price;
-        mapping(uint16 => bool) wasSold;
-    }
-    struct EventData {
-        address owner;
-        uint256 funds;
-        uint256 platform;
-        uint16 numberOfSections;
-        uint16 totalSeats;
-        uint256 startSellingDate;
-        uint256 startWithdrawalDate;
-        mapping(uint16 => SectionData) sectionDataMap;
-    }
-    mapping (uint32 => EventData) eventDataMap;
+    // Bytes per seat on packed purchases: uint16 sectionID + uint16 seatID.
+    uint256 constant PACKED_SEAT_SIZE = 4;
+    // Bytes per range on packed purchases: uint16 sectionID + uint16 firstSeatID + uint16 count.
+    uint256 constant PACKED_RANGE_SIZE = 6;
+
+    // Dates are stored in 40 bits (enough until year 36812), prices in 128 bits.
+    uint256 constant MAX_DATE = 2**40 - 1;
+    uint256 constant MAX_PRICE = 2**128 - 1;
+
+    // Event records, see EventStorage for their layout.
+    mapping (uint32 => EventStorage.EventData) eventDataMap;
 
     mapping (uint256 => uint256) platformFeesCollected;
 
@@ -72,10 +70,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param seatID Specific seatID we want to calculate ticketID for
      */
     function getTicketID(uint32 eventID, uint16 sectionID, uint16 seatID) public pure returns(uint256) {
-        uint256 ret = 0;
-        ret = uint256(eventID) << 32;
-        ret = (ret | (uint256(sectionID) * (2**16)) ) | uint256(seatID);
-        return ret;
+        return TicketIDs.encode(eventID, sectionID, seatID);
     }
 
     /**
@@ -83,7 +78,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param ticketID Specific ticketID we want get eventID.
      */
     function getEventIDFromTicketID(uint256 ticketID) public pure returns(uint32) {
-        return uint32(ticketID >> 32);
+        return TicketIDs.eventOf(ticketID);
     }
 
     /**
@@ -91,7 +86,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param ticketID Specific ticketID we want get sectionID.
      */
     function getSectionIDFromTicketID(uint256 ticketID) public pure returns(uint16) {
-        return uint16((ticketID & 0xffff0000) >> 16);
+        return TicketIDs.sectionOf(ticketID);
     }
 
     /**
@@ -99,7 +94,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param ticketID Specific ticketID we want get seatID.
      */
     function getSeatIDFromTicketID(uint256 ticketID) public pure returns(uint16) {
-        return uint16((ticketID & 0xffff));
+        return TicketIDs.seatOf(ticketID);
     }
 
     ///////////////////////////////////////////////////////////
@@ -110,19 +105,21 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @dev Mutator method, changes state.
      * @param platID Specific identity and permissions platform that will cater this event
      */
-    function createEvent(uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate) external feeless returns(uint256) {
-        require(identityMaster.existsPlatform(platID), "Identity platform has not been registered before.");
-
-        uint256 identity = identityMaster.resolveIdentityOnPlatform(platID, msgSender);
-
-        require(identityMaster.canCreateEventOnPlatform(platID, identity),
-            "Ident. of sender has no permission to create event on this ticket platform.");
-
-        uint32 newId = nextNewEventId;
-        nextNewEventId++;
+    function createEvent(uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate) external returns(uint256) {
+        return newEvent(platID, startSellingDate, startWithdrawalDate);
+    }
 
-        eventDataMap[newId] = EventData(msgSender, 0, platID, 0, 0, startSellingDate, startWithdrawalDate);
-        return newId;
+    /**
+     * @dev Mutator method, same as createEvent() followed by addSectionsBatch(), a whole venue in one tx.
+     * @param platID Specific identity and permissions platform that will cater this event
+     * @param sizes Number of seats of each new section
+     * @param prices Cost (in tokens) of a seat of each new section, same length as sizes
+     */
+    function createEventWithSections(uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate,
+                                     uint16[] memory sizes, uint256[] memory prices) public returns(uint256) {
+        uint32 eventID = newEvent(platID, startSellingDate, startWithdrawalDate);
+        addSections(eventID, sizes, prices);
+        return eventID;
     }
 
     /**
@@ -131,77 +128,68 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param size Number of seats in this section
      * @param price Cost (in tokens) of a seat in this section, all seats in section has the same
      */
-    function addSection(uint32 eventID, uint16 size, uint256 price ) external feeless returns(uint16) {
+    function addSection(uint32 eventID, uint16 size, uint256 price ) external returns(uint16) {
         require(existsEvent(eventID), "EventID does not exists.");
-        require(msgSender == eventDataMap[eventID].owner, "Only event owner can add sections.");
+        require(_msgSender() == eventDataMap[eventID].owner, "Only event owner can add sections.");
+        require(price <= MAX_PRICE, "Section price must fit in 128 bits.");
 
-        // Check max seats for this ticketing platform.
-        // Check if sender has permission to buy tickets.
-        uint256 platID = eventDataMap[eventID].platform;
-        uint256 maxSeats = identityMaster.resolveMaxSeatsForPlatform(platID);
-        require( eventDataMap[eventID].totalSeats + size <= maxSeats,
-            "Too many seats for this ticket platform on this event.");
+        EventStorage.EventData storage eventData = eventDataMap[eventID];
+        require(uint256(eventData.numberOfSections) + 1 < 2**16, "Too many sections on this event.");
+        uint256 totalSeats = uint256(eventData.totalSeats) + size;
+        checkMaxSeats(eventData, totalSeats);
 
-        eventDataMap[eventID].numberOfSections++;
-        uint16 eventSection = eventDataMap[eventID].numberOfSections;
+        // Both counters share the owner slot, and size and price share the section slot.
+        uint16 eventSection = eventData.numberOfSections + 1;
+        eventData.numberOfSections = eventSection;
+        eventData.totalSeats = uint16(totalSeats);
 
-        SectionData memory sectionData;
-        sectionData.size = size;
-        sectionData.price = price;
-        eventDataMap[eventID].sectionDataMap[eventSection] = sectionData;
-        eventDataMap[eventID].totalSeats += size;
+        EventStorage.SectionData storage section = eventData.sectionDataMap[eventSection];
+        section.size = size;
+        section.price = uint128(price);
 
         return eventSection;
     }
 
+    /**
+     * @dev Mutator method, adds several sections to an event checking the platform max seats once.
+     *      Sections are numbered consecutively, returns the sectionID of the last one.
+     * @param eventID Specific event the sections will belong to
+     * @param sizes Number of seats of each new section
+     * @param prices Cost (in tokens) of a seat of each new section, same length as sizes
+     */
+    function addSectionsBatch(uint32 eventID, uint16[] memory sizes, uint256[] memory prices) public returns(uint16) {
+        require(existsEvent(eventID), "EventID does not exists.");
+        require(_msgSender() == eventDataMap[eventID].owner, "Only event owner can add sections.");
+
+        return addSections(eventID, sizes, prices);
+    }
+
     /**
      * @dev Mutator method, must call previously approve() token method to give the allowance to collect the token here.
      * @param eventID Specific event we want to buy
      * @param sectionID Specific section of the buy
      * @param seatID Specific seatID of the event we want to buy
      */
-    function buyTicketWithTokens(uint32 eventID, uint16 sectionID, uint16 seatID) external feeless returns(uint256) {
-        require(existsEvent(eventID), "EventID does not exists.");
-        require(sectionID > 0 && sectionID <= numberOfSections(eventID), "SectionID does not exists for this event.");
-        require(seatID > 0 && seatID <= sectionSize(eventID,sectionID), "SeatID does not exists for this event and section.");
-
-        // Check start of selling date.
-        require(block.timestamp >= eventDataMap[eventID].startSellingDate,
-                "Event has not reached the start of ticket selling date.");
-    
-        // Check if sender has permission to buy tickets.
-        uint256 platID = eventDataMap[eventID].platform;
-        uint256 identity = identityMaster.resolveIdentityOnPlatform(platID, msgSender);
-
-        require(identityMaster.canBuyTicketOnPlatform(platID, identity),
-            "Identity of sender has no permission to buy tickets on this ticket platform.");
-
-        uint256 ticketID = getTicketID(eventID, sectionID, seatID);
-
-        require(eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] == false, "Ticket has already been sold.");
-
-        // Resolve type of token per user.
-        address token = identityMaster.resolveCurrencyForPlatform(platID);
-        IERC20 tokenContract = IERC20(token);
-        uint256 allowance = tokenContract.allowance(msgSender,address(this));
-        uint256 sectPriceWithFees = sectionPrice(eventID, sectionID) + sectionFee(eventID, sectionID);
-
-        require(allowance >= sectPriceWithFees, "Not enough tokens provided in tx to buy the ticket plus fees.");
-
-        // Combining eventId+sectionId+seatId we get a ticketId
-        eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] = true;
-        eventDataMap[eventID].funds += sectionPrice(eventID, sectionID);
-        platformFeesCollected[platID] += sectionFee(eventID, sectionID);
-
-        balances[ticketID][msgSender] = 1;
-
-        // Recieve tokens.
-        require(tokenContract.transferFrom(msgSender, address(this), sectPriceWithFees),
-            "Not enough balance to transfer this amount of tokens.");
-
-        emit ReceivedTokens(msgSender, sectPriceWithFees, token);
+    function buyTicketWithTokens(uint32 eventID, uint16 sectionID, uint16 seatID) external returns(uint256) {
+        return buyTicket(eventID, sectionID, seatID);
+    }
 
-        return ticketID;
+    /**
+     * @dev Mutator method, same as buyTicketWithTokens() but the allowance is given in the same tx with an
+     *      EIP-2612 permit signature of the buyer for this contract, no previous approve() tx is needed.
+     * @param eventID Specific event we want to buy
+     * @param sectionID Specific section of the buy
+     * @param seatID Specific seatID of the event we want to buy
+     * @param value Allowance signed in the permit, at least price plus fees of the seat
+     * @param deadline Expiry timestamp signed in the permit
+     * @param v Recovery id of the permit signature
+     * @param r First 32 bytes of the permit signature
+     * @param s Second 32 bytes of the permit signature
+     */
+    function buyTicketWithPermit(uint32 eventID, uint16 sectionID, uint16 seatID,
+                                 uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) external returns(uint256) {
+        usePermit(eventID, value, deadline, v, r, s);
+        return buyTicket(eventID, sectionID, seatID);
     }
 
     /**
@@ -210,53 +198,95 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param sectionIDs Specific sections of the batch buy
      * @param seatIDs Specific seatIDs of the events we want to buy in this batch, same length as sectionIDs
      */
-    function buyTicketsBatchWithTokens(uint32 eventID, uint16[] calldata sectionIDs, uint16[] calldata seatIDs) external feeless {
+    function buyTicketsBatchWithTokens(uint32 eventID, uint16[] calldata sectionIDs, uint16[] calldata seatIDs) external {
         require(sectionIDs.length == seatIDs.length, "Section and Seat arrays must have the same length.");
-        require(existsEvent(eventID), "EventID does not exists.");
+        buyTicketsBatch(eventID, sectionIDs, seatIDs);
+    }
 
-        // Check start of selling date.
-        require(block.timestamp >= eventDataMap[eventID].startSellingDate, "Event has not reached the start of ticket selling date.");
+    /**
+     * @dev Mutator method, same as buyTicketsBatchWithTokens() but the allowance is given in the same tx
+     *      with an EIP-2612 permit signature of the buyer for this contract.
+     * @param eventID Specific event we want to buy
+     * @param sectionIDs Specific sections of the batch buy
+     * @param seatIDs Specific seatIDs of the events we want to buy in this batch, same length as sectionIDs
+     * @param value Allowance signed in the permit, at least price plus fees of all the seats
+     * @param deadline Expiry timestamp signed in the permit
+     * @param v Recovery id of the permit signature
+     * @param r First 32 bytes of the permit signature
+     * @param s Second 32 bytes of the permit signature
+     */
+    function buyTicketsBatchWithPermit(uint32 eventID, uint16[] memory sectionIDs, uint16[] memory seatIDs,
+                                       uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) public {
+        require(sectionIDs.length == seatIDs.length, "Section and Seat arrays must have the same length.");
+        usePermit(eventID, value, deadline, v, r, s);
+        buyTicketsBatch(eventID, sectionIDs, seatIDs);
+    }
 
-        // Check if sender has permission to buy tickets.
-        uint256 platID = eventDataMap[eventID].platform;
-        uint256 identity = identityMaster.resolveIdentityOnPlatform(platID, msgSender);
-        require(identityMaster.canBuyTicketOnPlatform(platID, identity),
-            "Identity of sender has no permission to buy tickets on this ticket platform.");
+    /**
+     * @dev Mutator method, same as buyTicketsBatchWithTokens() but with tightly packed calldata.
+     *      Each seat takes 4 bytes: 2 bytes big-endian sectionID followed by 2 bytes big-endian seatID.
+     * @param eventID Specific event we want to buy
+     * @param packedSeats Concatenated (sectionID, seatID) pairs, length must be a multiple of 4
+     */
+    function buyTicketsPackedWithTokens(uint32 eventID, bytes calldata packedSeats) external {
+        require(packedSeats.length > 0 && packedSeats.length % PACKED_SEAT_SIZE == 0,
+            "Packed seats length must be a non-zero multiple of 4 bytes.");
+        uint256 platID = checkOnSale(eventID);
 
         uint256 totalCost = 0;
         uint256 totalFees = 0;
-
-        for (uint i = 0; i < sectionIDs.length; i++) {
-            require(sectionIDs[i] > 0 && sectionIDs[i] <= numberOfSections(eventID), "SectionID does not exists for this event.");
-            require(seatIDs[i] > 0 && seatIDs[i] <= sectionSize(eventID,sectionIDs[i]),
-                "SeatID does not exists for this SectionID on this event.");
-            
-            uint256 ticketID = getTicketID(eventID, sectionIDs[i], seatIDs[i]);
-            require(eventDataMap[eventID].sectionDataMap[sectionIDs[i]].wasSold[seatIDs[i]] == false, "Ticket has already been sold.");
-            
-            totalCost += sectionPrice(eventID,sectionIDs[i]) + sectionFee(eventID,sectionIDs[i]);
-            totalFees += sectionFee(eventID,sectionIDs[i]);
-            
-            // combining eventId+sectionId+seatId we get a ticketId
-            eventDataMap[eventID].sectionDataMap[sectionIDs[i]].wasSold[seatIDs[i]] = true;
-            balances[ticketID][msgSender] = 1;
+        uint256 dataStart = packedCalldataStart();
+
+        for (uint256 offset = 0; offset < packedSeats.length; offset += PACKED_SEAT_SIZE) {
+            uint16 sectionID;
+            uint16 seatID;
+            assembly {
+                let word := calldataload(add(dataStart, offset))
+                sectionID := shr(240, word)
+                seatID := and(shr(224, word), 0xffff)
+            }
+            (uint256 price, uint256 fee) = sellSeat(eventID, sectionID, seatID);
+            totalCost += price + fee;
+            totalFees += fee;
         }
 
-        // Resolve type of token per user.
-        address token = identityMaster.resolveCurrencyForPlatform(platID);
-        IERC20 tokenContract = IERC20(token);
-        
-        uint256 allowance = tokenContract.allowance(msgSender,address(this));
-        require(allowance >= totalCost, "Not enough tokens provided in tx to buy the batch of tickets plus fees.");
-        
-        eventDataMap[eventID].funds += (totalCost - totalFees);
-        platformFeesCollected[platID] += totalFees;
+        checkBuyPermission(platID);
+        collectTokens(eventID, platID, totalCost, totalFees);
+    }
 
-        // Receive tokens.
-        require(tokenContract.transferFrom(msgSender, address(this), totalCost),
-            "Not enough balance to transfer this amount of tokens.");
+    /**
+     * @dev Mutator method, same as buyTicketsBatchWithTokens() but buying run-length encoded seat ranges.
+     *      Each range takes 6 bytes: 2 bytes sectionID, 2 bytes first seatID and 2 bytes number of seats,
+     *      all big-endian. Useful for adjacent seats, a full row costs 6 bytes of calldata.
+     * @param eventID Specific event we want to buy
+     * @param packedRanges Concatenated (sectionID, firstSeatID, count) triplets, length must be a multiple of 6
+     */
+    function buyTicketRangesPackedWithTokens(uint32 eventID, bytes calldata packedRanges) external {
+        require(packedRanges.length > 0 && packedRanges.length % PACKED_RANGE_SIZE == 0,
+            "Packed ranges length must be a non-zero multiple of 6 bytes.");
+        uint256 platID = checkOnSale(eventID);
 
-        emit ReceivedTokens(msgSender, totalCost, token);
+        uint256 totalCost = 0;
+        uint256 totalFees = 0;
+        uint256 dataStart = packedCalldataStart();
+
+        for (uint256 offset = 0; offset < packedRanges.length; offset += PACKED_RANGE_SIZE) {
+            uint16 sectionID;
+            uint16 firstSeatID;
+            uint16 seats;
+            assembly {
+                let word := calldataload(add(dataStart, offset))
+                sectionID := shr(240, word)
+                firstSeatID := and(shr(224, word), 0xffff)
+                seats := and(shr(208, word), 0xffff)
+            }
+            (uint256 price, uint256 fee) = sellSeatRange(eventID, sectionID, firstSeatID, seats);
+            totalCost += price + fee;
+            totalFees += fee;
+        }
+
+        checkBuyPermission(platID);
+        collectTokens(eventID, platID, totalCost, totalFees);
     }
 
     /**
@@ -264,39 +294,59 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param platID Specific platform id we want to deal with.
      */
     function withdrawFees(uint256 platID) external onlyOwner {
-        require(identityMaster.existsPlatform(platID), "Identity platform has not been registered before.");
+        uint256 collected = releaseFees(platID);
+        IERC20(identityMaster.resolveCurrencyForPlatform(platID)).transfer(msg.sender, collected);
+    }
 
-        // Get currency token.
-        address token = identityMaster.resolveCurrencyForPlatform(platID);
-        IERC20 tokenContract = IERC20(token);
+    /**
+     * @dev Mutator method, withdrawFees() for several platforms with one token transfer per currency.
+     * @param platIDs Platforms we want to withdraw the fees from
+     */
+    function withdrawFeesBatch(uint256[] memory platIDs) public onlyOwner {
+        address[] memory tokens = new address[](platIDs.length);
+        uint256[] memory amounts = new uint256[](platIDs.length);
+        uint256 currencies = 0;
+
+        for (uint256 i = 0; i < platIDs.length; i++) {
+            uint256 collected = releaseFees(platIDs[i]);
+            address token = identityMaster.resolveCurrencyForPlatform(platIDs[i]);
+            currencies = addToCurrency(tokens, amounts, currencies, token, collected);
+        }
 
-        // How much was collected.
-        uint256 collected = platformFeesCollected[platID];
-        platformFeesCollected[platID] = 0;
-        tokenContract.transfer(msg.sender, collected);
+        transferPerCurrency(tokens, amounts, currencies, msg.sender);
     }
 
     /**
      * @dev Mutator method, only change token funds stores for one event.
      * @param eventID Specific event we want to buy
      */
-    function withdrawFunds(uint32 eventID) external feeless {
-        require(existsEvent(eventID), "EventID does not exists.");
-        require(eventDataMap[eventID].owner == msgSender, "Only owner of the event can withdraw funds.");
-
-        // Check start of selling date.
-        require(block.timestamp >= eventDataMap[eventID].startWithdrawalDate,
-                "Event has not reached the start of event funds withdrawal date.");
+    function withdrawFunds(uint32 eventID) external {
+        (uint256 platID, uint256 collected) = releaseFunds(eventID);
+        IERC20(identityMaster.resolveCurrencyForPlatform(platID)).transfer(_msgSender(), collected);
+    }
 
-        // Get platform and token currency.
-        uint256 platID = eventDataMap[eventID].platform;
-        address token = identityMaster.resolveCurrencyForPlatform(platID);
-        IERC20 tokenContract = IERC20(token);
+    /**
+     * @dev Mutator method, withdrawFunds() for several events with one token transfer per currency.
+     *      The currency is resolved again only when the platform changes from the previous event.
+     * @param eventIDs Events we want to withdraw the funds from, all owned by the sender
+     */
+    function withdrawFundsBatch(uint32[] memory eventIDs) public {
+        address[] memory tokens = new address[](eventIDs.length);
+        uint256[] memory amounts = new uint256[](eventIDs.length);
+        uint256 currencies = 0;
+        uint256 lastPlatID;
+        address token;
+
+        for (uint256 i = 0; i < eventIDs.length; i++) {
+            (uint256 platID, uint256 collected) = releaseFunds(eventIDs[i]);
+            if (i == 0 || platID != lastPlatID) {
+                token = identityMaster.resolveCurrencyForPlatform(platID);
+                lastPlatID = platID;
+            }
+            currencies = addToCurrency(tokens, amounts, currencies, token, collected);
+        }
 
-        // How much was collected.
-        uint256 collected = eventDataMap[eventID].funds;
-        eventDataMap[eventID].funds = 0;
-        tokenContract.transfer(msgSender, collected);
+        transferPerCurrency(tokens, amounts, currencies, _msgSender());
     }
 
     /**
@@ -415,6 +465,353 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
         }
     }
 
+    ///////////////////////////////////////////////////////////
+    /// Internal helpers for event setup                    ///
+    ///////////////////////////////////////////////////////////
+
+    /**
+     * @dev Creates an event owned by the sender, see createEvent().
+     * @param platID Specific identity and permissions platform that will cater this event
+     */
+    function newEvent(uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate) internal returns(uint32) {
+        require(identityMaster.existsPlatform(platID), "Identity platform has not been registered before.");
+
+        uint256 identity = identityMaster.resolveIdentityOnPlatform(platID, _msgSender());
+
+        require(identityMaster.canCreateEventOnPlatform(platID, identity),
+            "Ident. of sender has no permission to create event on this ticket platform.");
+
+        require(startSellingDate <= MAX_DATE && startWithdrawalDate <= MAX_DATE, "Dates must fit in 40 bits.");
+
+        uint32 newId = nextNewEventId;
+        nextNewEventId++;
+
+        // Only the two slots with non-zero fields are written, platform IDs are sequential so they fit in 64 bits.
+        address eventOwner = _msgSender();
+        EventStorage.EventData storage eventData = eventDataMap[newId];
+        eventData.owner = eventOwner;
+        eventData.startSellingDate = uint40(startSellingDate);
+        eventData.platform = uint64(platID);
+        eventData.startWithdrawalDate = uint40(startWithdrawalDate);
+        return newId;
+    }
+
+    /**
+     * @dev Appends sections to an event, counters are written once and max seats checked once on the sum.
+     * @param eventID Specific event the sections will belong to
+     * @param sizes Number of seats of each new section
+     * @param prices Cost (in tokens) of a seat of each new section, same length as sizes
+     */
+    function addSections(uint32 eventID, uint16[] memory sizes, uint256[] memory prices) internal returns(uint16) {
+        require(sizes.length > 0 && sizes.length == prices.length, "Sizes and prices arrays must have the same non-zero length.");
+        EventStorage.EventData storage eventData = eventDataMap[eventID];
+        require(eventData.numberOfSections + sizes.length < 2**16, "Too many sections on this event.");
+
+        uint256 totalSeats = eventData.totalSeats;
+        uint16 eventSection = eventData.numberOfSections;
+        for (uint256 i = 0; i < sizes.length; i++) {
+            require(prices[i] <= MAX_PRICE, "Section price must fit in 128 bits.");
+            totalSeats += sizes[i];
+            eventSection++;
+            EventStorage.SectionData storage section = eventData.sectionDataMap[eventSection];
+            section.size = sizes[i];
+            section.price = uint128(prices[i]);
+        }
+
+        checkMaxSeats(eventData, totalSeats);
+
+        eventData.numberOfSections = eventSection;
+        eventData.totalSeats = uint16(totalSeats);
+        return eventSection;
+    }
+
+    /**
+     * @dev Checks the seats of an event once sections are added, counted in 256 bits so the sum
+     *      cannot wrap: they must fit in the uint16 counter and in the platform max seats.
+     * @param eventData Event the sections are added to
+     * @param totalSeats Number of seats of the event with the new sections
+     */
+    function checkMaxSeats(EventStorage.EventData storage eventData, uint256 totalSeats) internal view {
+        // Check max seats for this ticketing platform.
+        require(totalSeats < 2**16 && totalSeats <= identityMaster.resolveMaxSeatsForPlatform(eventData.platform),
+            "Too many seats for this ticket platform on this event.");
+    }
+
+    ///////////////////////////////////////////////////////////
+    /// Internal helpers for settlement                     ///
+    ///////////////////////////////////////////////////////////
+
+    /**
+     * @dev Checks the sender can withdraw the funds of an event and zeroes them.
+     * @param eventID Specific event we want to withdraw the funds from
+     * @return platform of the event and funds collected
+     */
+    function releaseFunds(uint32 eventID) internal returns(uint256 platID, uint256 collected) {
+        require(existsEvent(eventID), "EventID does not exists.");
+        EventStorage.EventData storage eventData = eventDataMap[eventID];
+        require(eventData.owner == _msgSender(), "Only owner of the event can withdraw funds.");
+
+        // Check start of selling date.
+        require(block.timestamp >= eventData.startWithdrawalDate,
+                "Event has not reached the start of event funds withdrawal date.");
+
+        platID = eventData.platform;
+        collected = eventData.funds;
+        eventData.funds = 0;
+    }
+
+    /**
+     * @dev Zeroes the fees collected for one ticketing platform.
+     * @param platID Specific platform id we want to deal with.
+     * @return fees collected
+     */
+    function releaseFees(uint256 platID) internal returns(uint256 collected) {
+        require(identityMaster.existsPlatform(platID), "Identity platform has not been registered before.");
+        collected = platformFeesCollected[platID];
+        platformFeesCollected[platID] = 0;
+    }
+
+    /**
+     * @dev Adds an amount to its currency in the (tokens, amounts) lists, appending the currency if new.
+     *      A linear search is enough, there are only a handful of currencies.
+     * @param count Number of currencies already in the lists
+     * @return new number of currencies in the lists
+     */
+    function addToCurrency(address[] memory tokens, uint256[] memory amounts, uint256 count,
+                           address token, uint256 amount) internal pure returns(uint256) {
+        for (uint256 i = 0; i < count; i++) {
+            if (tokens[i] == token) {
+                amounts[i] += amount;
+                return count;
+            }
+        }
+        tokens[count] = token;
+        amounts[count] = amount;
+        return count + 1;
+    }
+
+    /**
+     * @dev Makes one token transfer per currency with a non-zero amount.
+     */
+    function transferPerCurrency(address[] memory tokens, uint256[] memory amounts, uint256 count, address to) internal {
+        for (uint256 i = 0; i < count; i++) {
+            if (amounts[i] > 0) {
+                IERC20(tokens[i]).transfer(to, amounts[i]);
+            }
+        }
+    }
+
+    ///////////////////////////////////////////////////////////
+    /// Internal helpers for purchases                      ///
+    ///////////////////////////////////////////////////////////
+
+    /**
+     * @dev Buys one seat for the sender, see buyTicketWithTokens().
+     * @param eventID Specific event we want to buy
+     * @param sectionID Specific section of the buy
+     * @param seatID Specific seatID of the event we want to buy
+     */
+    function buyTicket(uint32 eventID, uint16 sectionID, uint16 seatID) internal returns(uint256) {
+        require(existsEvent(eventID), "EventID does not exists.");
+        require(sectionID > 0 && sectionID <= numberOfSections(eventID), "SectionID does not exists for this event.");
+        require(seatID > 0 && seatID <= sectionSize(eventID,sectionID), "SeatID does not exists for this event and section.");
+
+        // Check start of selling date.
+        require(block.timestamp >= eventDataMap[eventID].startSellingDate,
+                "Event has not reached the start of ticket selling date.");
+
+        // Local checks first, a seat lost to another buyer reverts before any external call.
+        require(eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] == false, "Ticket has already been sold.");
+
+        // Check if sender has permission to buy tickets.
+        uint256 platID = eventDataMap[eventID].platform;
+        checkBuyPermission(platID);
+
+        uint256 ticketID = getTicketID(eventID, sectionID, seatID);
+
+        // Resolve type of token per user.
+        address token = identityMaster.resolveCurrencyForPlatform(platID);
+        IERC20 tokenContract = IERC20(token);
+        uint256 allowance = tokenContract.allowance(_msgSender(),address(this));
+        uint256 sectPriceWithFees = sectionPrice(eventID, sectionID) + sectionFee(eventID, sectionID);
+
+        require(allowance >= sectPriceWithFees, "Not enough tokens provided in tx to buy the ticket plus fees.");
+
+        // Combining eventId+sectionId+seatId we get a ticketId
+        eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] = true;
+        eventDataMap[eventID].funds += sectionPrice(eventID, sectionID);
+        platformFeesCollected[platID] += sectionFee(eventID, sectionID);
+
+        balances[ticketID][_msgSender()] = 1;
+
+        // Recieve tokens.
+        require(tokenContract.transferFrom(_msgSender(), address(this), sectPriceWithFees),
+            "Not enough balance to transfer this amount of tokens.");
+
+        emit ReceivedTokens(_msgSender(), sectPriceWithFees, token);
+
+        return ticketID;
+    }
+
+    /**
+     * @dev Buys a batch of seats for the sender, see buyTicketsBatchWithTokens().
+     * @param eventID Specific event we want to buy
+     * @param sectionIDs Specific sections of the batch buy
+     * @param seatIDs Specific seatIDs of the events we want to buy in this batch, same length as sectionIDs
+     *        (checked by the callers)
+     */
+    function buyTicketsBatch(uint32 eventID, uint16[] memory sectionIDs, uint16[] memory seatIDs) internal {
+        uint256 platID = checkOnSale(eventID);
+
+        uint256 totalCost = 0;
+        uint256 totalFees = 0;
+
+        for (uint i = 0; i < sectionIDs.length; i++) {
+            (uint256 price, uint256 fee) = sellSeat(eventID, sectionIDs[i], seatIDs[i]);
+            totalCost += price + fee;
+            totalFees += fee;
+        }
+
+        checkBuyPermission(platID);
+        collectTokens(eventID, platID, totalCost, totalFees);
+    }
+
+    /**
+     * @dev Calls permit() on the currency token of the event so the sender approves this contract.
+     *      A failed permit does not revert: it may have been front-run by someone submitting the same
+     *      signature to the token, the allowance check of the purchase decides in any case.
+     * @param eventID Specific event we want to buy, gives the token currency
+     * @param value Allowance signed in the permit
+     * @param deadline Expiry timestamp signed in the permit
+     * @param v Recovery id of the permit signature
+     * @param r First 32 bytes of the permit signature
+     * @param s Second 32 bytes of the permit signature
+     */
+    function usePermit(uint32 eventID, uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) internal {
+        // Missing events revert here with their own message, not on the currency of platform 0.
+        address token = identityMaster.resolveCurrencyForPlatform(checkOnSale(eventID));
+        (bool success, ) = token.call(abi.encodeWithSelector(IERC20Permit(token).permit.selector,
+            _msgSender(), address(this), value, deadline, v, r, s));
+        success;
+    }
+
+    /**
+     * @dev Checks the event exists and is on sale, reading only local storage. Returns the event platform.
+     * @param eventID Specific event we want to buy
+     */
+    function checkOnSale(uint32 eventID) internal view returns(uint256) {
+        require(existsEvent(eventID), "EventID does not exists.");
+
+        // Check start of selling date.
+        require(block.timestamp >= eventDataMap[eventID].startSellingDate, "Event has not reached the start of ticket selling date.");
+        return eventDataMap[eventID].platform;
+    }
+
+    /**
+     * @dev Checks the sender can buy on a platform. Two external calls, so purchases run it after the seat checks.
+     * @param platID Platform of the event
+     */
+    function checkBuyPermission(uint256 platID) internal view {
+        uint256 identity = identityMaster.resolveIdentityOnPlatform(platID, _msgSender());
+        require(identityMaster.canBuyTicketOnPlatform(platID, identity),
+            "Identity of sender has no permission to buy tickets on this ticket platform.");
+    }
+
+    /**
+     * @dev Marks one seat as sold to the sender, returns price and fee of the seat.
+     * @param eventID Specific event we want to buy
+     * @param sectionID Specific section of the buy
+     * @param seatID Specific seatID of the event we want to buy
+     */
+    function sellSeat(uint32 eventID, uint16 sectionID, uint16 seatID) internal returns(uint256, uint256) {
+        require(sectionID > 0 && sectionID <= numberOfSections(eventID), "SectionID does not exists for this event.");
+        require(seatID > 0 && seatID <= sectionSize(eventID,sectionID),
+            "SeatID does not exists for this SectionID on this event.");
+
+        require(eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] == false, "Ticket has already been sold.");
+
+        // combining eventId+sectionId+seatId we get a ticketId
+        eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] = true;
+        balances[getTicketID(eventID, sectionID, seatID)][_msgSender()] = 1;
+
+        return (sectionPrice(eventID, sectionID), sectionFee(eventID, sectionID));
+    }
+
+    /**
+     * @dev Marks a range of adjacent seats as sold to the sender, returns price and fee of the whole range.
+     * @param eventID Specific event we want to buy
+     * @param sectionID Specific section of the buy
+     * @param firstSeatID First seatID of the range
+     * @param seats Number of adjacent seats in the range
+     */
+    function sellSeatRange(uint32 eventID, uint16 sectionID, uint16 firstSeatID, uint16 seats) internal returns(uint256, uint256) {
+        require(seats > 0 && uint256(firstSeatID) + seats - 1 <= sectionSize(eventID, sectionID),
+            "Seat range does not exists for this SectionID on this event.");
+
+        uint256 rangePrice = 0;
+        uint256 rangeFees = 0;
+        for (uint256 seatID = firstSeatID; seatID < uint256(firstSeatID) + seats; seatID++) {
+            (uint256 price, uint256 fee) = sellSeat(eventID, sectionID, uint16(seatID));
+            rangePrice += price;
+            rangeFees += fee;
+        }
+        return (rangePrice, rangeFees);
+    }
+
+    /**
+     * @dev Collects the tokens of a batch purchase and accounts funds and fees.
+     * @param eventID Specific event we want to buy
+     * @param platID Platform of the event, gives the token currency
+     * @param totalCost Price plus fees of all the seats bought
+     * @param totalFees Fees of all the seats bought
+     */
+    function collectTokens(uint32 eventID, uint256 platID, uint256 totalCost, uint256 totalFees) internal {
+        // Resolve type of token per user.
+        address token = identityMaster.resolveCurrencyForPlatform(platID);
+        IERC20 tokenContract = IERC20(token);
+
+        uint256 allowance = tokenContract.allowance(_msgSender(),address(this));
+        require(allowance >= totalCost, "Not enough tokens provided in tx to buy the batch of tickets plus fees.");
+
+        eventDataMap[eventID].funds += (totalCost - totalFees);
+        platformFeesCollected[platID] += totalFees;
+
+        // Receive tokens.
+        require(tokenContract.transferFrom(_msgSender(), address(this), totalCost),
+            "Not enough balance to transfer this amount of tokens.");
+
+        emit ReceivedTokens(_msgSender(), totalCost, token);
+    }
+
+    /**
+     * @dev Fees of the current purchase in basic points, with the premium of meta-transactions.
+     */
+    function feeBasicPoints() internal view returns(uint256) {
+        if (isFeelessTransaction()) {
+            return basicPointFees + basicPointGaslessPremium;
+        }
+        return basicPointFees;
+    }
+
+    /**
+     * @dev Calldata position of the packed bytes of buy*PackedWithTokens(uint32, bytes),
+     *      the second ABI head word holds the offset of the bytes length word.
+     */
+    function packedCalldataStart() internal pure returns(uint256 dataStart) {
+        assembly {
+            dataStart := add(add(4, calldataload(36)), 32)
+        }
+    }
+
+    /**
+     * @dev Checks the event and section exist reading only the event owner slot, gives the section storage.
+     * @param eventID Specific event we want to check
+     * @param sectionID Specific section of the event
+     */
+    function sectionData(uint32 eventID, uint16 sectionID) internal view returns(EventStorage.SectionData storage) {
+        return EventStorage.section(eventDataMap[eventID], sectionID);
+    }
+
     ///////////////////////////////////////////////////////////
     /// View functions, read-only accessing state.          ///
     ///////////////////////////////////////////////////////////
@@ -424,7 +821,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * @param eventID Specific event we want to check
      */
     function existsEvent(uint32 eventID) public view returns(bool) {
-        return eventDataMap[eventID].owner != address(0);
+        return EventStorage.exists(eventDataMap[eventID]);
     }
 
     /**
@@ -437,16 +834,33 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
         return eventDataMap[eventID].numberOfSections;
     }
 
+    /**
+     * @dev Observer method, gives how many events have been created, eventIDs go from 1 to this number.
+     */
+    function numberOfEvents() external view returns(uint32) {
+        return nextNewEventId - 1;
+    }
+
+    /**
+     * @dev Observer method, gives the record of an event in one call, for exports and dashboards.
+     * @param eventID Specific event we want to check
+     * @return owner, platform, number of sections and seats, selling and withdrawal dates and funds not withdrawn yet
+     */
+    function eventInfo(uint32 eventID) external view returns(address eventOwner, uint256 platID, uint16 sections, uint16 totalSeats,
+                                                             uint256 startSellingDate, uint256 startWithdrawalDate, uint256 funds) {
+        require(existsEvent(eventID), "EventID does not exists.");
+        EventStorage.EventData storage eventData = eventDataMap[eventID];
+        return (eventData.owner, eventData.platform, eventData.numberOfSections, eventData.totalSeats,
+                eventData.startSellingDate, eventData.startWithdrawalDate, eventData.funds);
+    }
+
     /**
      * @dev Observer method, gives how many sections an event has.
      * @param eventID Specific event we want to check
      * TODO: add tests for this.
      */
     function sectionSize(uint32 eventID, uint16 sectionID) public view returns(uint16) {
-        require(existsEvent(eventID), "EventID does not exists.");
-        require(sectionID > 0 && sectionID <= numberOfSections(eventID), "SectionID does not exists for this event.");
-
-        return eventDataMap[eventID].sectionDataMap[sectionID].size;
+        return sectionData(eventID, sectionID).size;
     }
 
     /**
@@ -455,10 +869,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * TODO: add tests for this.
      */
     function sectionPrice(uint32 eventID, uint16 sectionID) public view returns(uint256) {
-        require(existsEvent(eventID), "EventID does not exists.");
-        require(sectionID > 0 && sectionID <= numberOfSections(eventID), "SectionID does not exists for this event.");
-
-        return eventDataMap[eventID].sectionDataMap[sectionID].price;
+        return sectionData(eventID, sectionID).price;
     }
 
     /**
@@ -467,14 +878,7 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
      * TODO: add tests for this.
      */
     function sectionFee(uint32 eventID, uint16 sectionID) public view returns(uint256) {
-        require(existsEvent(eventID), "EventID does not exists.");
-        require(sectionID > 0 && sectionID <= numberOfSections(eventID), "SectionID does not exists for this event.");
-
-        uint256 totalBasicPointFees = basicPointFees;
-        if (isFeelessTransaction()) {
-            totalBasicPointFees += basicPointGaslessPremium;
-        }
-        return eventDataMap[eventID].sectionDataMap[sectionID].price * totalBasicPointFees/10000;
+        return FeeMath.fee(sectionData(eventID, sectionID).price, feeBasicPoints());
     }
 
     /**
@@ -487,6 +891,29 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
         return eventDataMap[eventID].sectionDataMap[sectionID].wasSold[seatID] == false;
     }
 
+    /**
+     * @dev Observer function, gives the sold seats of a range of a section as a bitmap, so availability
+     *      is loaded with a few calls instead of one ticketIsAvailable() per seat. Bit i of word j (least
+     *      significant first) is seatID firstSeatID + 256 * j + i. Reads one slot per seat, keep ranges
+     *      to a few thousand seats per call.
+     * @param eventID Specific event we want to check
+     * @param sectionID Specific section of the event
+     * @param firstSeatID First seatID of the range
+     * @param count Number of seats of the range
+     */
+    function soldSeats(uint32 eventID, uint16 sectionID, uint16 firstSeatID, uint16 count) external view returns(uint256[] memory words) {
+        EventStorage.SectionData storage section = sectionData(eventID, sectionID);
+        require(firstSeatID > 0 && uint256(firstSeatID) + count - 1 <= section.size,
+            "Seat range does not exists for this SectionID on this event.");
+
+        words = new uint256[]((uint256(count) + 255) / 256);
+        for (uint256 i = 0; i < count; i++) {
+            if (section.wasSold[uint16(firstSeatID + i)]) {
+                words[i / 256] |= uint256(1) << (i % 256);
+            }
+        }
+    }
+
     /**
      * @dev Observer function, confirms ownership of the ticket, true if belongs to specific address.
      * @param eventID Specific event we want to check
@@ -511,5 +938,29 @@ contract EventMasterService is EventMasterServiceInterface,Ownable,ERC1155,Feele
         return balances[ticketID][belongs] == 1;
     }
 
+    /**
+     * @dev Observer function, gives the fees collected on a platform and not withdrawn yet.
+     * @param platID Specific platform we want to check
+     */
+    function feesCollected(uint256 platID) external view returns(uint256) {
+        return platformFeesCollected[platID];
+    }
+
+    /**
+     * @dev Observer function, pre-flight check of buyTicketsBatchWithTokens() for `buyer`, does not revert
+     *      where the purchase would. See the PURCHASE_* constants of PurchaseChecks for the status codes,
+     *      the checks run in that linked library.
+     * @param buyer Address that would send the purchase
+     * @param eventID Specific event we want to buy
+     * @param sectionIDs Specific sections of the batch buy
+     * @param seatIDs Specific seatIDs of the event we want to buy, same length as sectionIDs
+     * @return status code per seat and price plus fees (of a direct purchase) of the seats that can be bought
+     */
+    function checkPurchase(address buyer, uint32 eventID, uint16[] memory sectionIDs, uint16[] memory seatIDs)
+        public view returns(uint8[] memory codes, uint256 totalCost)
+    {
+        return PurchaseChecks.checkPurchase(eventDataMap, identityMaster, feeBasicPoints(), buyer, eventID, sectionIDs, seatIDs);
+    }
+
 
 }
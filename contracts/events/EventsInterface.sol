@@ -11,22 +11,40 @@ contract EventMasterServiceInterface {
 
     // write
     function createEvent(uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate) external returns(uint256);
+    function createEventWithSections(uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate,
+                                     uint16[] calldata sizes, uint256[] calldata prices) external returns(uint256);
     function addSection(uint32 eventID, uint16 size, uint256 price ) external returns(uint16);
+    function addSectionsBatch(uint32 eventID, uint16[] calldata sizes, uint256[] calldata prices) external returns(uint16);
     function buyTicketWithTokens(uint32 eventID, uint16 sectionID, uint16 seatID) external returns(uint256);
+    function buyTicketWithPermit(uint32 eventID, uint16 sectionID, uint16 seatID,
+                                 uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) external returns(uint256);
     function buyTicketsBatchWithTokens(uint32 eventID, uint16[] calldata sectionIDs, uint16[] calldata seatIDs) external;
+    function buyTicketsBatchWithPermit(uint32 eventID, uint16[] calldata sectionIDs, uint16[] calldata seatIDs,
+                                       uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) external;
+    function buyTicketsPackedWithTokens(uint32 eventID, bytes calldata packedSeats) external;
+    function buyTicketRangesPackedWithTokens(uint32 eventID, bytes calldata packedRanges) external;
     function withdrawFunds(uint32 eventID) external;
+    function withdrawFundsBatch(uint32[] calldata eventIDs) external;
     function withdrawFees(uint256 platID) external;
+    function withdrawFeesBatch(uint256[] calldata platIDs) external;
     function setBasicPointsFees(uint256 basicPoints) external;
     function setBasicPointsFeelessPremium(uint256 basicPointsPremium) external;
 
     // view (read-only)
     function existsEvent(uint32 eventID) public view returns(bool);
     function numberOfSections(uint32 eventID) public view returns(uint16);
+    function numberOfEvents() external view returns(uint32);
+    function eventInfo(uint32 eventID) external view returns(address eventOwner, uint256 platID, uint16 sections, uint16 totalSeats,
+                                                             uint256 startSellingDate, uint256 startWithdrawalDate, uint256 funds);
     function sectionSize(uint32 eventID, uint16 sectionID) public view returns(uint16);
     function sectionPrice(uint32 eventID, uint16 sectionID) public view returns(uint256);
     function sectionFee(uint32 eventID, uint16 sectionID) public view returns(uint256);
     function ticketIsAvailable(uint32 eventID, uint16 sectionID, uint16 seatID) external view returns(bool);
+    function soldSeats(uint32 eventID, uint16 sectionID, uint16 firstSeatID, uint16 count) external view returns(uint256[] memory words);
     function doesTicketBelongTo(uint32 eventID, uint16 sectionID, uint16 seatID, address belongs) external view returns(bool);
+    function checkPurchase(address buyer, uint32 eventID, uint16[] calldata sectionIDs, uint16[] calldata seatIDs)
+        external view returns(uint8[] memory codes, uint256 totalCost);
     function doesTicketIdBelongTo(uint256 ticketID, address belongs) external view returns(bool);
+    function feesCollected(uint256 platID) external view returns(uint256);
 
 }
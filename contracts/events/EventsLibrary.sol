@@ -0,0 +1,79 @@
+pragma solidity ^0.5.11;
+
+/**
+ * @title TicketIDs
+ * @dev Ticket ID codec: eventID in bits 32-63, sectionID in bits 16-31 and seatID in bits 0-15.
+ *      Internal functions, inlined in the contracts that use them.
+ */
+library TicketIDs {
+
+    function encode(uint32 eventID, uint16 sectionID, uint16 seatID) internal pure returns(uint256) {
+        return (uint256(eventID) << 32) | (uint256(sectionID) << 16) | uint256(seatID);
+    }
+
+    function eventOf(uint256 ticketID) internal pure returns(uint32) {
+        return uint32(ticketID >> 32);
+    }
+
+    function sectionOf(uint256 ticketID) internal pure returns(uint16) {
+        return uint16((ticketID & 0xffff0000) >> 16);
+    }
+
+    function seatOf(uint256 ticketID) internal pure returns(uint16) {
+        return uint16(ticketID & 0xffff);
+    }
+}
+
+/**
+ * @title FeeMath
+ * @dev Fees in basic points, 1/100th of 1% of the price.
+ */
+library FeeMath {
+
+    function fee(uint256 price, uint256 basicPoints) internal pure returns(uint256) {
+        return price * basicPoints / 10000;
+    }
+}
+
+/**
+ * @title EventStorage
+ * @dev Storage records of the events of EventMasterService and the section lookups shared by
+ *      the service and the PurchaseChecks library.
+ */
+library EventStorage {
+
+    // Storage layout: size and price share one slot.
+    struct SectionData {
+        uint16 size;
+        uint128 price;
+        mapping(uint16 => bool) wasSold;
+    }
+    // Storage layout: slot 0 owner, counters and selling date (read on every purchase),
+    // slot 1 funds, slot 2 platform and withdrawal date.
+    struct EventData {
+        address owner;
+        uint16 numberOfSections;
+        uint16 totalSeats;
+        uint40 startSellingDate;
+        uint256 funds;
+        uint64 platform;
+        uint40 startWithdrawalDate;
+        mapping(uint16 => SectionData) sectionDataMap;
+    }
+
+    function exists(EventData storage eventData) internal view returns(bool) {
+        return eventData.owner != address(0);
+    }
+
+    /**
+     * @dev Checks the event and section exist reading only the event owner slot, gives the section storage.
+     * @param eventData Record of the event
+     * @param sectionID Specific section of the event
+     */
+    function section(EventData storage eventData, uint16 sectionID) internal view returns(SectionData storage) {
+        require(eventData.owner != address(0), "EventID does not exists.");
+        require(sectionID > 0 && sectionID <= eventData.numberOfSections, "SectionID does not exists for this event.");
+
+        return eventData.sectionDataMap[sectionID];
+    }
+}
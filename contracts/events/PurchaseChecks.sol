@@ -0,0 +1,136 @@
+pragma solidity ^0.5.11;
+pragma experimental ABIEncoderV2;
+
+import "../identity/IdentityInterface.sol";
+import "../tokens/IERC20.sol";
+import "./EventsLibrary.sol";
+
+/**
+ * @title PurchaseChecks
+ * @dev Pre-flight checks of purchases for EventMasterService.checkPurchase(). A deployed library:
+ *      its code is not part of the service, which delegates to it, and one deployment can be
+ *      linked by any number of services. Storage and address(this) are those of the service.
+ */
+library PurchaseChecks {
+
+    // Status codes of checkPurchase(), one per seat. Event-wide failures are given to every seat,
+    // funds failures to every seat that would otherwise be bought.
+    uint8 constant PURCHASE_OK = 0;
+    uint8 constant PURCHASE_NO_EVENT = 1;
+    uint8 constant PURCHASE_NOT_ON_SALE = 2;
+    uint8 constant PURCHASE_NO_PERMISSION = 3;
+    uint8 constant PURCHASE_NO_SECTION = 4;
+    uint8 constant PURCHASE_NO_SEAT = 5;
+    uint8 constant PURCHASE_SOLD = 6;
+    uint8 constant PURCHASE_DUPLICATED = 7;
+    uint8 constant PURCHASE_LOW_ALLOWANCE = 8;
+    uint8 constant PURCHASE_LOW_BALANCE = 9;
+
+    /**
+     * @dev See EventMasterService.checkPurchase().
+     * @param events Event records of the service
+     * @param identityMaster Identity master of the service
+     * @param basicPointFees Fees of the purchase, in basic points
+     * @return status code per seat and price plus fees of the seats that can be bought
+     */
+    function checkPurchase(mapping (uint32 => EventStorage.EventData) storage events,
+                           IdentityMasterServiceInterface identityMaster, uint256 basicPointFees,
+                           address buyer, uint32 eventID, uint16[] memory sectionIDs, uint16[] memory seatIDs)
+        public view returns(uint8[] memory codes, uint256 totalCost)
+    {
+        require(sectionIDs.length == seatIDs.length, "Section and Seat arrays must have the same length.");
+        codes = new uint8[](sectionIDs.length);
+        EventStorage.EventData storage eventData = events[eventID];
+
+        uint8 eventCode = purchaseEventCode(eventData, identityMaster, buyer);
+        if (eventCode != PURCHASE_OK) {
+            for (uint256 i = 0; i < codes.length; i++) {
+                codes[i] = eventCode;
+            }
+            return (codes, 0);
+        }
+
+        for (uint256 i = 0; i < codes.length; i++) {
+            codes[i] = purchaseSeatCode(eventData, sectionIDs, seatIDs, i);
+            if (codes[i] == PURCHASE_OK) {
+                uint256 price = eventData.sectionDataMap[sectionIDs[i]].price;
+                totalCost += price + FeeMath.fee(price, basicPointFees);
+            }
+        }
+
+        uint8 fundsCode = purchaseFundsCode(identityMaster, buyer, eventData.platform, totalCost);
+        if (fundsCode != PURCHASE_OK) {
+            for (uint256 i = 0; i < codes.length; i++) {
+                if (codes[i] == PURCHASE_OK) {
+                    codes[i] = fundsCode;
+                }
+            }
+        }
+    }
+
+    /**
+     * @dev Status of the event-wide checks of a purchase by `buyer`.
+     *      The identity is resolved with a static call since it reverts for unregistered addresses.
+     */
+    function purchaseEventCode(EventStorage.EventData storage eventData, IdentityMasterServiceInterface identityMaster,
+                               address buyer) private view returns(uint8) {
+        if (!EventStorage.exists(eventData)) {
+            return PURCHASE_NO_EVENT;
+        }
+        if (block.timestamp < eventData.startSellingDate) {
+            return PURCHASE_NOT_ON_SALE;
+        }
+
+        uint256 platID = eventData.platform;
+        if (!identityMaster.existsPlatform(platID)) {
+            return PURCHASE_NO_PERMISSION;
+        }
+        (bool success, bytes memory identity) = address(identityMaster).staticcall(
+            abi.encodeWithSelector(identityMaster.resolveIdentityOnPlatform.selector, platID, buyer));
+        if (!success || !identityMaster.canBuyTicketOnPlatform(platID, abi.decode(identity, (uint256)))) {
+            return PURCHASE_NO_PERMISSION;
+        }
+        return PURCHASE_OK;
+    }
+
+    /**
+     * @dev Status of the seat at `index` of a purchase. Reads local storage only.
+     */
+    function purchaseSeatCode(EventStorage.EventData storage eventData, uint16[] memory sectionIDs,
+                              uint16[] memory seatIDs, uint256 index) private view returns(uint8) {
+        uint16 sectionID = sectionIDs[index];
+        uint16 seatID = seatIDs[index];
+        if (sectionID == 0 || sectionID > eventData.numberOfSections) {
+            return PURCHASE_NO_SECTION;
+        }
+        EventStorage.SectionData storage section = eventData.sectionDataMap[sectionID];
+        if (seatID == 0 || seatID > section.size) {
+            return PURCHASE_NO_SEAT;
+        }
+        if (section.wasSold[seatID]) {
+            return PURCHASE_SOLD;
+        }
+        for (uint256 i = 0; i < index; i++) {
+            if (sectionIDs[i] == sectionID && seatIDs[i] == seatID) {
+                return PURCHASE_DUPLICATED;
+            }
+        }
+        return PURCHASE_OK;
+    }
+
+    /**
+     * @dev Status of the allowance and balance of `buyer` for a purchase of `totalCost` tokens.
+     *      address(this) is the service, the library runs with delegatecall.
+     */
+    function purchaseFundsCode(IdentityMasterServiceInterface identityMaster, address buyer, uint256 platID,
+                               uint256 totalCost) private view returns(uint8) {
+        IERC20 tokenContract = IERC20(identityMaster.resolveCurrencyForPlatform(platID));
+        if (tokenContract.allowance(buyer, address(this)) < totalCost) {
+            return PURCHASE_LOW_ALLOWANCE;
+        }
+        if (tokenContract.balanceOf(buyer) < totalCost) {
+            return PURCHASE_LOW_BALANCE;
+        }
+        return PURCHASE_OK;
+    }
+}
@@ -2,126 +2,156 @@ pragma solidity ^0.5.11;
 
 import "./IdentityInterface.sol";
 import "../utils/Ownable.sol";
+import "../utils/Clones.sol";
+import "../utils/Address.sol";
 
 
 contract IdentityMasterService is IdentityMasterServiceInterface,Ownable {
 
+    using Address for address;
+
     uint256 nextNewPlatformId = 1;
-    // Mapping from platform id to resolver.
-    // numerical platform identities to resolver addresses.
-    mapping (uint256 => address) platformsMap;
-    // Mapping from platform id to resolver.
-    // numerical platform identities to resolver addresses.
-    mapping (uint256 => uint256) maxSeatsMap;
-    // Mapping from platform id to currency.
-    // numerical platform identities to currency token addresses.
-    mapping (uint256 => address) currencyMap;
-    // resolver addresses to num platform identities
-    mapping (address => uint256) reversePlatformsMap;
+    // Platform metadata, resolver, max seats and active flag share one slot.
+    struct PlatformRecord {
+        address resolver;
+        uint64 maxSeats;
+        bool active;
+        address currency;
+    }
+    // Mapping from numerical platform identities to their record.
+    mapping (uint256 => PlatformRecord) platforms;
     // user addresses to num platform identities
     mapping (address => uint256) userAddrToPlatIDMap;
 
+    event ResolverCloned(uint256 indexed platID, address resolver, address implementation);
+
     function registerPlatform ( address resolver, address currencyToken, uint256 maxSeatsPerEvent ) external onlyOwner returns ( uint256 ) {
-        require(resolver != address(0), "Zero-account address(0) address not allowed.");
-        uint256 newId = nextNewPlatformId;
-        nextNewPlatformId++;
-        platformsMap[newId] = resolver;
-        maxSeatsMap[newId] = maxSeatsPerEvent;
-        currencyMap[newId] = currencyToken;
-        reversePlatformsMap[resolver] = newId;
-        return newId;
+        return newPlatform(resolver, currencyToken, maxSeatsPerEvent);
+    }
+
+    function registerPlatformClone ( address implementation, address payable platformOwner, address currencyToken, uint256 maxSeatsPerEvent ) external onlyOwner returns ( uint256 platID, address resolver ) {
+        require(implementation.isContract(), "Resolver implementation must be a contract.");
+        resolver = Clones.clone(implementation);
+        InitializableIdentityResolverInterface(resolver).initialize(platformOwner);
+        platID = newPlatform(resolver, currencyToken, maxSeatsPerEvent);
+        emit ResolverCloned(platID, resolver, implementation);
     }
 
     function deregisterPlatform ( uint256 platID ) external onlyOwner {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        platformsMap[platID] = address(0);
+        activePlatform(platID).active = false;
+    }
+
+    function getPlatform ( uint256 platID ) external view returns ( address resolver, address currency, uint256 maxSeats, bool active ) {
+        PlatformRecord storage platform = platforms[platID];
+        return (platform.resolver, platform.currency, platform.maxSeats, platform.active);
     }
 
     function resolveCurrencyForPlatform (uint256 platID) external view returns (address) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        return currencyMap[platID];
+        return activePlatform(platID).currency;
     }
 
     function resolveMaxSeatsForPlatform (uint256 platID) external view returns (uint256) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        return maxSeatsMap[platID];
+        return activePlatform(platID).maxSeats;
     }
 
     function existsPlatform ( uint256 platID ) external view returns(bool) {
-        return platformsMap[platID] != address(0);
+        return platforms[platID].active;
     }
 
     function resolveIdentityOnPlatform ( uint256 platID, address accountAddr ) external view returns ( uint256 ) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         require(accountAddr != address(0), "Zero-account address(0) address not allowed.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
         //assert(resolverObj.existsAddress(accountAddr));
         return resolverObj.resolveIdentity(accountAddr);
     }
 
     function resolvePermissionsOnPlatform ( uint256 platID , uint256 identity ) external view returns ( uint256 ) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         assert(resolverObj.existsIdentity(identity));
         return resolverObj.resolvePermissions(identity);
     }
 
     function resolveGroupExistsOnPlatform ( uint256 platID , uint256 groupID ) external view returns ( bool ){
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         return resolverObj.resolveGroupExists(groupID);
     }
 
     function resolveIsInGroupOnPlatform ( uint256 platID, uint256 groupID , uint256 identity ) external view returns (  bool ) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         assert(resolverObj.existsIdentity(identity));
         assert(resolverObj.resolveGroupExists(groupID));
         return resolverObj.resolveIsInGroup(groupID,identity);
     }
 
     function canBuyTicketOnPlatform( uint256 platID, uint256 identity ) external view returns (bool) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         return resolverObj.canBuyTicket(identity);
     }
 
     function canResellTicketOnPlatform( uint256 platID, uint256 identity ) external view returns (bool) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         return resolverObj.canResellTicket(identity);
     }
 
     function canCreateEventOnPlatform( uint256 platID, uint256 identity ) external view returns (bool) {
-        require(platformsMap[platID] != address(0), "Platform has not been registered before.");
-        address resolverAddr = platformsMap[platID];
-        IdentityResolverServiceInterface resolverObj = IdentityResolverServiceInterface(resolverAddr);
+        IdentityResolverServiceInterface resolverObj = activeResolver(platID);
         return resolverObj.canCreateEvent(identity);
     }
+
+    function newPlatform ( address resolver, address currencyToken, uint256 maxSeatsPerEvent ) internal returns ( uint256 ) {
+        require(resolver != address(0), "Zero-account address(0) address not allowed.");
+        require(maxSeatsPerEvent < 2**64, "Max seats per event must fit in 64 bits.");
+        uint256 newId = nextNewPlatformId;
+        nextNewPlatformId++;
+        platforms[newId] = PlatformRecord(resolver, uint64(maxSeatsPerEvent), true, currencyToken);
+        return newId;
+    }
+
+    // Record of a registered platform, reverts if it does not exist or was deregistered.
+    function activePlatform ( uint256 platID ) internal view returns ( PlatformRecord storage ) {
+        PlatformRecord storage platform = platforms[platID];
+        require(platform.active, "Platform has not been registered before.");
+        return platform;
+    }
+
+    // Resolver of a registered platform, one slot read.
+    function activeResolver ( uint256 platID ) internal view returns ( IdentityResolverServiceInterface ) {
+        return IdentityResolverServiceInterface(activePlatform(platID).resolver);
+    }
 }
 
 
-contract DefaultIdentityResolverService is IdentityResolverServiceInterface,Ownable {
+contract DefaultIdentityResolverService is IdentityResolverServiceInterface,InitializableIdentityResolverInterface,Ownable {
 
     uint256 nextNewId = 1;
     uint256 nextNewGroupId = 1;
-    // numerical identities to addresses.
-    mapping (uint256 => address[]) ownedAddresses;
+    // Identity word: existence, permissions and number of addresses share one slot.
+    struct IdentityRecord {
+        bool exists;
+        uint32 addressCount;
+        uint128 permissions;
+    }
+    // numerical identities to their record.
+    mapping (uint256 => IdentityRecord) identities;
     // addresses to num identities
     mapping (address => uint256) reverseOwnedAddresses;
-    // id to permissions
-    mapping (uint256 => uint256) permissionsPerID;
     // numerical groups to num ids.
     mapping (uint256 => uint256[]) groupMembers;
     // num ids to numerical groups.
     mapping (uint256 => uint256[]) identityGroups;
 
+    // Addresses of an identity are not stored, they can be enumerated from AddressRegistered logs.
+    event AddressRegistered(uint256 indexed identity, address addr);
+
+    // Owner and counters of a clone, which runs no constructor. The counters of the
+    // implementation are set by its constructor, so it can not be initialized.
+    function initialize( address payable initialOwner ) external {
+        require(nextNewId == 0, "Resolver has been initialized before.");
+        nextNewId = 1;
+        nextNewGroupId = 1;
+        _transferOwnership(initialOwner);
+    }
+
     function existsAddress( address addr) external view returns ( bool ){
         return reverseOwnedAddresses[addr] > 0;
     }
@@ -133,8 +163,7 @@ contract DefaultIdentityResolverService is IdentityResolverServiceInterface,Owna
     }
 
     function resolvePermissions ( uint256 identity ) external view returns ( uint256 ) {
-        require(ownedAddresses[identity].length > 0, "Account has not been registered before.");
-        return permissionsPerID[identity];
+        return existingIdentity(identity).permissions;
     }
 
     function resolveGroupExists( uint256 groupID ) external view returns ( bool ) {
@@ -143,7 +172,7 @@ contract DefaultIdentityResolverService is IdentityResolverServiceInterface,Owna
 
     function resolveIsInGroup( uint256 groupID , uint256 identity ) external view returns ( bool ) {
         require(groupMembers[groupID].length > 0, "Group of identities has not been registered before.");
-        require(ownedAddresses[identity].length > 0, "Account has not been registered before.");
+        require(identities[identity].exists, "Account has not been registered before.");
         uint arrayLength = identityGroups[identity].length;
         for (uint i = 0; i < arrayLength; i++) {
             if (identityGroups[identity][i] == groupID) {
@@ -154,46 +183,50 @@ contract DefaultIdentityResolverService is IdentityResolverServiceInterface,Owna
     }
 
     function canBuyTicket( uint256 identity ) external view returns ( bool ) {
-        require(ownedAddresses[identity].length > 0, "Account has not been registered before.");
         // last bit
-        return permissionsPerID[identity] & 0x1 > 0;
+        return existingIdentity(identity).permissions & 0x1 > 0;
     }
     
     function canResellTicket( uint256 identity ) external view returns ( bool ) {
-        require(ownedAddresses[identity].length > 0, "Account has not been registered before.");
         // one before last bit
-        return permissionsPerID[identity] & 0x2 > 0;
+        return existingIdentity(identity).permissions & 0x2 > 0;
     }
     
     function canCreateEvent( uint256 identity ) external view returns ( bool ) {
-        require(ownedAddresses[identity].length > 0, "Account has not been registered before.");
         // two before last bit
-        return permissionsPerID[identity] & 0x4 > 0;
+        return existingIdentity(identity).permissions & 0x4 > 0;
     }
 
     function newIdentity( address addr, uint256 permissions ) external onlyOwner  returns ( uint256 ) {
         require(addr != address(0), "Zero-account address(0) address not allowed.");
+        require(permissions < 2**128, "Permissions must fit in 128 bits.");
         uint256 newId = nextNewId;
         nextNewId++;
-        ownedAddresses[newId] = [addr];
+        identities[newId] = IdentityRecord(true, 1, uint128(permissions));
         reverseOwnedAddresses[addr] = newId;
-        permissionsPerID[newId] = permissions;
+        emit AddressRegistered(newId, addr);
         return newId;
     }
     
     function existsIdentity( uint256 accID) external view returns ( bool ) {
-        return ownedAddresses[accID].length > 0;
+        return identities[accID].exists;
+    }
+
+    function addressCount( uint256 accID ) external view returns ( uint256 ) {
+        return existingIdentity(accID).addressCount;
     }
     
     function registerAddress( uint256 accID, address addr ) external onlyOwner {
-        require(ownedAddresses[accID].length > 0, "Account has not been registered before.");
+        IdentityRecord storage record = existingIdentity(accID);
         require(addr != address(0), "Zero-account address(0) address not allowed.");
-        ownedAddresses[accID].push(addr);
+        require(reverseOwnedAddresses[addr] == 0, "Address has been registered before.");
+        record.addressCount++;
         reverseOwnedAddresses[addr] = accID;
+        emit AddressRegistered(accID, addr);
     }
     
     function newGroup( uint256 firstMemberId ) external onlyOwner returns ( uint256 ) {
-        require(ownedAddresses[firstMemberId].length > 0, "Account has not been registered before.");
+        require(identities[firstMemberId].exists, "Account has not been registered before.");
         uint256 newGroupId = nextNewGroupId;
         nextNewGroupId++;
         groupMembers[newGroupId] = [firstMemberId];
@@ -207,12 +240,19 @@ contract DefaultIdentityResolverService is IdentityResolverServiceInterface,Owna
     }
 
     function addToGroup( uint256 groupId, uint256 memberId ) external onlyOwner {
-        require(ownedAddresses[memberId].length > 0, "Account has not been registered before.");
+        require(identities[memberId].exists, "Account has not been registered before.");
         require(groupMembers[groupId].length > 0, "Group of identities has not been registered before.");
         groupMembers[groupId].push(memberId);
         identityGroups[memberId].push(groupId);
     }
 
+    // Record of a registered identity, reverts if it does not exist.
+    function existingIdentity( uint256 identity ) internal view returns ( IdentityRecord storage ) {
+        IdentityRecord storage record = identities[identity];
+        require(record.exists, "Account has not been registered before.");
+        return record;
+    }
+
 }
 
 // Idempotent or Null Id Resolver for Testing.
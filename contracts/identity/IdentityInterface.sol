@@ -22,12 +22,28 @@ interface IdentityMasterServiceInterface {
     */
     function registerPlatform(address resolver, address currencyToken, uint256 maxSeatPerEvent) external returns (uint256);
 
+    /**
+    * @dev Deploys an EIP-1167 clone of the resolver `implementation`, initializes it
+    * with `platformOwner` as owner and registers it as a platform, in one transaction.
+    *
+    * Returns the new platform unique number and the address of its resolver.
+    *
+    */
+    function registerPlatformClone(address implementation, address payable platformOwner, address currencyToken, uint256 maxSeatPerEvent) external returns (uint256 platID, address resolver);
+
     /**
     * @dev Given `platID` platform number deregister a contract with a
     * IdentityResolverServiceInterface interface from the identity master.
     */
     function deregisterPlatform(uint256 platID) external;
 
+    /**
+    * @dev Given `platID` platform number returns its whole record: resolver,
+    * currency token, max seats per event and whether it is active. Deregistered
+    * platforms keep their record with `active` false, missing ones are all zeros.
+    */
+    function getPlatform(uint256 platID) external view returns (address resolver, address currency, uint256 maxSeats, bool active);
+
     /**
     * @dev Given `platID` platform number returns the token contract address
     * of the curreny used for payments on this identity platform.
@@ -187,3 +203,14 @@ interface IdentityResolverServiceInterface {
 
 
 }
+
+/**
+ * @title InitializableIdentityResolverInterface
+ * @dev Resolvers that can be deployed as clones by the identity master. A clone
+ * runs no constructor, `initialize` sets its owner once.
+ */
+interface InitializableIdentityResolverInterface {
+
+    function initialize(address payable initialOwner) external;
+
+}
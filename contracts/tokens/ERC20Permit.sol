@@ -0,0 +1,46 @@
+pragma solidity ^0.5.11;
+
+import "./ERC20.sol";
+import "../utils/ECRecovery.sol";
+
+/**
+ * @dev Implementation of the EIP-2612 Permit extension, allowances can be set
+ * with a signature of the owner so the spender can collect tokens in the same
+ * transaction, without a previous approve() transaction.
+ *
+ * The chain id is given on construction, the CHAINID opcode is not available
+ * before Istanbul. The external functions follow {IERC20Permit}, it is not
+ * inherited since public getters cannot implement interface functions in 0.5.
+ */
+contract ERC20Permit is ERC20 {
+    // keccak256("Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)")
+    bytes32 public constant PERMIT_TYPEHASH = 0x6e71edae12b1b97f4d1f60370fef10105fa2faae0126114a169c64845d6126c9;
+    // keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+    bytes32 private constant EIP712_DOMAIN_TYPEHASH = 0x8b73c3c69bb8fe3d512ecc4cf759cc79239f7b179b0ffacaa9a75d522b39400f;
+
+    bytes32 public DOMAIN_SEPARATOR;
+
+    mapping (address => uint256) public nonces;
+
+    /**
+     * @dev Sets the EIP-712 domain of the permit signatures, version is always "1".
+     */
+    constructor (string memory tokenName, uint256 chainId) internal {
+        DOMAIN_SEPARATOR = keccak256(abi.encode(
+            EIP712_DOMAIN_TYPEHASH, keccak256(bytes(tokenName)), keccak256(bytes("1")), chainId, address(this)));
+    }
+
+    /**
+     * @dev See {IERC20Permit-permit}.
+     */
+    function permit(address owner, address spender, uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) external {
+        require(block.timestamp <= deadline, "ERC20Permit: expired deadline");
+
+        bytes32 digest = keccak256(abi.encodePacked("\x19\x01", DOMAIN_SEPARATOR,
+            keccak256(abi.encode(PERMIT_TYPEHASH, owner, spender, value, nonces[owner]++, deadline))));
+        address signer = ECRecovery.recover(digest, v, r, s);
+        require(signer != address(0) && signer == owner, "ERC20Permit: invalid signature");
+
+        _approve(owner, spender, value);
+    }
+}
@@ -0,0 +1,30 @@
+pragma solidity ^0.5.11;
+
+/**
+ * @dev Interface of the ERC20 Permit extension defined in EIP-2612, allowances
+ * can be given with a signature instead of an approve() transaction.
+ */
+interface IERC20Permit {
+    /**
+     * @dev Sets `value` as the allowance of `spender` over `owner`'s tokens,
+     * given `owner`'s signed approval (EIP-712 typed `Permit` message).
+     *
+     * Requirements:
+     *
+     * - `deadline` must be a timestamp in the future.
+     * - `v`, `r` and `s` must be a valid signature of `owner` over the
+     * EIP-712 `Permit` message with the current nonce of `owner`.
+     */
+    function permit(address owner, address spender, uint256 value, uint256 deadline, uint8 v, bytes32 r, bytes32 s) external;
+
+    /**
+     * @dev Returns the current nonce for `owner`, it must be included in
+     * the signature of the next permit() call.
+     */
+    function nonces(address owner) external view returns (uint256);
+
+    /**
+     * @dev Returns the EIP-712 domain separator used in the permit signatures.
+     */
+    function DOMAIN_SEPARATOR() external view returns (bytes32);
+}
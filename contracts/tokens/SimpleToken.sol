@@ -3,19 +3,21 @@ pragma solidity ^0.5.11;
 import "../utils/Context.sol";
 import "../tokens/ERC20.sol";
 import "../tokens/ERC20Detailed.sol";
+import "../tokens/ERC20Permit.sol";
 
 /**
  * @title SimpleToken
  * @dev Very simple ERC20 Token example, where all tokens are pre-assigned to the creator.
  * Note they can later distribute these tokens as they wish using `transfer` and other
- * `ERC20` functions.
+ * `ERC20` functions. Allowances can also be given with EIP-2612 `permit` signatures.
  */
-contract SimpleToken is Context, ERC20, ERC20Detailed {
+contract SimpleToken is Context, ERC20, ERC20Detailed, ERC20Permit {
 
     /**
      * @dev Constructor that gives _msgSender() all of existing tokens.
+     * @param chainId Chain id of the EIP-712 domain of permit signatures
      */
-    constructor () public ERC20Detailed("SimpleToken", "SIM", 18) {
+    constructor (uint256 chainId) public ERC20Detailed("SimpleToken", "SIM", 18) ERC20Permit("SimpleToken", chainId) {
         _mint(_msgSender(), 10000 * (10 ** uint256(decimals())));
     }
 }
\ No newline at end of file
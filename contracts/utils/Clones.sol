@@ -0,0 +1,27 @@
+pragma solidity ^0.5.11;
+
+
+/**
+ * EIP-1167 minimal proxies: 45 bytes of code that delegate every call to an implementation.
+ */
+library Clones {
+
+    /**
+     * Deploys a minimal proxy of `implementation`. The clone runs no constructor, its
+     * storage starts empty and has to be set by an initializer.
+     * @param implementation contract the clone delegates to
+     * @return address of the clone
+     */
+    function clone(address implementation) internal returns (address instance) {
+        // solium-disable-next-line security/no-inline-assembly
+        assembly {
+            let ptr := mload(0x40)
+            mstore(ptr, 0x3d602d80600a3d3981f3363d3d373d3d3d363d73000000000000000000000000)
+            mstore(add(ptr, 0x14), shl(0x60, implementation))
+            mstore(add(ptr, 0x28), 0x5af43d82803e903d91602b57fd5bf30000000000000000000000000000000000)
+            instance := create(0, ptr, 0x37)
+        }
+        require(instance != address(0), "Clone deployment failed.");
+    }
+
+}
@@ -5,16 +5,21 @@ pragma solidity ^0.5.11;
  * @title Eliptic curve signature operations
  *
  * @dev Based on https://gist.github.com/axic/5b33912c6f61ae6fd96d6c4a47afde6d
+ *      Functions are internal, they are inlined in the calling contract and the
+ *      library does not need to be deployed and linked.
  */
 
 library ECRecovery {
 
+  // Half of the secp256k1 curve order, signatures with a greater `s` are malleable copies.
+  uint256 constant internal HALF_CURVE_ORDER = 0x7FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF5D576E7357A4501DDFE92F46681B20A0;
+
   /**
    * @dev Recover signer address from a message by using his signature
    * @param hash bytes32 message, the hash is the signed message. What is recovered is the signer address.
    * @param sig bytes signature, the signature is generated using web3.eth.sign()
    */
-  function recover(bytes32 hash, bytes memory sig) public pure returns (address) {
+  function recover(bytes32 hash, bytes memory sig) internal pure returns (address) {
     bytes32 r;
     bytes32 s;
     uint8 v;
@@ -31,6 +36,20 @@ library ECRecovery {
       v := byte(0, mload(add(sig, 96)))
     }
 
+    return recover(hash, v, r, s);
+  }
+
+  /**
+   * @dev Recover signer address from a message by using the r, s and v parts of his signature.
+   *      Only the lower `s` of the two valid signatures is accepted.
+   * @param hash bytes32 message, the hash is the signed message. What is recovered is the signer address.
+   */
+  function recover(bytes32 hash, uint8 v, bytes32 r, bytes32 s) internal pure returns (address) {
+    // Reject malleable signatures, (r, n - s, v ^ 1) recovers the same signer.
+    if (uint256(s) > HALF_CURVE_ORDER) {
+      return (address(0));
+    }
+
     // Version of signature should be 27 or 28, but 0 and 1 are also possible versions
     if (v < 27) {
       v += 27;
@@ -44,4 +63,4 @@ library ECRecovery {
     }
   }
 
-}
\ No newline at end of file
+}
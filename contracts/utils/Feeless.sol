@@ -1,50 +1,96 @@
 pragma solidity ^0.5.11;
 
 import { ECRecovery } from "../utils/ECRecovery.sol";
+import "../utils/Context.sol";
 
 
-contract Feeless {
+/**
+ * @title Feeless
+ * @dev Meta-transactions, a relayer sends a call signed by another account and pays its gas.
+ *      The contract is its own trusted forwarder: performFeelessTransaction() appends the
+ *      signer address to the calldata of the self-call and _msgSender() recovers it,
+ *      so no storage is written to keep the sender.
+ *      Nonces are two-dimensional: the upper 192 bits are a lane key chosen by the signer
+ *      and the lower 64 bits a sequence enforced in order within the lane. Meta-transactions
+ *      on different lanes can be executed in any order.
+ */
+contract Feeless is Context {
 
-    address internal msgSender;
-    mapping(address => uint256) public nonces;
+    // signer => lane key => next sequence number
+    mapping(address => mapping(uint192 => uint64)) internal nonceSequences;
 
-    modifier feeless {
-        if (msgSender == address(0)) {
-            msgSender = msg.sender;
-            _;
-            msgSender = address(0);
+    /**
+     * @dev Sender of the call, the signer of the meta-transaction when relayed
+     *      by performFeelessTransaction(), msg.sender otherwise.
+     */
+    function _msgSender() internal view returns (address payable sender) {
+        if (msg.sender == address(this) && msg.data.length >= 24) {
+            assembly {
+                sender := shr(96, calldataload(sub(calldatasize(), 20)))
+            }
         } else {
-            _;
+            sender = msg.sender;
         }
     }
 
     function isFeelessTransaction() internal view returns(bool) {
-        return msgSender != msg.sender;
+        return msg.sender == address(this);
     }
 
-    function performFeelessTransaction(address sender, address target, bytes memory data, uint256 nonce, uint256 expiryDateSecs, bytes memory sig) public payable {
-    //function performFeelessTransaction(address sender, address target, bytes memory data, uint256 nonce, bytes memory sig) public payable {
+    /**
+     * @dev Recovers the signer of `hash` reading r, s and v straight from the `sig` calldata
+     *      argument of performFeelessTransaction(), the sixth ABI head word holds its offset.
+     * @param hash Signed message hash
+     */
+    function recoverCalldataSignature(bytes32 hash) internal pure returns(address) {
+        bytes32 r;
+        bytes32 s;
+        uint8 v;
+        assembly {
+            let sigStart := add(add(4, calldataload(164)), 32)
+            r := calldataload(sigStart)
+            s := calldataload(add(sigStart, 32))
+            v := byte(0, calldataload(add(sigStart, 64)))
+        }
+        return ECRecovery.recover(hash, v, r, s);
+    }
+
+    /**
+     * @dev Observer method, next nonce to sign for `sender` on lane `key`.
+     * @param sender Signer of the meta-transactions
+     * @param key Lane of the nonce
+     */
+    function getNonce(address sender, uint192 key) public view returns(uint256) {
+        return (uint256(key) << 64) | nonceSequences[sender][key];
+    }
+
+    function performFeelessTransaction(address sender, address target, bytes calldata data, uint256 nonce, uint256 expiryDateSecs, bytes calldata sig) external payable {
         require(address(this) == target, "Contract target can only be the same contract.");
+        require(sig.length == 65, "Feeless metatx signature must be 65 bytes long.");
 
-        bytes memory prefix = "\x19Ethereum Signed Message:\n32";
-        bytes32 hash = keccak256(abi.encodePacked(prefix, keccak256(abi.encodePacked(target, data, nonce, expiryDateSecs))));
-        //bytes32 hash = keccak256(abi.encodePacked(prefix, keccak256(abi.encodePacked(target, data, nonce))));
-        msgSender = ECRecovery.recover(hash, sig);
+        bytes32 hash = keccak256(abi.encodePacked("\x19Ethereum Signed Message:\n32",
+            keccak256(abi.encodePacked(target, data, nonce, expiryDateSecs))));
+        address signer = recoverCalldataSignature(hash);
 
-        require(msgSender == sender, "Tx sender can only be the same sender encoded.");
+        // recover() gives address(0) for invalid and high-s signatures, never a valid sender.
+        require(signer != address(0), "Feeless metatx signature is invalid.");
+        require(signer == sender, "Tx sender can only be the same sender encoded.");
 
         // Check the expiry date of the MetaTransaction.
         require(block.timestamp < expiryDateSecs,
                 "Feeless metatx has expired and cannot be executed (check expiryDateSecs).");
 
-        nonces[msgSender] = nonce;
+        // Check and consume the sequence of the nonce lane.
+        {
+            uint192 key = uint192(nonce >> 64);
+            require(uint64(nonce) == nonceSequences[signer][key], "Feeless metatx nonce is not the next one on its lane (check getNonce).");
+            nonceSequences[signer][key]++;
+        }
 
-        bool retBool;
-        bytes memory retBytes;
-        (retBool, retBytes) = target.call.value(msg.value)(data);
+        // Trusted forwarder call, signer goes in the last 20 bytes of calldata.
+        (bool retBool, ) = target.call.value(msg.value)(abi.encodePacked(data, signer));
         require(retBool, "Tx called returned false.");
-        msgSender = address(0);
     }
 
 
-}
\ No newline at end of file
+}
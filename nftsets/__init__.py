@@ -0,0 +1,3 @@
+"""
+Off-chain Python helpers for the solidity-nft-sets contracts.
+"""
@@ -0,0 +1,203 @@
+"""
+Off-chain seat allocator in front of buyTicketsBatchWithTokens().
+
+Buyers get a short-lived hold on distinct seats before they sign, so they do
+not race each other for the same `wasSold` slot on chain. Each section keeps
+a bitmap of taken seats (sold or held), bit i is seatID i + 1. Sections are
+split in stripes of `stripeSize` seats, each with its own lock and holds, and
+a hold request starts on a random stripe so concurrent buyers of the same
+section rarely wait on the same lock. Expired holds are reclaimed lazily when
+a stripe runs out of free seats.
+"""
+import itertools
+import random
+import threading
+import time
+
+HOLD_SECONDS = 30
+STRIPE_SIZE = 256
+
+
+class SeatsUnavailable(ValueError):
+    pass
+
+
+class SeatHold:
+    """
+    Seats granted to one buyer until `expiry` (allocator clock).
+    """
+    def __init__(self, holdID, sectionID, seatIDs, expiry, stripes):
+        self.holdID = holdID
+        self.sectionID = sectionID
+        self.seatIDs = seatIDs
+        self.expiry = expiry
+        # (stripe, bitmap of the held seats in the stripe)
+        self.stripes = stripes
+
+    def __repr__(self):
+        return 'SeatHold(%d, section=%d, seats=%s)' % (self.holdID, self.sectionID, self.seatIDs)
+
+
+class Stripe:
+    def __init__(self, firstSeatID, size):
+        self.lock = threading.Lock()
+        self.firstSeatID = firstSeatID
+        self.full = (1 << size) - 1
+        self.taken = 0
+        self.holds = {}
+
+    def reclaimExpired(self, now):
+        for holdID, (expiry, bits) in list(self.holds.items()):
+            if expiry <= now:
+                self.taken &= ~bits
+                del self.holds[holdID]
+
+    def take(self, count):
+        """
+        Marks up to `count` free seats, lowest seatIDs first. Returns their bitmap. Lock must be held.
+        """
+        free = self.full & ~self.taken
+        bits = 0
+        while free and count:
+            bit = free & -free
+            bits |= bit
+            free ^= bit
+            count -= 1
+        self.taken |= bits
+        return bits
+
+    def seatIDs(self, bits):
+        return [self.firstSeatID + i for i in range(bits.bit_length()) if bits >> i & 1]
+
+
+class SeatAllocator:
+    """
+    Grants holds on the seats of one event.
+    `sections` maps sectionID to its size, `sold` lists the (sectionID, seatID) already sold.
+    """
+    def __init__(self, sections, sold=(), holdSeconds=HOLD_SECONDS, stripeSize=STRIPE_SIZE, clock=time.monotonic):
+        self.holdSeconds = holdSeconds
+        self.stripeSize = stripeSize
+        self.clock = clock
+        self.holdIDs = itertools.count(1)
+        self.stripes = {}
+        for sectionID, size in sections.items():
+            self.stripes[sectionID] = [Stripe(first, min(stripeSize, size - first + 1))
+                                       for first in range(1, size + 1, stripeSize)]
+        for sectionID, seatID in sold:
+            self.markSold(sectionID, seatID)
+
+    @classmethod
+    def fromChain(cls, events, eventID, **kwargs):
+        """
+        Seeds the bitmaps from the sections and the sold seats of `eventID` on chain.
+        """
+        sections, sold = {}, []
+        for sectionID in range(1, events.numberOfSections(eventID) + 1):
+            sections[sectionID] = events.sectionSize(eventID, sectionID)
+            sold.extend((sectionID, seatID) for seatID in range(1, sections[sectionID] + 1)
+                        if not events.ticketIsAvailable(eventID, sectionID, seatID))
+        return cls(sections, sold, **kwargs)
+
+    @classmethod
+    def fromSeatState(cls, state, eventID, **kwargs):
+        """
+        Seeds the bitmaps from the sections and the sold seats of `eventID` in a SeatState.
+        """
+        sections, sold = {}, []
+        for _, sectionID, size in state.sections(eventID):
+            sections[sectionID] = size
+            sold.extend((sectionID, seatID) for seatID in state.soldSeatIDs(eventID, sectionID))
+        return cls(sections, sold, **kwargs)
+
+    def stripeOf(self, sectionID, seatID):
+        return self.stripes[sectionID][(seatID - 1) // self.stripeSize]
+
+    def markSold(self, sectionID, seatID):
+        stripe = self.stripeOf(sectionID, seatID)
+        with stripe.lock:
+            stripe.taken |= 1 << (seatID - stripe.firstSeatID)
+
+    def hold(self, sectionID, count):
+        """
+        Holds `count` seats of a section, not necessarily adjacent. Raises SeatsUnavailable if
+        there are not that many free seats.
+        """
+        if sectionID not in self.stripes:
+            raise SeatsUnavailable("Section %d does not exist." % sectionID)
+        holdID = next(self.holdIDs)
+        now = self.clock()
+        expiry = now + self.holdSeconds
+        stripes = self.stripes[sectionID]
+        start = random.randrange(len(stripes))
+        taken, missing = [], count
+
+        # Only one stripe lock is held at a time, so concurrent holds never deadlock.
+        for stripe in stripes[start:] + stripes[:start]:
+            with stripe.lock:
+                bits = stripe.take(missing)
+                if bin(bits).count('1') < missing:
+                    stripe.reclaimExpired(now)
+                    bits |= stripe.take(missing - bin(bits).count('1'))
+                if bits:
+                    stripe.holds[holdID] = (expiry, bits)
+                    taken.append((stripe, bits))
+                    missing -= bin(bits).count('1')
+            if not missing:
+                break
+
+        hold = SeatHold(holdID, sectionID, sorted(s for stripe, bits in taken for s in stripe.seatIDs(bits)),
+                        expiry, taken)
+        if missing:
+            self.release(hold)
+            raise SeatsUnavailable("Only %d free seats left in section %d." % (count - missing, sectionID))
+        return hold
+
+    def confirm(self, hold):
+        """
+        Keeps the seats of a hold taken for good, after its purchase was mined.
+        """
+        for stripe, bits in hold.stripes:
+            with stripe.lock:
+                stripe.holds.pop(hold.holdID, None)
+
+    def release(self, hold):
+        """
+        Frees the seats of a hold, unless it already expired and they were given to someone else.
+        """
+        for stripe, bits in hold.stripes:
+            with stripe.lock:
+                if stripe.holds.pop(hold.holdID, None) is not None:
+                    stripe.taken &= ~bits
+
+    def buy(self, events, eventID, hold, buyer):
+        """
+        Sends buyTicketsBatchWithTokens() for the held seats. On success the seats stay taken.
+        On revert the held seats that were sold on chain anyway are kept taken, the others
+        are released, and the error is raised again.
+        """
+        from brownie.exceptions import VirtualMachineError
+
+        try:
+            tx = events.buyTicketsBatchWithTokens(eventID, [hold.sectionID] * len(hold.seatIDs), hold.seatIDs,
+                                                  {'from': buyer})
+        except VirtualMachineError:
+            sold = [s for s in hold.seatIDs if not events.ticketIsAvailable(eventID, hold.sectionID, s)]
+            self.release(hold)
+            for seatID in sold:
+                self.markSold(hold.sectionID, seatID)
+            raise
+        self.confirm(hold)
+        return tx
+
+    def available(self, sectionID):
+        """
+        Number of free seats of a section, expired holds count as free.
+        """
+        now = self.clock()
+        free = 0
+        for stripe in self.stripes[sectionID]:
+            with stripe.lock:
+                stripe.reclaimExpired(now)
+                free += bin(stripe.full & ~stripe.taken).count('1')
+        return free
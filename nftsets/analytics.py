@@ -0,0 +1,493 @@
+"""
+Columnar export of the ticketing state for analytics, to Parquet files that pyarrow, pandas,
+DuckDB or Spark read directly. pyarrow is imported on the first file written.
+
+Incremental tables, one Parquet file per chunk of blocks under <table>/:
+    purchases  one row per purchase (ReceivedTokens log): buyer, tokens paid, price of the seats, fees
+    tickets    one row per seat sold, with its buyer and price
+    transfers  one row per ticket moved by safeTransferFrom/safeBatchTransferFrom, the resales
+The seats of a purchase are not in its logs, they are decoded from the calldata of the
+transaction: the buy* functions of the service, called directly or wrapped in
+performFeelessTransaction. Purchases made through another contract are written without seats
+and counted as unattributed in the manifest.
+
+Snapshot tables, rewritten on each run with the state at the last exported block:
+    events     record of every event, with its funds not withdrawn yet
+    sections   size, price and fee of every section
+    platforms  fees collected and not withdrawn yet, per platform of the events
+    owners     current owner of every ticket sold, from the tickets and transfers tables, in passes
+               over ranges of events of at most `ownersPassRows` rows
+
+Transactions, blocks and calls are fetched in JSON-RPC batches of `rpcBatch` and rows are
+written in row groups of `rowGroupSize`, so memory stays bounded whatever the number of
+tickets. The files of a chunk are renamed into place before the manifest records its last
+block: a rerun resumes after that block, an interrupted chunk is exported again.
+
+    python -m nftsets.analytics --rpc http://127.0.0.1:8545 --deployment deployments/development.json --out exports
+"""
+import argparse
+import os
+import struct
+import time
+
+from nftsets.client.abi import decodeArgs
+from nftsets.client.contracts import EventMasterClient
+from nftsets.client.rpc import HttpRpc
+from nftsets.deploy import readManifest, writeManifest
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+CHUNK_BLOCKS = 1000
+ROW_GROUP_SIZE = 2**16
+OWNERS_PASS_ROWS = 2**17
+RPC_BATCH = 100
+
+# Same encodings as buyTicketsPackedWithTokens() and buyTicketRangesPackedWithTokens().
+PACKED_SEAT_FORMAT = '>HH'
+PACKED_RANGE_FORMAT = '>HHH'
+
+# Column names and types. Token amounts are decimal(76, 0) in base units of the token: uint128
+# prices take up to 39 digits and the funds, fees and purchase totals are uint256 sums of them.
+# Amounts of 10^76 or more do not fit and fail the write. Ticket IDs fit in 64 bits since
+# eventIDs are 32 bits.
+TABLES = {
+    'purchases': [('block', 'uint64'), ('timestamp', 'timestamp'), ('txHash', 'string'), ('logIndex', 'uint32'),
+                  ('eventID', 'uint32'), ('buyer', 'string'), ('token', 'string'), ('tickets', 'uint32'),
+                  ('paid', 'amount'), ('price', 'amount'), ('fees', 'amount')],
+    'tickets': [('block', 'uint64'), ('timestamp', 'timestamp'), ('txHash', 'string'), ('logIndex', 'uint32'),
+                ('ticketID', 'uint64'), ('eventID', 'uint32'), ('sectionID', 'uint16'), ('seatID', 'uint16'),
+                ('buyer', 'string'), ('price', 'amount')],
+    'transfers': [('block', 'uint64'), ('timestamp', 'timestamp'), ('txHash', 'string'), ('logIndex', 'uint32'),
+                  ('ticketID', 'uint64'), ('eventID', 'uint32'), ('sectionID', 'uint16'), ('seatID', 'uint16'),
+                  ('operator', 'string'), ('from', 'string'), ('to', 'string'), ('value', 'uint64')],
+    'events': [('eventID', 'uint32'), ('owner', 'string'), ('platID', 'uint64'), ('sections', 'uint16'),
+               ('totalSeats', 'uint16'), ('startSellingDate', 'timestamp'), ('startWithdrawalDate', 'timestamp'),
+               ('funds', 'amount')],
+    'sections': [('eventID', 'uint32'), ('sectionID', 'uint16'), ('size', 'uint16'), ('price', 'amount'),
+                 ('fee', 'amount')],
+    'platforms': [('platID', 'uint64'), ('feesCollected', 'amount')],
+    'owners': [('ticketID', 'uint64'), ('owner', 'string')],
+}
+INCREMENTAL_TABLES = ('purchases', 'tickets', 'transfers')
+
+
+class ExportError(Exception):
+    pass
+
+
+def arrowSchema(table):
+    import pyarrow as pa
+
+    types = {'uint16': pa.uint16(), 'uint32': pa.uint32(), 'uint64': pa.uint64(), 'string': pa.string(),
+             'amount': pa.decimal256(76, 0), 'timestamp': pa.timestamp('s', tz='UTC')}
+    return pa.schema([(name, types[typ]) for name, typ in TABLES[table]])
+
+
+class ParquetPart:
+    """
+    Rows of one table written to the Parquet file at `path`, in row groups of `rowGroupSize`.
+    The file is written as <path>.tmp and renamed by close(), no file is left without rows.
+    """
+    def __init__(self, path, table, rowGroupSize=ROW_GROUP_SIZE):
+        self.path = path
+        self.table = table
+        self.rowGroupSize = rowGroupSize
+        self.columns = [[] for _ in TABLES[table]]
+        self.writer = None
+        self.rows = 0
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        if len(self.columns[0]) >= self.rowGroupSize:
+            self.flush()
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = arrowSchema(self.table)
+        arrays = [pa.array(column, type=field.type) for column, field in zip(self.columns, schema)]
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.writer = pq.ParquetWriter(self.path + '.tmp', schema)
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        self.rows += len(self.columns[0])
+        self.columns = [[] for _ in self.columns]
+
+    def close(self):
+        """
+        Writes the remaining rows and renames the file into place, gives whether it has rows.
+        """
+        self.flush()
+        if self.writer is None:
+            return False
+        self.writer.close()
+        os.replace(self.path + '.tmp', self.path)
+        return True
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def ticketFields(ticketID):
+    return ticketID >> 32, (ticketID >> 16) & 0xffff, ticketID & 0xffff
+
+
+def decodeLogData(types, data):
+    return decodeArgs(types, bytes.fromhex(data[2:]))
+
+
+def topicAddress(topic):
+    return '0x' + topic[-40:]
+
+
+# Tables of the moves of tickets and the column of the owner they leave the ticket to.
+MOVES = (('tickets', 'buyer'), ('transfers', 'to'))
+
+
+def eventRanges(counts, passRows):
+    """
+    Consecutive ranges (first, last) of the eventIDs of `counts`, {eventID: rows}, each of at
+    most `passRows` rows unless a single event has more.
+    """
+    ranges = []
+    first, rows = None, 0
+    for eventID in sorted(counts):
+        if first is not None and rows + counts[eventID] > passRows:
+            ranges.append((first, last))
+            first, rows = None, 0
+        if first is None:
+            first = eventID
+        last, rows = eventID, rows + counts[eventID]
+    if first is not None:
+        ranges.append((first, last))
+    return ranges
+
+
+def ownerPasses(directory, manifest=None, passRows=OWNERS_PASS_ROWS):
+    """
+    pyarrow Tables with the owner of every ticket sold, by ticketID, one per range of events.
+    A pass only reads the moves of its events, so memory is bounded by `passRows` moves, not by
+    the number of tickets.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    manifest = manifest or readManifest(os.path.join(directory, MANIFEST_NAME))
+    datasets = []
+    counts = {}
+    for table, ownerColumn in MOVES:
+        paths = [os.path.join(directory, part) for part in manifest.get('parts', {}).get(table, [])]
+        if not paths:
+            continue
+        datasets.append((ds.dataset(paths, schema=arrowSchema(table), format='parquet'), ownerColumn))
+        for path in paths:
+            for batch in pq.ParquetFile(path).iter_batches(columns=['eventID']):
+                for item in pc.value_counts(batch.column(0)).to_pylist():
+                    counts[item['values']] = counts.get(item['values'], 0) + item['counts']
+    for first, last in eventRanges(counts, passRows):
+        events = (ds.field('eventID') >= first) & (ds.field('eventID') <= last)
+        moves = pa.concat_tables([
+            dataset.to_table(columns=['ticketID', 'block', 'logIndex', ownerColumn], filter=events)
+                   .rename_columns(['ticketID', 'block', 'logIndex', 'owner']) for dataset, ownerColumn in datasets])
+        moves = moves.sort_by([('ticketID', 'ascending'), ('block', 'descending'), ('logIndex', 'descending')])
+        ticketIDs = moves['ticketID'].combine_chunks()
+        # Rows are sorted by ticket with the latest move first, keep the first row of each ticket.
+        latest = pa.concat_arrays([pa.array([True]), pc.not_equal(ticketIDs[1:], ticketIDs[:-1])])
+        yield moves.filter(latest).select(['ticketID', 'owner'])
+
+
+def currentOwners(directory, manifest=None, passRows=OWNERS_PASS_ROWS):
+    """
+    pyarrow Table with the owner of every ticket sold: the recipient of its last transfer, or its buyer.
+    """
+    import pyarrow as pa
+
+    return pa.concat_tables([arrowSchema('owners').empty_table()] + list(ownerPasses(directory, manifest, passRows)))
+
+
+class PurchaseDecoder:
+    """
+    Seats bought by the transactions sent to the service of `service`, an EventMasterClient.
+    """
+    def __init__(self, service):
+        self.address = service.address.lower()
+        self.functions = {function.selector: function for function in service.functions.values()}
+
+    def decode(self, tx):
+        """
+        (eventID, [(sectionID, seatID)]) bought by a transaction as given by eth_getTransactionByHash,
+        None if it is not a purchase sent to the service.
+        """
+        if (tx.get('to') or '').lower() != self.address:
+            return None
+        return self.decodeCalldata(tx['input'])
+
+    def decodeCalldata(self, data):
+        """
+        (eventID, [(sectionID, seatID)]) bought by the calldata of a transaction, None if it is
+        not a purchase on this service.
+        """
+        raw = bytes.fromhex(data[2:])
+        function = self.functions.get('0x' + raw[:4].hex())
+        if function is None:
+            return None
+        args = decodeArgs(function.inputs, raw[4:])
+        if function.name == 'performFeelessTransaction':
+            # The service calls itself with the signed data, the signer appended is ignored.
+            return self.decodeCalldata('0x' + args[2].hex()) if args[1] == self.address else None
+        if function.name in ('buyTicketWithTokens', 'buyTicketWithPermit'):
+            return args[0], [(args[1], args[2])]
+        if function.name in ('buyTicketsBatchWithTokens', 'buyTicketsBatchWithPermit'):
+            return args[0], list(zip(args[1], args[2]))
+        if function.name == 'buyTicketsPackedWithTokens':
+            return args[0], list(struct.iter_unpack(PACKED_SEAT_FORMAT, args[1]))
+        if function.name == 'buyTicketRangesPackedWithTokens':
+            return args[0], [(sectionID, seatID) for sectionID, firstSeatID, count in
+                             struct.iter_unpack(PACKED_RANGE_FORMAT, args[1])
+                             for seatID in range(firstSeatID, firstSeatID + count)]
+        return None
+
+
+class Exporter:
+    """
+    Exports the EventMasterService at `address` to the Parquet files of `directory`, see the module
+    documentation. Blocks before `fromBlock` are skipped, the last `confirmations` blocks are left
+    for a later run.
+    """
+    def __init__(self, rpc, address, directory, fromBlock=0, confirmations=0, chunkBlocks=CHUNK_BLOCKS,
+                 rowGroupSize=ROW_GROUP_SIZE, rpcBatch=RPC_BATCH, ownersPassRows=OWNERS_PASS_ROWS):
+        self.rpc = rpc
+        self.address = address.lower()
+        self.service = EventMasterClient(rpc, address)
+        self.directory = directory
+        self.fromBlock = fromBlock
+        self.confirmations = confirmations
+        self.chunkBlocks = chunkBlocks
+        self.rowGroupSize = rowGroupSize
+        self.rpcBatch = rpcBatch
+        self.ownersPassRows = ownersPassRows
+        self.decoder = PurchaseDecoder(self.service)
+        self.topics = {event['name']: topic for topic, event in self.service.events.items()}
+        # Sections never change price, cached by (eventID, sectionID).
+        self.prices = {}
+
+    def manifestPath(self):
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def sectionPrices(self, seats):
+        missing = sorted({seat for seat in seats if seat not in self.prices})
+        for batch in chunks(missing, self.rpcBatch):
+            self.prices.update(zip(batch, self.service.callBatch('sectionPrice', batch)))
+        return self.prices
+
+    def timestamps(self, blocks):
+        blocks = sorted(blocks)
+        found = {}
+        for batch in chunks(blocks, self.rpcBatch):
+            results = self.rpc.batch('eth_getBlockByNumber', [[hex(block), False] for block in batch])
+            found.update((block, int(result['timestamp'], 16)) for block, result in zip(batch, results))
+        return found
+
+    def exportLogs(self, logs, parts):
+        """
+        Appends the rows of a slice of logs of the service to `parts`, gives the number of
+        purchases that could not be attributed to seats.
+        """
+        purchases = [log for log in logs if log['topics'] and log['topics'][0] == self.topics['ReceivedTokens']]
+        transactions = dict(zip([log['transactionHash'] for log in purchases],
+                                self.rpc.batch('eth_getTransactionByHash', [[log['transactionHash']] for log in purchases])))
+        blockTimes = self.timestamps({int(log['blockNumber'], 16) for log in logs})
+        decoded = {txHash: self.decoder.decode(tx) for txHash, tx in transactions.items()}
+        prices = self.sectionPrices([(purchase[0], sectionID) for purchase in decoded.values() if purchase
+                                     for sectionID, seatID in purchase[1]])
+        unattributed = 0
+        for log in logs:
+            if not log['topics']:
+                continue
+            block, logIndex, txHash = int(log['blockNumber'], 16), int(log['logIndex'], 16), log['transactionHash']
+            head = (block, blockTimes[block], txHash, logIndex)
+            topic = log['topics'][0]
+            if topic == self.topics['ReceivedTokens']:
+                buyer, paid, token = decodeLogData(['address', 'uint256', 'address'], log['data'])
+                purchase = decoded[txHash]
+                if purchase is None:
+                    unattributed += 1
+                    parts['purchases'].append(head + (None, buyer, token, None, paid, None, None))
+                    continue
+                eventID, seats = purchase
+                price = 0
+                for sectionID, seatID in seats:
+                    seatPrice = prices[(eventID, sectionID)]
+                    price += seatPrice
+                    parts['tickets'].append(head + ((eventID << 32) | (sectionID << 16) | seatID, eventID, sectionID,
+                                                    seatID, buyer, seatPrice))
+                parts['purchases'].append(head + (eventID, buyer, token, len(seats), paid, price, paid - price))
+            elif topic in (self.topics['TransferSingle'], self.topics['TransferBatch']):
+                operator, sender, recipient = [topicAddress(t) for t in log['topics'][1:4]]
+                if topic == self.topics['TransferSingle']:
+                    ticketIDs, values = [[v] for v in decodeLogData(['uint256', 'uint256'], log['data'])]
+                else:
+                    ticketIDs, values = decodeLogData(['uint256[]', 'uint256[]'], log['data'])
+                for ticketID, value in zip(ticketIDs, values):
+                    parts['transfers'].append(head + (ticketID,) + ticketFields(ticketID) +
+                                              (operator, sender, recipient, value))
+        return unattributed
+
+    def exportChunk(self, firstBlock, lastBlock):
+        """
+        Exports the logs of blocks firstBlock to lastBlock, gives {table: file} of the files
+        written and the number of unattributed purchases.
+        """
+        logs = self.rpc.request('eth_getLogs', [{'address': self.address, 'fromBlock': hex(firstBlock),
+                                                 'toBlock': hex(lastBlock)}])
+        name = 'blocks-%010d-%010d.parquet' % (firstBlock, lastBlock)
+        parts = {table: ParquetPart(os.path.join(self.directory, table, name), table, self.rowGroupSize)
+                 for table in INCREMENTAL_TABLES}
+        unattributed = 0
+        for batch in chunks(logs, self.rpcBatch):
+            unattributed += self.exportLogs(batch, parts)
+        written = {}
+        for table, part in parts.items():
+            if part.close():
+                written[table] = (os.path.join(table, name), part.rows)
+        return written, unattributed
+
+    def exportSnapshot(self, block):
+        """
+        Rewrites the events, sections and platforms tables with the state at `block`.
+        """
+        tag = hex(block)
+        parts = {table: ParquetPart(os.path.join(self.directory, table + '.parquet'), table, self.rowGroupSize)
+                 for table in ('events', 'sections', 'platforms')}
+        platforms = set()
+        numberOfEvents = self.service.call('numberOfEvents', block=tag)
+        for eventIDs in chunks(range(1, numberOfEvents + 1), self.rpcBatch):
+            sections = []
+            for eventID, info in zip(eventIDs, self.service.callBatch('eventInfo', [(e,) for e in eventIDs], tag)):
+                parts['events'].append((eventID,) + tuple(info))
+                platforms.add(info[1])
+                sections.extend((eventID, sectionID) for sectionID in range(1, info[2] + 1))
+            for batch in chunks(sections, self.rpcBatch):
+                sizes = self.service.callBatch('sectionSize', batch, tag)
+                prices = self.service.callBatch('sectionPrice', batch, tag)
+                fees = self.service.callBatch('sectionFee', batch, tag)
+                for row in zip(batch, sizes, prices, fees):
+                    parts['sections'].append(row[0] + row[1:])
+        platforms = sorted(platforms)
+        for batch in chunks(platforms, self.rpcBatch):
+            for platID, fees in zip(batch, self.service.callBatch('feesCollected', [(p,) for p in batch], tag)):
+                parts['platforms'].append((platID, fees))
+        return {table: part.rows for table, part in parts.items() if part.close()}
+
+    def writeOwners(self, manifest):
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.directory, 'owners.parquet')
+        writer = pq.ParquetWriter(path + '.tmp', arrowSchema('owners'))
+        rows = 0
+        for owners in ownerPasses(self.directory, manifest, self.ownersPassRows):
+            writer.write_table(owners, row_group_size=self.rowGroupSize)
+            rows += owners.num_rows
+        writer.close()
+        os.replace(path + '.tmp', path)
+        return rows
+
+    def removeUnlisted(self, manifest):
+        """
+        Removes the files of a chunk interrupted before the manifest listed them.
+        """
+        for table in INCREMENTAL_TABLES:
+            listed = set(manifest.get('parts', {}).get(table, []))
+            directory = os.path.join(self.directory, table)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith('.parquet.tmp') or \
+                        (name.endswith('.parquet') and os.path.join(table, name) not in listed):
+                    os.remove(os.path.join(directory, name))
+
+    def run(self, toBlock=None, log=print):
+        """
+        Exports the blocks after the last exported one, up to `toBlock` or the latest block less
+        the confirmations, and refreshes the snapshot tables. Returns the manifest.
+        """
+        start = time.time()
+        chainId = int(self.rpc.request('eth_chainId'), 16)
+        manifest = readManifest(self.manifestPath())
+        if manifest and (manifest.get('events') != self.address or manifest.get('chainId') != chainId):
+            raise ExportError("%s has the export of %s on chain %s." % (self.directory, manifest.get('events'),
+                                                                       manifest.get('chainId')))
+        manifest = manifest or {'version': MANIFEST_VERSION, 'chainId': chainId, 'events': self.address,
+                                'firstBlock': self.fromBlock, 'lastBlock': self.fromBlock - 1,
+                                'parts': {table: [] for table in INCREMENTAL_TABLES},
+                                'rows': {table: 0 for table in INCREMENTAL_TABLES}, 'unattributed': 0}
+        self.removeUnlisted(manifest)
+        head = int(self.rpc.request('eth_blockNumber'), 16) - self.confirmations
+        if toBlock is not None:
+            head = min(head, toBlock)
+        head = max(head, manifest['lastBlock'])
+        stats = {'blocks': 0, 'rows': {table: 0 for table in INCREMENTAL_TABLES}, 'unattributed': 0}
+        for firstBlock in range(manifest['lastBlock'] + 1, head + 1, self.chunkBlocks):
+            lastBlock = min(firstBlock + self.chunkBlocks - 1, head)
+            written, unattributed = self.exportChunk(firstBlock, lastBlock)
+            for table, (part, rows) in written.items():
+                manifest['parts'][table].append(part)
+                manifest['rows'][table] += rows
+                stats['rows'][table] += rows
+            manifest['unattributed'] += unattributed
+            manifest['lastBlock'] = lastBlock
+            stats['blocks'] += lastBlock - firstBlock + 1
+            stats['unattributed'] += unattributed
+            writeManifest(self.manifestPath(), manifest)
+            log('blocks %d-%d: %s' % (firstBlock, lastBlock,
+                                      ', '.join('%d %s' % (rows, table) for table, (part, rows) in sorted(written.items()))
+                                      or 'no rows'))
+        stats['logSeconds'] = time.time() - start
+        if manifest['lastBlock'] >= manifest['firstBlock']:
+            manifest['snapshot'] = dict(self.exportSnapshot(manifest['lastBlock']), block=manifest['lastBlock'])
+            manifest['snapshot']['owners'] = self.writeOwners(manifest)
+        stats['seconds'] = time.time() - start
+        stats['ticketsPerSecond'] = stats['rows']['tickets'] / stats['logSeconds'] if stats['logSeconds'] else 0
+        manifest['lastRun'] = stats
+        writeManifest(self.manifestPath(), manifest)
+        log('%d blocks, %d tickets, %d transfers, %d unattributed purchases in %.2fs (%.0f tickets/s), snapshot at '
+            'block %d' % (stats['blocks'], stats['rows']['tickets'], stats['rows']['transfers'], stats['unattributed'],
+                          stats['seconds'], stats['ticketsPerSecond'], manifest['lastBlock']))
+        return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exports the ticketing state to Parquet files, incrementally.")
+    parser.add_argument('--rpc', default='http://127.0.0.1:8545')
+    parser.add_argument('--out', default='exports', help="directory of the Parquet files and their manifest")
+    parser.add_argument('--events', help="address of the EventMasterService")
+    parser.add_argument('--deployment', help="manifest of nftsets.deploy giving the address and first block instead")
+    parser.add_argument('--from-block', type=int, default=0)
+    parser.add_argument('--to-block', type=int)
+    parser.add_argument('--confirmations', type=int, default=0, help="latest blocks left for a later run")
+    parser.add_argument('--chunk-blocks', type=int, default=CHUNK_BLOCKS)
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    parser.add_argument('--batch', type=int, default=RPC_BATCH, help="requests per JSON-RPC batch")
+    options = parser.parse_args(argv)
+
+    address, fromBlock = options.events, options.from_block
+    if options.deployment:
+        events = readManifest(options.deployment)['steps']['events']
+        address, fromBlock = events['address'], max(fromBlock, events['blockNumber'])
+    if not address:
+        parser.error("--events or --deployment is needed.")
+    exporter = Exporter(HttpRpc(options.rpc), address, options.out, fromBlock, options.confirmations,
+                        options.chunk_blocks, options.row_group_size, options.batch)
+    exporter.run(options.to_block)
+
+
+if __name__ == '__main__':
+    main()
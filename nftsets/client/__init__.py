@@ -0,0 +1,16 @@
+"""
+Lean client of the ticketing contracts for production services, without brownie or web3.
+
+ABIs, selectors and event topics are bundled in abis.json (refreshed from the build with
+`brownie run export_client_abis`), calls go over plain JSON-RPC and eth_account is only
+imported to sign the first local transaction. Importing this package takes a few ms.
+
+    rpc = HttpRpc('http://127.0.0.1:8545')
+    events = EventMasterClient(rpc, eventsAddress, privateKey=key)
+    events.checkPurchase(buyer, eventID, [1, 1], [7, 8])
+    receipt = events.buyTicketsBatchWithTokens(eventID, [1, 1], [7, 8])
+"""
+from nftsets.client.rpc import HttpRpc, RpcError
+from nftsets.client.abi import AbiError
+from nftsets.client.contracts import EventMasterClient, IdentityMasterClient, IdentityResolverClient, \
+    TransactionReverted, Receipt
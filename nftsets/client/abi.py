@@ -0,0 +1,115 @@
+"""
+Minimal ABI encoding for the client: static and dynamic arrays, bytes, strings and the
+elementary types the contracts use. Selectors and event topics come precomputed in
+abis.json, so nothing here needs keccak. Addresses are returned lowercase.
+"""
+import json
+import os
+import re
+
+ABIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'abis.json')
+WORD = 32
+
+_abis = None
+
+
+def loadAbis():
+    """
+    ABIs of the bundled contracts by contract name, read once.
+    """
+    global _abis
+    if _abis is None:
+        with open(ABIS_PATH) as f:
+            _abis = json.load(f)
+    return _abis
+
+
+class AbiError(ValueError):
+    pass
+
+
+def isDynamic(typ):
+    return typ in ('bytes', 'string') or typ.endswith('[]')
+
+
+def toInt(data):
+    return int.from_bytes(data, 'big')
+
+
+def encodeStatic(typ, value):
+    match = re.match(r'^(u?)int(\d*)$', typ)
+    if match:
+        bits = int(match.group(2) or 256)
+        low, high = (0, 2**bits) if match.group(1) else (-2**(bits - 1), 2**(bits - 1))
+        if not isinstance(value, int) or isinstance(value, bool) or not low <= value < high:
+            raise AbiError("%r is not a valid %s." % (value, typ))
+        return (value % 2**256).to_bytes(WORD, 'big')
+    if typ == 'bool':
+        return (1 if value else 0).to_bytes(WORD, 'big')
+    if typ == 'address':
+        address = value if isinstance(value, str) else getattr(value, 'address', '')
+        if not re.match(r'^0x[0-9a-fA-F]{40}$', address):
+            raise AbiError("%r is not a valid address." % (value,))
+        return bytes(12) + bytes.fromhex(address[2:])
+    match = re.match(r'^bytes(\d+)$', typ)
+    if match:
+        data = bytes.fromhex(value[2:]) if isinstance(value, str) else bytes(value)
+        if len(data) > int(match.group(1)):
+            raise AbiError("%r is longer than %s." % (value, typ))
+        return data.ljust(WORD, b'\0')
+    raise AbiError("Unsupported type %s." % typ)
+
+
+def encodeDynamic(typ, value):
+    if typ in ('bytes', 'string'):
+        data = value.encode() if typ == 'string' else (bytes.fromhex(value[2:]) if isinstance(value, str) else bytes(value))
+        return len(data).to_bytes(WORD, 'big') + data.ljust((len(data) + WORD - 1) // WORD * WORD, b'\0')
+    values = list(value)
+    return len(values).to_bytes(WORD, 'big') + encodeArgs([typ[:-2]] * len(values), values)
+
+
+def encodeArgs(types, values):
+    if len(types) != len(values):
+        raise AbiError("Expected %d arguments, got %d." % (len(types), len(values)))
+    heads, tails, offset = [], [], WORD * len(types)
+    for typ, value in zip(types, values):
+        if isDynamic(typ):
+            tail = encodeDynamic(typ, value)
+            heads.append(offset.to_bytes(WORD, 'big'))
+            tails.append(tail)
+            offset += len(tail)
+        else:
+            heads.append(encodeStatic(typ, value))
+    return b''.join(heads + tails)
+
+
+def decodeStatic(typ, word):
+    match = re.match(r'^(u?)int(\d*)$', typ)
+    if match:
+        value = toInt(word)
+        return value - 2**256 if not match.group(1) and value >= 2**255 else value
+    if typ == 'bool':
+        return toInt(word) != 0
+    if typ == 'address':
+        return '0x' + word[12:].hex()
+    match = re.match(r'^bytes(\d+)$', typ)
+    if match:
+        return word[:int(match.group(1))]
+    raise AbiError("Unsupported type %s." % typ)
+
+
+def decodeArgs(types, data, start=0):
+    values = []
+    for i, typ in enumerate(types):
+        word = data[start + WORD * i:start + WORD * (i + 1)]
+        if not isDynamic(typ):
+            values.append(decodeStatic(typ, word))
+            continue
+        offset = start + toInt(word)
+        length = toInt(data[offset:offset + WORD])
+        if typ in ('bytes', 'string'):
+            raw = data[offset + WORD:offset + WORD + length]
+            values.append(raw.decode() if typ == 'string' else raw)
+        else:
+            values.append(decodeArgs([typ[:-2]] * length, data, offset + WORD))
+    return values
@@ -0,0 +1,353 @@
+"""
+Contract wrappers of the client. Calls are encoded with the bundled ABIs, transactions are
+sent from an account unlocked on the node or signed locally with a private key, in which
+case eth_account is imported on the first transaction.
+"""
+import time
+
+from nftsets.client.abi import loadAbis, encodeArgs, decodeArgs
+from nftsets.client.rpc import RpcError
+
+RECEIPT_POLL_SECONDS = 0.1
+RECEIPT_TIMEOUT_SECONDS = 120
+
+
+class TransactionReverted(Exception):
+    def __init__(self, message, receipt=None):
+        self.receipt = receipt
+        super().__init__(message)
+
+
+class Function:
+    def __init__(self, abi):
+        self.name = abi['name']
+        self.inputs = [i['type'] for i in abi['inputs']]
+        self.outputs = [o['type'] for o in abi['outputs']]
+        self.selector = abi['selector']
+        self.readOnly = abi['stateMutability'] in ('view', 'pure')
+
+    def encode(self, args):
+        return self.selector + encodeArgs(self.inputs, args).hex()
+
+    def decode(self, result):
+        values = decodeArgs(self.outputs, bytes.fromhex(result[2:]))
+        return values[0] if len(values) == 1 else tuple(values)
+
+
+class Receipt:
+    def __init__(self, receipt, returnValue=None):
+        self.txHash = receipt['transactionHash']
+        self.status = int(receipt['status'], 16)
+        self.gasUsed = int(receipt['gasUsed'], 16)
+        self.blockNumber = int(receipt['blockNumber'], 16)
+        self.logs = receipt['logs']
+        # Value returned by the pre-flight call, the state may change before the transaction is mined.
+        self.returnValue = returnValue
+
+
+def signTransaction(tx, privateKey, chainId):
+    """
+    Raw transaction of a JSON-RPC transaction with hex gas, gasPrice, value and nonce. A
+    transaction without `to` creates a contract.
+    """
+    from eth_account import Account
+
+    fields = {'data': tx['data'], 'value': int(tx['value'], 16), 'gas': int(tx['gas'], 16),
+              'gasPrice': int(tx['gasPrice'], 16), 'nonce': int(tx['nonce'], 16), 'chainId': chainId}
+    if tx.get('to'):
+        fields['to'] = tx['to']
+    signed = Account.sign_transaction(fields, privateKey)
+    rawTransaction = getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+    return '0x' + bytes(rawTransaction).hex()
+
+
+def waitForReceipt(rpc, txHash, timeout=RECEIPT_TIMEOUT_SECONDS):
+    deadline = time.time() + timeout
+    while True:
+        receipt = rpc.request('eth_getTransactionReceipt', [txHash])
+        if receipt is not None:
+            return receipt
+        if time.time() > deadline:
+            raise TimeoutError("No receipt for %s after %ds." % (txHash, timeout))
+        time.sleep(RECEIPT_POLL_SECONDS)
+
+
+class ContractClient:
+    """
+    Wrapper of a deployed contract. Transactions are sent from `sender`, unlocked on the node,
+    or from the account of `privateKey`, signed locally.
+    """
+    NAME = None
+
+    def __init__(self, rpc, address, sender=None, privateKey=None, gasPrice=None):
+        self.rpc = rpc
+        self.address = address
+        self.privateKey = privateKey
+        self.sender = sender
+        self.gasPrice = gasPrice
+        abi = loadAbis()[self.NAME]
+        self.functions = {f['name']: Function(f) for f in abi if f['type'] == 'function'}
+        self.events = {e['topic']: e for e in abi if e['type'] == 'event'}
+        self.chainId = None
+
+    def senderAddress(self):
+        if self.sender is None and self.privateKey is not None:
+            from eth_account import Account
+            self.sender = Account.from_key(self.privateKey).address
+        return self.sender
+
+    def call(self, name, *args, block='latest'):
+        function = self.functions[name]
+        tx = {'to': self.address, 'data': function.encode(args)}
+        if self.senderAddress():
+            tx['from'] = self.senderAddress()
+        return function.decode(self.rpc.request('eth_call', [tx, block]))
+
+    def callBatch(self, name, argsList, block='latest'):
+        """
+        Same as call() for each arguments tuple of `argsList`, sent as one JSON-RPC batch.
+        """
+        function = self.functions[name]
+        txs = [{'to': self.address, 'data': function.encode(args)} for args in argsList]
+        return [function.decode(result) for result in self.rpc.batch('eth_call', [[tx, block] for tx in txs])]
+
+    def transact(self, name, *args, value=0, gas=None, preflight=True, wait=True):
+        """
+        Sends a transaction. With `preflight` it is first run with eth_call, which raises
+        RpcError with the revert reason instead of paying for a reverted transaction, and
+        gives the returned value. Returns a Receipt, or the transaction hash if not `wait`.
+        """
+        function = self.functions[name]
+        sender = self.senderAddress()
+        tx = {'from': sender, 'to': self.address, 'data': function.encode(args), 'value': hex(value)}
+        returnValue = None
+        if preflight:
+            returnValue = function.decode(self.rpc.request('eth_call', [tx, 'pending'])) if function.outputs else None
+        tx['gas'] = hex(gas) if gas else self.rpc.request('eth_estimateGas', [tx])
+        tx['gasPrice'] = hex(self.gasPrice) if self.gasPrice else self.rpc.request('eth_gasPrice')
+        try:
+            if self.privateKey is None:
+                txHash = self.rpc.request('eth_sendTransaction', [tx])
+            else:
+                txHash = self.rpc.request('eth_sendRawTransaction', [self.sign(tx)])
+        except RpcError as e:
+            # ganache mines reverting transactions but answers with an error keyed by the tx hash.
+            txHash = next((key for key in e.data if key.startswith('0x')), None) if isinstance(e.data, dict) else None
+            if txHash is None or not wait:
+                raise
+            raise TransactionReverted(str(e), Receipt(self.waitForReceipt(txHash)))
+        if not wait:
+            return txHash
+        receipt = Receipt(self.waitForReceipt(txHash), returnValue)
+        if not receipt.status:
+            raise TransactionReverted("Transaction %s reverted." % txHash, receipt)
+        return receipt
+
+    def sign(self, tx):
+        if self.chainId is None:
+            self.chainId = int(self.rpc.request('eth_chainId'), 16)
+        nonce = self.rpc.request('eth_getTransactionCount', [tx['from'], 'pending'])
+        return signTransaction(dict(tx, nonce=nonce), self.privateKey, self.chainId)
+
+    def waitForReceipt(self, txHash, timeout=RECEIPT_TIMEOUT_SECONDS):
+        return waitForReceipt(self.rpc, txHash, timeout)
+
+    def decodeLogs(self, receipt):
+        """
+        Events of this contract in a receipt, as (name, {argument: value}).
+        """
+        decoded = []
+        for log in receipt.logs:
+            event = self.events.get(log['topics'][0]) if log['topics'] else None
+            if event is None or log['address'].lower() != self.address.lower():
+                continue
+            indexed = [i for i in event['inputs'] if i['indexed']]
+            data = [i for i in event['inputs'] if not i['indexed']]
+            values = dict(zip([i['name'] for i in data],
+                              decodeArgs([i['type'] for i in data], bytes.fromhex(log['data'][2:]))))
+            for i, topic in zip(indexed, log['topics'][1:]):
+                values[i['name']] = decodeArgs([i['type']], bytes.fromhex(topic[2:]))[0] \
+                    if i['type'] not in ('bytes', 'string') and not i['type'].endswith('[]') else topic
+            decoded.append((event['name'], values))
+        return decoded
+
+
+class EventMasterClient(ContractClient):
+    NAME = 'EventMasterService'
+
+    def getTicketID(self, eventID, sectionID, seatID):
+        """uint32 eventID, uint16 sectionID, uint16 seatID -> uint256"""
+        return self.call('getTicketID', eventID, sectionID, seatID)
+
+    def existsEvent(self, eventID):
+        """uint32 eventID -> bool"""
+        return self.call('existsEvent', eventID)
+
+    def numberOfSections(self, eventID):
+        """uint32 eventID -> uint16"""
+        return self.call('numberOfSections', eventID)
+
+    def numberOfEvents(self):
+        """-> uint32, eventIDs go from 1 to this number"""
+        return self.call('numberOfEvents')
+
+    def eventInfo(self, eventID):
+        """uint32 eventID -> (address owner, uint256 platID, uint16 sections, uint16 totalSeats,
+        uint256 startSellingDate, uint256 startWithdrawalDate, uint256 funds)"""
+        return self.call('eventInfo', eventID)
+
+    def sectionSize(self, eventID, sectionID):
+        """uint32 eventID, uint16 sectionID -> uint16"""
+        return self.call('sectionSize', eventID, sectionID)
+
+    def sectionPrice(self, eventID, sectionID):
+        """uint32 eventID, uint16 sectionID -> uint256, without fees"""
+        return self.call('sectionPrice', eventID, sectionID)
+
+    def sectionFee(self, eventID, sectionID):
+        """uint32 eventID, uint16 sectionID -> uint256"""
+        return self.call('sectionFee', eventID, sectionID)
+
+    def ticketIsAvailable(self, eventID, sectionID, seatID):
+        """uint32 eventID, uint16 sectionID, uint16 seatID -> bool"""
+        return self.call('ticketIsAvailable', eventID, sectionID, seatID)
+
+    def soldSeats(self, eventID, sectionID, firstSeatID, count):
+        """uint32 eventID, uint16 sectionID, uint16 firstSeatID, uint16 count -> uint256[] bitmap of the sold seats"""
+        return self.call('soldSeats', eventID, sectionID, firstSeatID, count)
+
+    def doesTicketIdBelongTo(self, ticketID, owner):
+        """uint256 ticketID, address owner -> bool"""
+        return self.call('doesTicketIdBelongTo', ticketID, owner)
+
+    def feesCollected(self, platID):
+        """uint256 platID -> uint256 fees not withdrawn yet"""
+        return self.call('feesCollected', platID)
+
+    def checkPurchase(self, buyer, eventID, sectionIDs, seatIDs):
+        """address buyer, uint32 eventID, uint16[] sectionIDs, uint16[] seatIDs -> (uint8[] codes, uint256 totalCost)"""
+        return self.call('checkPurchase', buyer, eventID, list(sectionIDs), list(seatIDs))
+
+    def getNonce(self, sender, lane=0):
+        """address sender, uint192 lane -> uint256 feeless nonce"""
+        return self.call('getNonce', sender, lane)
+
+    def balanceOf(self, owner, ticketID):
+        """address owner, uint256 ticketID -> uint256"""
+        return self.call('balanceOf', owner, ticketID)
+
+    def createEvent(self, platID, startSellingDate, startWithdrawalDate, **kwargs):
+        """uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate, returnValue is the eventID"""
+        return self.transact('createEvent', platID, startSellingDate, startWithdrawalDate, **kwargs)
+
+    def createEventWithSections(self, platID, startSellingDate, startWithdrawalDate, sizes, prices, **kwargs):
+        """uint256 platID, uint256 startSellingDate, uint256 startWithdrawalDate, uint16[] sizes, uint256[] prices"""
+        return self.transact('createEventWithSections', platID, startSellingDate, startWithdrawalDate,
+                             list(sizes), list(prices), **kwargs)
+
+    def addSection(self, eventID, size, price, **kwargs):
+        """uint32 eventID, uint16 size, uint256 price, returnValue is the sectionID"""
+        return self.transact('addSection', eventID, size, price, **kwargs)
+
+    def addSectionsBatch(self, eventID, sizes, prices, **kwargs):
+        """uint32 eventID, uint16[] sizes, uint256[] prices, returnValue is the last sectionID"""
+        return self.transact('addSectionsBatch', eventID, list(sizes), list(prices), **kwargs)
+
+    def buyTicketWithTokens(self, eventID, sectionID, seatID, **kwargs):
+        """uint32 eventID, uint16 sectionID, uint16 seatID, returnValue is the ticketID"""
+        return self.transact('buyTicketWithTokens', eventID, sectionID, seatID, **kwargs)
+
+    def buyTicketsBatchWithTokens(self, eventID, sectionIDs, seatIDs, **kwargs):
+        """uint32 eventID, uint16[] sectionIDs, uint16[] seatIDs"""
+        return self.transact('buyTicketsBatchWithTokens', eventID, list(sectionIDs), list(seatIDs), **kwargs)
+
+    def buyTicketsPackedWithTokens(self, eventID, packedSeats, **kwargs):
+        """uint32 eventID, bytes packedSeats (see nftsets.signer.packSeats)"""
+        return self.transact('buyTicketsPackedWithTokens', eventID, packedSeats, **kwargs)
+
+    def withdrawFunds(self, eventID, **kwargs):
+        """uint32 eventID"""
+        return self.transact('withdrawFunds', eventID, **kwargs)
+
+    def withdrawFundsBatch(self, eventIDs, **kwargs):
+        """uint32[] eventIDs"""
+        return self.transact('withdrawFundsBatch', list(eventIDs), **kwargs)
+
+    def performFeelessTransaction(self, sender, data, nonce, expiryDateSecs, signature, **kwargs):
+        """address sender, bytes data, uint256 nonce, uint256 expiryDateSecs, bytes signature, sent by a relayer"""
+        return self.transact('performFeelessTransaction', sender, self.address, data, nonce, expiryDateSecs, signature,
+                             **kwargs)
+
+
+class IdentityMasterClient(ContractClient):
+    NAME = 'IdentityMasterService'
+
+    def getPlatform(self, platID):
+        """uint256 platID -> (address resolver, address currency, uint256 maxSeats, bool active)"""
+        return self.call('getPlatform', platID)
+
+    def existsPlatform(self, platID):
+        """uint256 platID -> bool"""
+        return self.call('existsPlatform', platID)
+
+    def resolveIdentityOnPlatform(self, platID, addr):
+        """uint256 platID, address addr -> uint256 identity, RpcError if addr is not registered"""
+        return self.call('resolveIdentityOnPlatform', platID, addr)
+
+    def resolvePermissionsOnPlatform(self, platID, identity):
+        """uint256 platID, uint256 identity -> uint256 permissions"""
+        return self.call('resolvePermissionsOnPlatform', platID, identity)
+
+    def canBuyTicketOnPlatform(self, platID, identity):
+        """uint256 platID, uint256 identity -> bool"""
+        return self.call('canBuyTicketOnPlatform', platID, identity)
+
+    def canCreateEventOnPlatform(self, platID, identity):
+        """uint256 platID, uint256 identity -> bool"""
+        return self.call('canCreateEventOnPlatform', platID, identity)
+
+    def registerPlatform(self, resolver, currencyToken, maxSeatsPerEvent, **kwargs):
+        """address resolver, address currencyToken, uint256 maxSeatsPerEvent, returnValue is the platID"""
+        return self.transact('registerPlatform', resolver, currencyToken, maxSeatsPerEvent, **kwargs)
+
+    def registerPlatformClone(self, implementation, platformOwner, currencyToken, maxSeatsPerEvent, **kwargs):
+        """address implementation, address platformOwner, address currencyToken, uint256 maxSeatsPerEvent,
+        returnValue is (platID, resolver)"""
+        return self.transact('registerPlatformClone', implementation, platformOwner, currencyToken, maxSeatsPerEvent,
+                             **kwargs)
+
+    def deregisterPlatform(self, platID, **kwargs):
+        """uint256 platID"""
+        return self.transact('deregisterPlatform', platID, **kwargs)
+
+
+class IdentityResolverClient(ContractClient):
+    NAME = 'DefaultIdentityResolverService'
+
+    def existsAddress(self, addr):
+        """address addr -> bool"""
+        return self.call('existsAddress', addr)
+
+    def existsIdentity(self, identity):
+        """uint256 identity -> bool"""
+        return self.call('existsIdentity', identity)
+
+    def resolveIdentity(self, addr):
+        """address addr -> uint256 identity, RpcError if addr is not registered"""
+        return self.call('resolveIdentity', addr)
+
+    def resolvePermissions(self, identity):
+        """uint256 identity -> uint256 permissions"""
+        return self.call('resolvePermissions', identity)
+
+    def canBuyTicket(self, identity):
+        """uint256 identity -> bool"""
+        return self.call('canBuyTicket', identity)
+
+    def newIdentity(self, addr, permissions, **kwargs):
+        """address addr, uint256 permissions, returnValue is the identity"""
+        return self.transact('newIdentity', addr, permissions, **kwargs)
+
+    def registerAddress(self, identity, addr, **kwargs):
+        """uint256 identity, address addr"""
+        return self.transact('registerAddress', identity, addr, **kwargs)
@@ -0,0 +1,72 @@
+"""
+JSON-RPC over HTTP with one keep-alive connection per thread, http.client is imported on
+the first request.
+"""
+import itertools
+import json
+import threading
+
+
+class RpcError(Exception):
+    def __init__(self, method, error):
+        self.method = method
+        self.code = error.get('code')
+        self.data = error.get('data')
+        super().__init__(error.get('message', str(error)))
+
+
+class HttpRpc:
+    def __init__(self, url, timeout=30):
+        scheme, _, rest = url.partition('://')
+        self.https = scheme == 'https'
+        self.host, _, path = rest.partition('/')
+        self.path = '/' + path
+        self.timeout = timeout
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            import http.client
+            connectionClass = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self.local.connection = connectionClass(self.host, timeout=self.timeout)
+        return self.local.connection
+
+    def post(self, body, retry=True):
+        for attempt in (0, 1):
+            connection = self.connection()
+            try:
+                connection.request('POST', self.path, body, {'Content-Type': 'application/json'})
+                return json.loads(connection.getresponse().read())
+            except (ConnectionError, OSError):
+                # The node closed the kept-alive connection, retry once on a new one.
+                connection.close()
+                self.local.connection = None
+                if attempt or not retry:
+                    raise
+
+    def request(self, method, params=()):
+        # Not retried for eth_sendTransaction: the node may have sent it and would pick a new nonce.
+        body = json.dumps({'jsonrpc': '2.0', 'id': next(self.ids), 'method': method, 'params': list(params)})
+        reply = self.post(body, retry=method != 'eth_sendTransaction')
+        if 'error' in reply:
+            raise RpcError(method, reply['error'])
+        return reply['result']
+
+    def batch(self, method, paramsList):
+        """
+        Sends one request of `method` per params of `paramsList` in a single JSON-RPC batch,
+        gives the results in the same order. For reads, it is not meant for transactions.
+        """
+        if not paramsList:
+            return []
+        ids = [next(self.ids) for _ in paramsList]
+        body = json.dumps([{'jsonrpc': '2.0', 'id': i, 'method': method, 'params': list(params)}
+                           for i, params in zip(ids, paramsList)])
+        replies = {reply['id']: reply for reply in self.post(body)}
+        results = []
+        for i in ids:
+            if 'error' in replies[i]:
+                raise RpcError(method, replies[i]['error'])
+            results.append(replies[i]['result'])
+        return results
@@ -0,0 +1,352 @@
+"""
+Deployment of the ticketing contracts from the compiled build, without brownie.
+
+The plan is a dependency graph of steps: contract deployments and calls, whose
+arguments may refer to the address (Ref) or result (Result) of an earlier step,
+and whose libraries are linked to the addresses of earlier library deployments.
+Steps run in waves: all the steps whose dependencies are mined are sent back
+to back with nonces counted locally, then their receipts are awaited
+concurrently. Every step is recorded in a JSON manifest. On a rerun a contract
+is reused when the code at its address still hashes like the build and it was
+deployed with the same arguments, and a call is skipped when its check holds.
+
+    python -m nftsets.deploy --rpc http://127.0.0.1:8545 --manifest deployments/development.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nftsets.client.abi import loadAbis, encodeArgs
+from nftsets.client.contracts import Function, waitForReceipt, signTransaction
+from nftsets.client.rpc import HttpRpc
+
+BUILD_DIR = os.path.join('build', 'contracts')
+MANIFEST_VERSION = 1
+
+
+class DeployError(Exception):
+    pass
+
+
+class Ref:
+    """Address of the contract deployed by step `name`."""
+    def __init__(self, name):
+        self.name = name
+
+
+class Result:
+    """Value returned by call step `name`."""
+    def __init__(self, name):
+        self.name = name
+
+
+class Deploy:
+    """
+    Deployment of `contract`. `libraries` maps the names of the libraries it links to the
+    steps deploying them, several deployments can link the same library step.
+    """
+    def __init__(self, name, contract, args=(), libraries=None):
+        self.name = name
+        self.contract = contract
+        self.args = list(args)
+        self.libraries = dict(libraries or {})
+
+
+class Call:
+    """
+    Transaction to function `function` of the contract deployed by step `target`. It is
+    skipped when `check(deployer, record)` holds for the manifest record of a previous run.
+    """
+    def __init__(self, name, target, function, args=(), check=None):
+        self.name = name
+        self.target = target
+        self.function = function
+        self.args = list(args)
+        self.check = check
+
+
+def dependencies(step):
+    names = [arg.name for arg in step.args if isinstance(arg, (Ref, Result))]
+    return names + [step.target] if isinstance(step, Call) else names + list(step.libraries.values())
+
+
+def link(bytecode, libraries):
+    """
+    Bytecode with the brownie placeholders (__Name___...__, 40 characters) of `libraries`, a
+    {name: address} dict, replaced by their addresses. Raises DeployError if some are left.
+    """
+    bytecode = bytecode[2:] if bytecode.startswith('0x') else bytecode
+    for name, address in libraries.items():
+        bytecode = bytecode.replace('__%s__' % name[:36].ljust(36, '_'), address[2:].lower())
+    if '__' in bytecode:
+        raise DeployError("Bytecode has unlinked libraries.")
+    return bytecode
+
+
+def waves(plan):
+    """
+    Steps grouped so that every step only depends on steps of earlier groups, in plan order.
+    """
+    names = [step.name for step in plan]
+    for step in plan:
+        unknown = [name for name in dependencies(step) if name not in names]
+        if unknown:
+            raise DeployError("Step %s depends on unknown steps %s." % (step.name, ', '.join(unknown)))
+    done, pending, result = set(), list(plan), []
+    while pending:
+        ready = [step for step in pending if all(name in done for name in dependencies(step))]
+        if not ready:
+            raise DeployError("Dependency cycle between %s." % ', '.join(step.name for step in pending))
+        result.append(ready)
+        done.update(step.name for step in ready)
+        pending = [step for step in pending if step not in ready]
+    return result
+
+
+def platformRegistered(deployer, record):
+    """
+    Check of the registerPlatform call: the platform it returned still has the same record.
+    """
+    resolver, currency, maxSeats = record['args']
+    platform = deployer.call(record['target'], 'IdentityMasterService', 'getPlatform', record['result'])
+    return platform == (resolver, currency, maxSeats, True)
+
+
+def ticketingPlan(maxSeats=2**16 - 1, basicPointFees=0, basicPointGaslessPremium=0, tokenChainId=1337):
+    """
+    Resolver, token, identity master and the PurchaseChecks library, platform #1 registered
+    on the master, then the event service linked to the library. Same contracts as
+    scripts/benchmark_setup.py.
+    """
+    return [
+        Deploy('resolver', 'DefaultIdentityResolverService'),
+        Deploy('token', 'SimpleToken', [tokenChainId]),
+        Deploy('master', 'IdentityMasterService'),
+        Deploy('purchaseChecks', 'PurchaseChecks'),
+        Call('platform', 'master', 'registerPlatform', [Ref('resolver'), Ref('token'), maxSeats],
+             check=platformRegistered),
+        Deploy('events', 'EventMasterService', [Ref('master'), basicPointFees, basicPointGaslessPremium],
+               libraries={'PurchaseChecks': 'purchaseChecks'}),
+    ]
+
+
+def loadArtifacts(names, buildDir=BUILD_DIR):
+    artifacts = {}
+    for name in names:
+        path = os.path.join(buildDir, name + '.json')
+        if not os.path.exists(path):
+            raise DeployError("%s not found, compile the contracts first." % path)
+        with open(path) as f:
+            artifacts[name] = json.load(f)
+    return artifacts
+
+
+def codeHash(code):
+    """
+    sha256 of the runtime code, hex with or without 0x.
+    """
+    code = code[2:] if code.startswith('0x') else code
+    return '0x' + hashlib.sha256(bytes.fromhex(code)).hexdigest()
+
+
+def unlinkSelf(code, address):
+    """
+    Runtime code of a library as in the build: a deployed library starts with PUSH20 of its own
+    address, which the build leaves as zeros.
+    """
+    code = code[2:] if code.startswith('0x') else code
+    if code[:2] == '73' and code[2:42].lower() == address[2:].lower():
+        return '73' + '0' * 40 + code[42:]
+    return code
+
+
+def readManifest(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def writeManifest(path, manifest):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+class Deployer:
+    """
+    Runs a plan from `sender`, unlocked on the node, or from the account of `privateKey`.
+    `artifacts` maps contract names to their brownie build (abi, bytecode, deployedBytecode).
+    """
+    def __init__(self, rpc, artifacts, sender=None, privateKey=None, gasPrice=None):
+        self.rpc = rpc
+        self.artifacts = artifacts
+        self.privateKey = privateKey
+        self.sender = sender
+        if sender is None and privateKey is not None:
+            from eth_account import Account
+            self.sender = Account.from_key(privateKey).address
+        if self.sender is None:
+            raise DeployError("A sender or a private key is needed.")
+        self.gasPrice = gasPrice
+        self.chainId = int(self.rpc.request('eth_chainId'), 16)
+        self.nonce = None
+
+    def call(self, address, contract, name, *args):
+        abi = next(f for f in loadAbis()[contract] if f['type'] == 'function' and f['name'] == name)
+        function = Function(abi)
+        return function.decode(self.rpc.request('eth_call', [{'to': address, 'data': function.encode(args)}, 'latest']))
+
+    def resolve(self, args, records):
+        values = []
+        for arg in args:
+            if isinstance(arg, Ref):
+                values.append(records[arg.name]['address'])
+            elif isinstance(arg, Result):
+                values.append(records[arg.name]['result'])
+            else:
+                values.append(arg)
+        return values
+
+    def libraryAddresses(self, step, records):
+        return {library: records[name]['address'] for library, name in step.libraries.items()}
+
+    def buildCodeHash(self, step, records):
+        return codeHash(link(self.artifacts[step.contract]['deployedBytecode'], self.libraryAddresses(step, records)))
+
+    def isCurrent(self, step, args, record, records):
+        """
+        Whether the manifest record of a previous run can be reused for `step`.
+        """
+        if not record:
+            return False
+        if isinstance(step, Deploy):
+            if record.get('contract') != step.contract or record.get('args') != args:
+                return False
+            onChain = self.rpc.request('eth_getCode', [record['address'], 'latest'])
+            return onChain not in ('0x', '0x0') and \
+                codeHash(unlinkSelf(onChain, record['address'])) == self.buildCodeHash(step, records) \
+                == record.get('codeHash')
+        return record.get('function') == step.function and record.get('args') == args \
+            and (step.check is None or step.check(self, record))
+
+    def transaction(self, step, args, records):
+        if isinstance(step, Deploy):
+            artifact = self.artifacts[step.contract]
+            bytecode = link(artifact['bytecode'], self.libraryAddresses(step, records))
+            constructor = next((item for item in artifact['abi'] if item['type'] == 'constructor'), {'inputs': []})
+            data = '0x' + bytecode + encodeArgs([i['type'] for i in constructor['inputs']], args).hex()
+            return {'from': self.sender, 'data': data, 'value': '0x0'}, None
+        target = records[step.target]
+        abi = next(f for f in loadAbis()[target['contract']] if f['type'] == 'function' and f['name'] == step.function)
+        function = Function(abi)
+        tx = {'from': self.sender, 'to': target['address'], 'data': function.encode(args), 'value': '0x0'}
+        result = function.decode(self.rpc.request('eth_call', [tx, 'pending'])) if function.outputs else None
+        return tx, result
+
+    def send(self, tx):
+        tx['gas'] = self.rpc.request('eth_estimateGas', [tx])
+        tx['gasPrice'] = hex(self.gasPrice) if self.gasPrice else self.rpc.request('eth_gasPrice')
+        tx['nonce'] = hex(self.nonce)
+        self.nonce += 1
+        if self.privateKey is None:
+            return self.rpc.request('eth_sendTransaction', [tx])
+        return self.rpc.request('eth_sendRawTransaction', [signTransaction(tx, self.privateKey, self.chainId)])
+
+    def run(self, plan, manifest=None, save=None, log=print):
+        """
+        Runs the steps of `plan` not already done according to `manifest`, returns the new
+        manifest. `save` is called with the manifest after every wave, so an interrupted run
+        keeps what was mined.
+        """
+        manifest = manifest or {}
+        previous = manifest.get('steps', {}) if manifest.get('chainId') == self.chainId else {}
+        records = {}
+        stats = {'sent': 0, 'reused': 0, 'waves': []}
+        start = time.time()
+        self.nonce = int(self.rpc.request('eth_getTransactionCount', [self.sender, 'pending']), 16)
+        for wave in waves(plan):
+            waveStart = time.time()
+            sent = []
+            for step in wave:
+                args = [a.lower() if isinstance(a, str) and a.startswith('0x') else a
+                        for a in self.resolve(step.args, records)]
+                record = previous.get(step.name)
+                if self.isCurrent(step, args, record, records):
+                    records[step.name] = record
+                    stats['reused'] += 1
+                    log('%-10s reused   %s' % (step.name, record.get('address') or record.get('target')))
+                    continue
+                tx, result = self.transaction(step, args, records)
+                sent.append((step, args, result, self.send(tx)))
+            with ThreadPoolExecutor(max_workers=max(1, len(sent))) as pool:
+                receipts = list(pool.map(lambda item: waitForReceipt(self.rpc, item[3]), sent))
+            for (step, args, result, txHash), receipt in zip(sent, receipts):
+                if int(receipt['status'], 16) != 1:
+                    raise DeployError("Step %s reverted in %s." % (step.name, txHash))
+                record = {'args': args, 'txHash': txHash, 'blockNumber': int(receipt['blockNumber'], 16),
+                          'gasUsed': int(receipt['gasUsed'], 16)}
+                if isinstance(step, Deploy):
+                    record.update(contract=step.contract, address=receipt['contractAddress'].lower(),
+                                  codeHash=self.buildCodeHash(step, records))
+                else:
+                    record.update(function=step.function, target=records[step.target]['address'], result=result)
+                records[step.name] = record
+                stats['sent'] += 1
+                log('%-10s %-8s %s  gas %d' % (step.name, 'deployed' if isinstance(step, Deploy) else 'called',
+                                              record.get('address') or record['target'], record['gasUsed']))
+            stats['waves'].append({'steps': [step.name for step in wave], 'sent': len(sent),
+                                   'seconds': time.time() - waveStart})
+            stats['seconds'] = time.time() - start
+            if save:
+                save(self.manifest(records, stats))
+        log('%d transactions in %d waves, %d steps reused, %.2fs' % (stats['sent'], len(stats['waves']),
+                                                                     stats['reused'], stats['seconds']))
+        return self.manifest(records, stats)
+
+    def manifest(self, records, stats):
+        return {'version': MANIFEST_VERSION, 'chainId': self.chainId, 'deployer': self.sender.lower(),
+                'steps': dict(records), 'lastRun': dict(stats)}
+
+
+def addresses(manifest):
+    """
+    Contract addresses of a manifest by step name.
+    """
+    return {name: record['address'] for name, record in manifest.get('steps', {}).items() if 'address' in record}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deploys the ticketing contracts and writes an address manifest.")
+    parser.add_argument('--rpc', default='http://127.0.0.1:8545')
+    parser.add_argument('--manifest', default=os.path.join('deployments', 'development.json'))
+    parser.add_argument('--build', default=BUILD_DIR, help="brownie build directory of the contracts")
+    parser.add_argument('--sender', help="account unlocked on the node, the first one by default")
+    parser.add_argument('--private-key', help="sign locally with this key instead, also read from DEPLOY_PRIVATE_KEY")
+    parser.add_argument('--gas-price', type=int)
+    parser.add_argument('--max-seats', type=int, default=2**16 - 1)
+    parser.add_argument('--fees', type=int, default=0, help="basic points of fees of the event service")
+    parser.add_argument('--gasless-premium', type=int, default=0, help="basic points of premium of meta-transactions")
+    parser.add_argument('--token-chain-id', type=int, default=1337, help="chain id of the token permit domain")
+    options = parser.parse_args(argv)
+
+    rpc = HttpRpc(options.rpc)
+    privateKey = options.private_key or os.environ.get('DEPLOY_PRIVATE_KEY')
+    sender = options.sender
+    if sender is None and privateKey is None:
+        sender = rpc.request('eth_accounts')[0]
+    plan = ticketingPlan(options.max_seats, options.fees, options.gasless_premium, options.token_chain_id)
+    artifacts = loadArtifacts(sorted({step.contract for step in plan if isinstance(step, Deploy)}), options.build)
+    deployer = Deployer(rpc, artifacts, sender=sender, privateKey=privateKey, gasPrice=options.gas_price)
+    deployer.run(plan, readManifest(options.manifest), save=lambda manifest: writeManifest(options.manifest, manifest))
+    print('Wrote %s' % options.manifest)
+
+
+if __name__ == '__main__':
+    main()
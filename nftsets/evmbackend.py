@@ -0,0 +1,216 @@
+"""
+In-process EVM for the tests: py-evm through eth-tester, instead of the ganache process.
+
+createTester() builds a chain with the ganache accounts of the tests (same
+keys, so the signing tests and `accounts` keep their addresses), the ganache
+block gas limit and the petersburg rules of brownie-config.json.
+connectInProcess() points brownie's web3 at it with an EthereumTesterProvider,
+so every request is a Python call and evm_snapshot/evm_revert are in-memory
+snapshots of the chain database. attachBrownie() does it when brownie
+connects, in place of launching ganache, and serves the chain over HTTP
+(serveHttp()) for the tests of the JSON-RPC clients, which take a URL.
+
+The provider answers like ganache where brownie depends on it: the gas price
+is 20 gwei and the chain ID 1337, transactions have their `input`, a reverted
+transaction is mined and reported as an error keyed by its hash with the
+program counter of the REVERT and the revert reason, and evm_increaseTime
+moves the clock. debug_traceTransaction is not available, so the gas profiler
+needs ganache.
+"""
+
+from collections.abc import Mapping
+
+# Ganache block gas limit, gas price, chain ID and balance of the accounts.
+GAS_LIMIT = 6721975
+GAS_PRICE = 20 * 10**9
+CHAIN_ID = 1337
+BALANCE = 100 * 10**18
+# Selector of Error(string), the revert data of require() and revert() with a reason.
+ERROR_SELECTOR = bytes.fromhex('08c379a0')
+REVERT_OPCODE = 0xfd
+
+
+class RecordRevert:
+    """
+    REVERT opcode that keeps the program counter and the revert data of the last REVERT
+    executed. The program counter is the one after the REVERT, as ganache reports it.
+    """
+    mnemonic = 'REVERT'
+
+    def __init__(self, opcode):
+        self.opcode = opcode
+        self.last = None
+
+    def __call__(self, computation):
+        pc = computation.code.program_counter
+        try:
+            self.opcode(computation=computation)
+        finally:
+            self.last = (pc, computation.output)
+
+
+def createTester(privateKeys, gasLimit=GAS_LIMIT, balance=BALANCE):
+    """
+    EthereumTester with one unlocked account per hex private key, in that order.
+    The REVERT opcode of its chain is `tester.reverts`, a RecordRevert.
+    """
+    from eth.vm.forks import PetersburgVM
+    from eth.vm.forks.petersburg.computation import PetersburgComputation
+    from eth.vm.forks.petersburg.state import PetersburgState
+    from eth_keys import keys
+    from eth_tester import EthereumTester, PyEVMBackend
+    from eth_tester.backends.pyevm.main import generate_genesis_state_for_keys, get_default_genesis_params
+
+    reverts = RecordRevert(PetersburgComputation.opcodes[REVERT_OPCODE])
+    opcodes = dict(PetersburgComputation.opcodes)
+    opcodes[REVERT_OPCODE] = reverts
+    computation = PetersburgComputation.configure(opcodes=opcodes)
+    vm = PetersburgVM.configure(_state_class=PetersburgState.configure(computation_class=computation))
+    accountKeys = [keys.PrivateKey(bytes.fromhex(key[2:] if key.startswith('0x') else key)) for key in privateKeys]
+    backend = PyEVMBackend(genesis_parameters=get_default_genesis_params({'gas_limit': gasLimit}),
+                           genesis_state=generate_genesis_state_for_keys(accountKeys, {'balance': balance}),
+                           vm_configuration=((0, vm),))
+    # The backend derives default keys from the number of genesis accounts, not from the state.
+    backend.account_keys = accountKeys
+    tester = EthereumTester(backend)
+    tester.reverts = reverts
+    return tester
+
+
+def revertReason(output):
+    """
+    Reason string of revert data, None without one.
+    """
+    from eth_abi import decode_abi
+
+    if output[:4] != ERROR_SELECTOR:
+        return None
+    return decode_abi(['string'], output[4:])[0]
+
+
+def vmError(error, reason):
+    message = 'VM Exception while processing transaction: %s' % error
+    return message + (' %s' % reason if reason else '')
+
+
+def ganacheCompatible(tester, makeRequest):
+    """
+    Wraps the make_request of an EthereumTesterProvider to answer like ganache.
+    """
+    from eth_tester.exceptions import TransactionFailed
+
+    def request(method, params):
+        if method == 'eth_gasPrice':
+            return {'result': GAS_PRICE}
+        if method == 'eth_chainId':
+            return {'result': hex(CHAIN_ID)}
+        if method == 'evm_increaseTime':
+            tester.time_travel(tester.get_block_by_number('pending')['timestamp'] + int(params[0]))
+            return {'result': int(params[0])}
+        tester.reverts.last = None
+        try:
+            response = makeRequest(method, params)
+        except TransactionFailed:
+            output = tester.reverts.last[1] if tester.reverts.last else b''
+            return {'error': {'code': -32000, 'message': vmError('revert', revertReason(output))}}
+        if method == 'eth_getTransactionByHash' and response.get('result'):
+            return {'result': dict(response['result'], input=response['result']['data'])}
+        if method not in ('eth_sendTransaction', 'eth_sendRawTransaction') or 'result' not in response:
+            return response
+        txHash = response['result']
+        if tester.get_transaction_receipt(txHash)['status'] == 1:
+            return response
+        if tester.reverts.last is None:
+            error, pc, output = 'invalid opcode', 0, b''
+        else:
+            error, (pc, output) = 'revert', tester.reverts.last
+        reason = revertReason(output)
+        return {'error': {'code': -32000, 'message': vmError(error, reason), 'data': {
+            txHash: {'error': error, 'program_counter': pc, 'return': '0x' + output.hex(), 'reason': reason}}}}
+    return request
+
+
+def connectInProcess(web3, tester):
+    """
+    Sends the requests of `web3` to `tester`, in this process.
+    """
+    from web3.providers.eth_tester import EthereumTesterProvider
+
+    provider = EthereumTesterProvider(tester)
+    provider.make_request = ganacheCompatible(tester, provider.make_request)
+    web3.provider = provider
+    return provider
+
+
+def toJson(value):
+    """
+    A result of web3 as JSON-RPC encodes it, quantities and bytes in hex.
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    if isinstance(value, Mapping):
+        return {key: toJson(item) for key, item in value.items()}
+    return [toJson(item) for item in value]
+
+
+def serveHttp(web3, host='127.0.0.1'):
+    """
+    Serves the requests to `web3` as JSON-RPC over HTTP on a free port, from daemon threads.
+    Returns the URL.
+    """
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+
+    def answer(request):
+        reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            with lock:
+                reply['result'] = toJson(web3.manager.request_blocking(request['method'], request.get('params', [])))
+        except ValueError as e:
+            reply['error'] = e.args[0] if e.args and isinstance(e.args[0], dict) else {'code': -32000, 'message': str(e)}
+        return reply
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, HttpRpc keeps its connection.
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            data = json.dumps([answer(request) for request in body] if isinstance(body, list) else answer(body)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return 'http://%s:%d' % server.server_address
+
+
+def attachBrownie(tester):
+    """
+    Makes brownie connect to `tester` instead of launching ganache. Called before brownie
+    connects, the test process stands for the RPC process brownie would have attached to.
+    """
+    import psutil
+    from brownie import rpc, web3
+
+    def connect(uri):
+        provider = connectInProcess(web3, tester)
+        provider.endpoint_uri = serveHttp(web3)
+        rpc._reset_id = rpc._snap()
+
+    web3.connect = connect
+    rpc._rpc = psutil.Process()
@@ -0,0 +1,287 @@
+"""
+Opcode level gas profiler for transactions of the local node.
+
+debug_traceTransaction gives the gas left before every opcode. The cost of
+an opcode is the difference with the next opcode of the same call frame, so
+a CALL costs what the caller loses, minus what the callee spent, and the
+callee steps are charged to the callee. Program counters are mapped back to
+Solidity offsets with the deployed source maps of the compiler output
+(brownie build artifacts), then to the source line and the innermost
+function, modifier or contract around it.
+
+GasProfile aggregates the gas per function, per source line and per
+external call (inclusive of the callee), and writes folded stacks
+("A;B;C gas" lines) for flamegraph.pl or speedscope, one frame per
+external call site. The gas outside opcodes (intrinsic gas, calldata,
+refunds) is reported on its own.
+"""
+import bisect
+import collections
+import re
+
+# Precompiled contracts and unknown code are shown by address.
+UNKNOWN_FUNCTION = '?'
+INTRINSIC = '[intrinsic+refunds]'
+CALL_OPS = ('CALL', 'CALLCODE', 'DELEGATECALL', 'STATICCALL')
+
+DEFINITION = re.compile(r'\b(contract|library|interface|function|modifier|constructor)\b\s*(\w*)')
+COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:[^"\\\n]|\\.)*"', re.S)
+
+
+def decompressSourceMap(sourceMap):
+    """
+    Expands a compressed solc source map to one (start, length, file, jump) per instruction.
+    """
+    entries, last = [], [-1, -1, -1, '-']
+    for item in sourceMap.split(';'):
+        for i, field in enumerate(item.split(':')[:4]):
+            if field:
+                last[i] = field if i == 3 else int(field)
+        entries.append(tuple(last))
+    return entries
+
+
+def instructionOffsets(bytecode):
+    """
+    Program counter of every instruction of hex `bytecode`. Unlinked library placeholders are skipped
+    as PUSH20 data.
+    """
+    code = bytecode[2:] if bytecode.startswith('0x') else bytecode
+    pcs, pc = [], 0
+    while pc < len(code) // 2:
+        pcs.append(pc)
+        op = int(code[2 * pc:2 * pc + 2], 16)
+        pc += 1 + (op - 0x5f if 0x60 <= op <= 0x7f else 0)
+    return pcs
+
+
+class SourceFile:
+    """
+    Line starts and definition ranges of one Solidity source, to resolve offsets.
+    """
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text
+        self.lineStarts = [0] + [m.end() for m in re.finditer('\n', text)]
+        # Comments and strings blanked out, offsets unchanged.
+        self.code = COMMENT.sub(lambda m: ' ' * len(m.group()), text)
+        self.definitions = []
+        contract = None
+        for match in DEFINITION.finditer(self.code):
+            kind, name = match.groups()
+            end = self.blockEnd(match.end())
+            if end is None:
+                continue
+            if kind in ('contract', 'library', 'interface'):
+                contract = name
+                label = name
+            else:
+                label = '%s.%s' % (contract, name or kind)
+            self.definitions.append((match.start(), end, label))
+
+    def blockEnd(self, start):
+        """
+        Offset after the body that starts at the first '{' after `start`, None for declarations.
+        """
+        opening = min((i for i in (self.code.find('{', start), self.code.find(';', start)) if i >= 0), default=-1)
+        if opening < 0 or self.code[opening] == ';':
+            return None
+        depth = 0
+        for i in range(opening, len(self.code)):
+            if self.code[i] == '{':
+                depth += 1
+            elif self.code[i] == '}':
+                depth -= 1
+                if not depth:
+                    return i + 1
+        return len(self.text)
+
+    def line(self, offset):
+        return bisect.bisect_right(self.lineStarts, offset)
+
+    def lineText(self, line):
+        end = self.lineStarts[line] if line < len(self.lineStarts) else len(self.text)
+        return self.text[self.lineStarts[line - 1]:end].strip()
+
+    def function(self, offset):
+        label = None
+        for start, end, name in self.definitions:
+            if start <= offset < end:
+                label = name
+        return label
+
+
+class ContractMap:
+    """
+    Program counter -> (function, source line) of the deployed code of one contract.
+    `build` is a brownie build artifact (contract._build).
+    """
+    def __init__(self, build, sources=None):
+        self.name = build['contractName']
+        paths = build.get('allSourcePaths') or [build['sourcePath']]
+        if isinstance(paths, dict):
+            paths = {int(k): v for k, v in paths.items()}
+        else:
+            paths = dict(enumerate(paths))
+        sources = sources if sources is not None else {}
+        self.files = {}
+        for index, path in paths.items():
+            if path not in sources:
+                sources[path] = SourceFile(path, build['source'] if path == build['sourcePath'] else readSource(path))
+            self.files[index] = sources[path]
+        entries = decompressSourceMap(build['deployedSourceMap'])
+        self.pcs = dict(zip(instructionOffsets(build['deployedBytecode']), entries))
+
+    def locate(self, pc):
+        """
+        (function, "path:line", source line text) of the instruction at `pc`.
+        """
+        start, length, index, jump = self.pcs.get(pc, (-1, -1, -1, '-'))
+        source = self.files.get(index)
+        if source is None:
+            return self.name, '%s:?' % self.name, ''
+        line = source.line(start)
+        return source.function(start) or self.name, '%s:%d' % (source.path, line), source.lineText(line)
+
+
+def readSource(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return ''
+
+
+class Frame:
+    def __init__(self, label, contract):
+        self.label = label
+        self.contract = contract
+        self.function = None
+        self.spent = 0
+        # Call sites of the callers, for folded stacks.
+        self.stack = []
+        # (CALL step, call site) while this frame waits for a callee.
+        self.call = None
+
+
+class GasProfile:
+    """
+    Gas of one or more transactions per function, per source line, per external call and
+    per folded stack.
+    """
+    def __init__(self):
+        self.functions = collections.Counter()
+        self.lines = collections.Counter()
+        self.lineTexts = {}
+        self.calls = collections.Counter()
+        self.stacks = collections.Counter()
+        self.total = 0
+
+    def merge(self, other):
+        for name in ('functions', 'lines', 'calls', 'stacks'):
+            getattr(self, name).update(getattr(other, name))
+        self.lineTexts.update(other.lineTexts)
+        self.total += other.total
+
+    def folded(self):
+        return ''.join('%s %d\n' % (stack, gas) for stack, gas in sorted(self.stacks.items()) if gas > 0)
+
+    def writeFolded(self, path):
+        with open(path, 'w') as f:
+            f.write(self.folded())
+
+    def printReport(self, top=15):
+        print('%d gas' % self.total)
+        print('\n%-60s %10s %6s' % ('function', 'gas', '%'))
+        for name, gas in self.functions.most_common(top):
+            print('%-60s %10d %6.1f' % (name, gas, 100.0 * gas / self.total))
+        print('\n%-50s %10s  %s' % ('line', 'gas', 'source'))
+        for line, gas in self.lines.most_common(top):
+            print('%-50s %10d  %s' % (line, gas, self.lineTexts.get(line, '')[:60]))
+        print('\n%-80s %10s' % ('external call', 'gas'))
+        for call, gas in self.calls.most_common(top):
+            print('%-80s %10d' % (call, gas))
+
+
+class GasProfiler:
+    """
+    Profiles transactions with debug_traceTransaction. `contracts` are the brownie contracts
+    (or containers of them) whose code is mapped to source, other code is shown by address.
+    """
+    def __init__(self, web3, contracts=()):
+        self.web3 = web3
+        self.maps = {}
+        sources = {}
+        builds = {}
+        for item in contracts:
+            for contract in (item if not hasattr(item, 'address') else [item]):
+                name = contract._name
+                if name not in builds:
+                    builds[name] = ContractMap(contract._build, sources)
+                self.maps[contract.address.lower()] = builds[name]
+
+    def trace(self, txHash):
+        response = self.web3.provider.make_request('debug_traceTransaction', [txHash, {
+            'disableStorage': True, 'disableMemory': True}])
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']['structLogs']
+
+    def profile(self, tx):
+        """
+        GasProfile of `tx`, a brownie TransactionReceipt or a transaction hash.
+        """
+        txHash = tx if isinstance(tx, str) else tx.txid
+        receipt = self.web3.eth.getTransactionReceipt(txHash)
+        to = receipt['to'] or receipt['contractAddress']
+        return self.profileSteps(self.trace(txHash), to, receipt['gasUsed'])
+
+    def frame(self, address):
+        contract = self.maps.get(address.lower())
+        return Frame(contract.name if contract else address, contract)
+
+    def profileSteps(self, steps, to, gasUsed):
+        profile = GasProfile()
+        profile.total = gasUsed
+        frames = [self.frame(to)]
+
+        def charge(frame, step, cost):
+            if frame.contract:
+                function, line, text = frame.contract.locate(step['pc'])
+                profile.lines[line] += cost
+                profile.lineTexts[line] = text
+            else:
+                function = '%s.%s' % (frame.label, UNKNOWN_FUNCTION)
+            frame.function = frame.function or (function if '.' in function else None)
+            profile.functions[function] += cost
+            profile.stacks[';'.join(frame.stack + [function])] += cost
+            frame.spent += cost
+
+        for i, step in enumerate(steps):
+            frame = frames[-1]
+            following = steps[i + 1] if i + 1 < len(steps) else None
+            if following is not None and following['depth'] > step['depth']:
+                # Entering a call, charged when it returns. CREATE has no address on the stack.
+                callee = '0x' + step['stack'][-2][-40:] if step['op'] in CALL_OPS else 'CREATE'
+                callFrame = self.frame(callee)
+                site = frame.contract.locate(step['pc'])[0] if frame.contract else frame.label
+                callFrame.stack = frame.stack + [site]
+                frame.call = (step, site)
+                frames.append(callFrame)
+                continue
+            if following is not None and following['depth'] == step['depth']:
+                charge(frame, step, step['gas'] - following['gas'])
+            else:
+                charge(frame, step, step['gasCost'])
+            if following is not None and len(frames) > 1 and following['depth'] < step['depth']:
+                # Returned into the caller: its CALL costs what it lost minus what the callee spent.
+                callee = frames.pop()
+                caller = frames[-1]
+                callStep, site = caller.call
+                inclusive = callStep['gas'] - following['gas']
+                charge(caller, callStep, inclusive - callee.spent)
+                caller.spent += callee.spent
+                profile.calls['%s -> %s' % (site, callee.function or callee.label)] += inclusive
+        profile.functions[INTRINSIC] += gasUsed - frames[0].spent
+        profile.stacks[INTRINSIC] += gasUsed - frames[0].spent
+        return profile
@@ -0,0 +1,153 @@
+"""
+On-sale load generator for EventMasterService.
+
+A Workload describes the rush: how many orders, how popular the front seats
+are (Zipf skew), how many seats per order and which share of the orders are
+feeless meta-transactions sent by relayers. generateOrders() turns it into a
+deterministic list of orders, runLoad() sends them from a thread pool and
+LoadReport summarizes throughput, latency percentiles, revert reasons and
+gas per ticket sold.
+
+Orders of the same buyer, and meta-transactions of the same relayer, are
+sent one at a time: local accounts sign with their own nonce counter.
+"""
+import collections
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nftsets.signer import FeelessSigner
+
+DIRECT = 'direct'
+FEELESS = 'feeless'
+
+
+class Workload:
+    """
+    `batchSizes` maps seats per order to its probability. `popularitySkew` is the Zipf exponent
+    of the first seat of an order by seatID, 0 picks seats uniformly.
+    """
+    def __init__(self, orders=1000, sections=4, sectionSize=500, popularitySkew=1.2,
+                 batchSizes=None, metaTxRatio=0.3, concurrency=16, seed=1):
+        self.orders = orders
+        self.sections = sections
+        self.sectionSize = sectionSize
+        self.popularitySkew = popularitySkew
+        self.batchSizes = batchSizes or {1: 0.5, 2: 0.3, 4: 0.2}
+        self.metaTxRatio = metaTxRatio
+        self.concurrency = concurrency
+        self.seed = seed
+
+
+Order = collections.namedtuple('Order', 'buyer sectionIDs seatIDs kind')
+
+
+def generateOrders(workload, buyers):
+    """
+    Orders of the workload, each from a random buyer index below `buyers`.
+    Seats of an order are adjacent in one section.
+    """
+    rng = random.Random(workload.seed)
+    seatWeights = [1.0 / (seat ** workload.popularitySkew) for seat in range(1, workload.sectionSize + 1)]
+    sizes, sizeWeights = zip(*sorted(workload.batchSizes.items()))
+    orders = []
+    for _ in range(workload.orders):
+        count = rng.choices(sizes, sizeWeights)[0]
+        sectionID = rng.randint(1, workload.sections)
+        firstSeatID = min(rng.choices(range(1, workload.sectionSize + 1), seatWeights)[0],
+                          workload.sectionSize - count + 1)
+        kind = FEELESS if rng.random() < workload.metaTxRatio else DIRECT
+        orders.append(Order(rng.randrange(buyers), [sectionID] * count,
+                            list(range(firstSeatID, firstSeatID + count)), kind))
+    return orders
+
+
+Result = collections.namedtuple('Result', 'kind tickets start latency gasUsed reason')
+
+
+def runLoad(events, eventID, orders, buyers, privateKeys, relayers, concurrency, expiryDateSecs):
+    """
+    Sends `orders` against `eventID`. `buyers` are accounts with tokens approved for `events`,
+    `privateKeys` their keys (for feeless orders) and `relayers` the accounts that send the
+    meta-transactions. Returns (results, wall time).
+    """
+    from brownie.exceptions import VirtualMachineError
+
+    buyerLocks = [threading.Lock() for _ in buyers]
+    relayerLocks = [threading.Lock() for _ in relayers]
+    signers = [FeelessSigner(key, events.address, lambda lane, addr=buyer.address: events.getNonce(addr, lane))
+               for key, buyer in zip(privateKeys, buyers)]
+    nextRelayer = itertools.count()
+
+    def send(order):
+        buyer = buyers[order.buyer]
+        start = time.time()
+        try:
+            if order.kind == DIRECT:
+                with buyerLocks[order.buyer]:
+                    tx = events.buyTicketsBatchWithTokens(eventID, order.sectionIDs, order.seatIDs, {'from': buyer})
+            else:
+                signer = signers[order.buyer]
+                abiData, nonce, signature = signer.sign('buyTicketsBatchWithTokens', ['uint32', 'uint16[]', 'uint16[]'],
+                                                        [eventID, order.sectionIDs, order.seatIDs], expiryDateSecs)
+                relayer = next(nextRelayer) % len(relayers)
+                try:
+                    with relayerLocks[relayer]:
+                        tx = events.performFeelessTransaction(buyer.address, events.address, abiData, nonce,
+                                                              expiryDateSecs, signature, {'from': relayers[relayer]})
+                except VirtualMachineError:
+                    signer.release(nonce, executed=False)
+                    raise
+                signer.release(nonce)
+        except VirtualMachineError as e:
+            return Result(order.kind, 0, start, time.time() - start, 0, getattr(e, 'revert_msg', None) or str(e))
+        return Result(order.kind, len(order.seatIDs), start, time.time() - start, tx.gas_used, None)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, orders))
+    return results, time.time() - start
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+
+class LoadReport:
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    def summary(self, kind=None):
+        results = [r for r in self.results if kind is None or r.kind == kind]
+        succeeded = [r for r in results if r.reason is None]
+        latencies = [r.latency * 1000 for r in results]
+        tickets = sum(r.tickets for r in succeeded)
+        return {
+            'orders': len(results),
+            'succeeded': len(succeeded),
+            'reverted': len(results) - len(succeeded),
+            'tickets': tickets,
+            'ordersPerSecond': len(succeeded) / self.elapsed if self.elapsed else 0.0,
+            'ticketsPerSecond': tickets / self.elapsed if self.elapsed else 0.0,
+            'latencyMs': {p: percentile(latencies, p / 100.0) for p in (50, 90, 99)},
+            'gasPerTicket': sum(r.gasUsed for r in succeeded) // tickets if tickets else 0,
+        }
+
+    def revertReasons(self):
+        return collections.Counter(r.reason for r in self.results if r.reason is not None)
+
+    def printReport(self):
+        print('%-8s %7s %7s %7s %8s %9s %8s %8s %8s %10s' % ('kind', 'orders', 'ok', 'revert', 'tickets',
+              'tickets/s', 'p50 ms', 'p90 ms', 'p99 ms', 'gas/ticket'))
+        for kind in (None, DIRECT, FEELESS):
+            s = self.summary(kind)
+            print('%-8s %7d %7d %7d %8d %9.2f %8.1f %8.1f %8.1f %10d' % (kind or 'all', s['orders'], s['succeeded'],
+                  s['reverted'], s['tickets'], s['ticketsPerSecond'], s['latencyMs'][50], s['latencyMs'][90],
+                  s['latencyMs'][99], s['gasPerTicket']))
+        print('\nRevert reasons (%.2fs wall time):' % self.elapsed)
+        for reason, count in self.revertReasons().most_common():
+            print('%6d  %s' % (count, reason))
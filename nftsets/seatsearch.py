@@ -0,0 +1,208 @@
+"""
+Best available adjacent seats search with NumPy.
+
+Each section keeps a boolean array of free seats (index i is seatID i + 1)
+and a quality score per seat. Seats are laid out in rows of `rowLength`
+consecutive seatIDs, runs of adjacent seats never cross rows. The score of
+a run is the sum of the quality of its seats.
+
+Quality does not change, so the runs of each length are sorted by score
+once. A query walks that order in growing chunks and keeps the runs whose
+seats are all free, checked with cumulative sums of the free seats, so it
+usually stops after a few hundred candidates. An event is searched as one
+array of all its sections, with the price limit applied per candidate.
+
+Availability is loaded from the chain with ticketIsAvailable(), one call
+per seat, or from the packed bitmaps of an indexer for large venues.
+"""
+import numpy as np
+
+# Candidates checked by the first chunk of a query, each next chunk is 4 times bigger.
+SEARCH_CHUNK = 256
+# Sales of up to this many seats update the free seats sums in place.
+SOLD_UPDATE_LIMIT = 16
+
+
+def frontCenterQuality(size, rowLength):
+    """
+    Default seat quality: front rows first, then seats closer to the center of the row.
+    """
+    seats = np.arange(size)
+    rows, cols = seats // rowLength, seats % rowLength
+    return -rows - np.abs(cols - (rowLength - 1) / 2.0) / rowLength
+
+
+class SeatRun:
+    def __init__(self, sectionID, firstSeatID, count, score, price):
+        self.sectionID = sectionID
+        self.firstSeatID = firstSeatID
+        self.count = count
+        self.score = score
+        # Price plus fees of one seat.
+        self.price = price
+
+    @property
+    def seatIDs(self):
+        return list(range(self.firstSeatID, self.firstSeatID + self.count))
+
+    def __repr__(self):
+        return 'SeatRun(section=%d, seats=%d-%d, score=%.3f)' % (
+            self.sectionID, self.firstSeatID, self.firstSeatID + self.count - 1, self.score)
+
+
+class SeatSearch:
+    """
+    Search over a flat array of seats. Seats with the same consecutive `rowIDs` form a row.
+    """
+    def __init__(self, free, quality, rowIDs):
+        self.free = np.asarray(free, dtype=bool).copy()
+        self.quality = np.asarray(quality, dtype=np.float64)
+        self.qualitySums = np.concatenate(([0.0], np.cumsum(self.quality)))
+        self.rowIDs = np.asarray(rowIDs)
+        self.freeSums = None
+        self.runOrders = {}
+
+    def runOrder(self, count):
+        """
+        Starts of all the runs of `count` seats in a row and their scores, best first. Cached per count.
+        """
+        if count not in self.runOrders:
+            starts = np.flatnonzero(self.rowIDs[:len(self.rowIDs) - count + 1] == self.rowIDs[count - 1:])
+            # Rounded so equal scores keep seat order, whatever the error of the cumulative sums.
+            scores = np.round(self.qualitySums[starts + count] - self.qualitySums[starts], 9)
+            order = np.argsort(-scores, kind='stable')
+            self.runOrders[count] = (starts[order], scores[order])
+        return self.runOrders[count]
+
+    def searchRuns(self, count, limit=1, startFilter=None):
+        """
+        Best `limit` runs of `count` free adjacent seats as (start index, score), best first.
+        Runs may overlap. `startFilter` takes an array of start indexes and gives which are allowed.
+        """
+        if count <= 0 or count > len(self.free):
+            return []
+        if self.freeSums is None:
+            self.freeSums = np.concatenate(([0], np.cumsum(self.free, dtype=np.int32)))
+        starts, scores = self.runOrder(count)
+
+        found = []
+        first, chunk = 0, SEARCH_CHUNK
+        while first < len(starts) and len(found) < limit:
+            candidates = starts[first:first + chunk]
+            allowed = self.freeSums[candidates + count] - self.freeSums[candidates] == count
+            if startFilter is not None:
+                allowed &= startFilter(candidates)
+            hits = np.flatnonzero(allowed)[:limit - len(found)]
+            found.extend(zip(candidates[hits].tolist(), scores[first + hits].tolist()))
+            first, chunk = first + chunk, chunk * 4
+        return found
+
+    def markSeatsSold(self, seats):
+        seats = np.unique(seats)
+        seats = seats[self.free[seats]]
+        self.free[seats] = False
+        # A few sales update the cumulative sums in place, cheaper than summing again.
+        if self.freeSums is not None and len(seats) <= SOLD_UPDATE_LIMIT:
+            for seat in seats:
+                self.freeSums[seat + 1:] -= 1
+        else:
+            self.freeSums = None
+
+
+class SectionSeats(SeatSearch):
+    """
+    Free seats of one section. `quality` is an array with one score per seat, or a function
+    (size, rowLength) -> array, frontCenterQuality() by default.
+    """
+    def __init__(self, sectionID, free, price=0, rowLength=None, quality=frontCenterQuality):
+        size = len(free)
+        self.sectionID = sectionID
+        self.price = price
+        self.rowLength = rowLength or size
+        quality = quality(size, self.rowLength) if callable(quality) else quality
+        super().__init__(free, quality, np.arange(size) // self.rowLength)
+
+    @classmethod
+    def fromBitmap(cls, sectionID, bitmap, size, **kwargs):
+        """
+        Section from a packed bitmap of sold seats, bit i (little-endian in each byte) is seatID i + 1.
+        """
+        sold = np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8), bitorder='little')[:size]
+        sold = np.pad(sold, (0, size - len(sold)))
+        return cls(sectionID, sold == 0, **kwargs)
+
+    def bestRuns(self, count, limit=1):
+        """
+        Best `limit` runs of `count` free adjacent seats, best first. Runs may overlap.
+        """
+        return [SeatRun(self.sectionID, start + 1, count, score, self.price)
+                for start, score in self.searchRuns(count, limit)]
+
+    def markSold(self, seatIDs):
+        self.markSeatsSold(np.asarray(seatIDs) - 1)
+
+
+class EventSeats(SeatSearch):
+    """
+    Free seats of all the sections of one event, searched together. The sections are copied,
+    update the availability with markSold() of the event.
+    """
+    def __init__(self, sections):
+        self.sections = {section.sectionID: section for section in sections}
+        self.offsets = {}
+        sectionIDs, prices, rowIDs, offset, rowOffset = [], [], [], 0, 0
+        for section in sections:
+            self.offsets[section.sectionID] = offset
+            sectionIDs.append(np.full(len(section.free), section.sectionID))
+            prices.append(np.full(len(section.free), section.price))
+            rowIDs.append(section.rowIDs + rowOffset)
+            offset += len(section.free)
+            rowOffset += int(section.rowIDs[-1]) + 1 if len(section.free) else 0
+
+        def concat(arrays, dtype):
+            return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+        self.seatSections = concat(sectionIDs, np.int64)
+        self.seatPrices = concat(prices, np.int64)
+        super().__init__(concat([s.free for s in sections], bool), concat([s.quality for s in sections], np.float64),
+                         concat(rowIDs, np.int64))
+
+    @classmethod
+    def fromChain(cls, events, eventID, rowLength=None, quality=frontCenterQuality):
+        """
+        Loads sizes, prices plus fees and availability of every section, one call per seat.
+        """
+        sections = []
+        for sectionID in range(1, events.numberOfSections(eventID) + 1):
+            size = events.sectionSize(eventID, sectionID)
+            free = [events.ticketIsAvailable(eventID, sectionID, seatID) for seatID in range(1, size + 1)]
+            price = events.sectionPrice(eventID, sectionID) + events.sectionFee(eventID, sectionID)
+            sections.append(SectionSeats(sectionID, free, price, rowLength, quality))
+        return cls(sections)
+
+    @classmethod
+    def fromSeatState(cls, state, eventID, prices=None, rowLength=None, quality=frontCenterQuality):
+        """
+        Loads sizes and availability of every section from the bitmaps of a SeatState.
+        `prices` maps sectionIDs to prices plus fees, the file does not keep them.
+        """
+        prices = prices or {}
+        return cls([SectionSeats.fromBitmap(sectionID, state.bitmap(eventID, sectionID), size,
+                                            price=prices.get(sectionID, 0), rowLength=rowLength, quality=quality)
+                     for _, sectionID, size in state.sections(eventID)])
+
+    def bestRuns(self, count, maxPrice=None, limit=1):
+        """
+        Best `limit` runs of `count` free adjacent seats in any section whose price plus fees
+        per seat is at most `maxPrice`, best first.
+        """
+        startFilter = None if maxPrice is None else (lambda starts: self.seatPrices[starts] <= maxPrice)
+        runs = []
+        for start, score in self.searchRuns(count, limit, startFilter):
+            sectionID = int(self.seatSections[start])
+            runs.append(SeatRun(sectionID, start - self.offsets[sectionID] + 1, count, score,
+                                self.sections[sectionID].price))
+        return runs
+
+    def markSold(self, sectionID, seatIDs):
+        self.markSeatsSold(self.offsets[sectionID] + np.asarray(seatIDs) - 1)
@@ -0,0 +1,301 @@
+"""
+Memory-mapped seat-state file: the sold seats of every section of the events of one
+EventMasterService and the block they are synced to, so services start from the file
+instead of calling ticketIsAvailable() for every seat.
+
+Layout, little-endian:
+    header   64 bytes: magic, version, number of sections, last synced block, service address
+    index    24 bytes per section, sorted by key: key (eventID << 16 | sectionID) uint64,
+             bitmap offset uint64, size uint32, sold seats uint32
+    bitmaps  one per section, ceil(size / 8) bytes padded to 8, bit i (little-endian in each
+             byte) is seatID i + 1, as SectionSeats.fromBitmap() reads them
+Opening a file maps it and reads the header. The index is a NumPy view of the mapping and
+bitmap() gives memoryviews of it, nothing is copied, and processes that open the same file
+share its pages.
+
+One process updates a file in place with markSold() or sync(). Seats only go from free to
+sold, so bits are set in place and the block is written after them: a reader never sees a
+block newer than the bits. Sections created after the file was built are not in it, sync()
+counts their seats as missing and build() writes a new file over the old one, which readers
+pick up with reopen().
+
+    build('seats.bin', rpc, eventsAddress)
+    state = SeatState('seats.bin')
+    seats = EventSeats.fromSeatState(state, eventID)
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from nftsets.analytics import PurchaseDecoder, chunks
+from nftsets.client.contracts import EventMasterClient
+
+MAGIC = b'NFTSEATS'
+VERSION = 1
+# magic, version, number of sections, last synced block, service address.
+HEADER = struct.Struct('<8sIIQ20s20x')
+LAST_BLOCK = struct.Struct('<Q')
+LAST_BLOCK_OFFSET = 16
+INDEX_DTYPE = np.dtype([('key', '<u8'), ('offset', '<u8'), ('size', '<u4'), ('sold', '<u4')])
+BITMAP_ALIGN = 8
+# Seats per soldSeats() call, ranges start on a byte of the bitmaps.
+SOLD_SEATS_RANGE = 4096
+SYNC_BLOCKS = 1000
+RPC_BATCH = 100
+
+
+class SeatStateError(ValueError):
+    pass
+
+
+def sectionKey(eventID, sectionID):
+    return (eventID << 16) | sectionID
+
+
+def bitmapBytes(size):
+    return (size + 7) // 8
+
+
+def create(path, address, sections, lastBlock=0):
+    """
+    Writes a seat-state file with no seat sold for `sections`, (eventID, sectionID, size) tuples.
+    """
+    sections = sorted(sections)
+    index = np.zeros(len(sections), INDEX_DTYPE)
+    padded = np.zeros(0, np.uint64)
+    if sections:
+        eventIDs, sectionIDs, sizes = (np.array(column, dtype=np.uint64) for column in zip(*sections))
+        index['key'] = (eventIDs << np.uint64(16)) | sectionIDs
+        index['size'] = sizes
+        if np.any(np.diff(index['key'].astype(np.int64)) == 0):
+            raise SeatStateError("Sections must be unique.")
+        # ceil(size / 8) bytes rounded up to BITMAP_ALIGN.
+        bits = np.uint64(BITMAP_ALIGN * 8)
+        padded = (sizes + bits - np.uint64(1)) // bits * np.uint64(BITMAP_ALIGN)
+        index['offset'] = np.uint64(HEADER.size + index.nbytes) + np.cumsum(padded) - padded
+    end = HEADER.size + index.nbytes + int(padded.sum())
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(sections), lastBlock, bytes.fromhex(address[2:])))
+        f.write(index.tobytes())
+        # Bitmaps start zeroed, the file is sparse until seats are sold.
+        f.truncate(end)
+
+
+class SeatState:
+    """
+    Seat-state file at `path`, mapped read-only or, with `writable`, for updates in place.
+    """
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        self.open()
+
+    def open(self):
+        with open(self.path, 'r+b' if self.writable else 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+        magic, version, count, _, address = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise SeatStateError("%s is not a seat-state file of version %d." % (self.path, VERSION))
+        self.address = '0x' + address.hex()
+        self.index = np.frombuffer(self.map, INDEX_DTYPE, count, HEADER.size)
+        self.keys = self.index['key']
+        self.bytes = np.frombuffer(self.map, np.uint8)
+
+    def reopen(self):
+        """
+        Maps the file again if build() replaced it, gives whether it did. The old mapping is
+        released with the last bitmap taken from it.
+        """
+        if os.stat(self.path).st_ino == self.inode:
+            return False
+        self.open()
+        return True
+
+    def close(self):
+        if self.writable:
+            self.map.flush()
+        self.index = self.keys = self.bytes = None
+        try:
+            self.map.close()
+        except BufferError:
+            # Bitmaps given to callers are still in use, the mapping goes with them.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def lastBlock(self):
+        return LAST_BLOCK.unpack_from(self.map, LAST_BLOCK_OFFSET)[0]
+
+    def position(self, eventID, sectionID):
+        key = sectionKey(eventID, sectionID)
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError((eventID, sectionID))
+        return i
+
+    def hasSection(self, eventID, sectionID):
+        try:
+            self.position(eventID, sectionID)
+        except KeyError:
+            return False
+        return True
+
+    def sections(self, eventID=None):
+        """
+        (eventID, sectionID, size) of the sections of the file, or of one event.
+        """
+        first, last = 0, len(self.keys)
+        if eventID is not None:
+            first, last = np.searchsorted(self.keys, [sectionKey(eventID, 0), sectionKey(eventID + 1, 0)])
+        keys, sizes = self.keys[first:last], self.index['size'][first:last]
+        return list(zip((keys >> np.uint64(16)).tolist(), (keys & np.uint64(0xffff)).tolist(), sizes.tolist()))
+
+    def size(self, eventID, sectionID):
+        return int(self.index['size'][self.position(eventID, sectionID)])
+
+    def soldCount(self, eventID, sectionID):
+        return int(self.index['sold'][self.position(eventID, sectionID)])
+
+    def totals(self):
+        """
+        Seats and sold seats of the whole file.
+        """
+        return int(self.index['size'].sum()), int(self.index['sold'].sum())
+
+    def bitmap(self, eventID, sectionID):
+        """
+        Sold seats bitmap of a section, a memoryview of the mapping.
+        """
+        i = self.position(eventID, sectionID)
+        offset = int(self.index['offset'][i])
+        return memoryview(self.map)[offset:offset + bitmapBytes(int(self.index['size'][i]))]
+
+    def isAvailable(self, eventID, sectionID, seatID):
+        i = self.position(eventID, sectionID)
+        if not 1 <= seatID <= self.index['size'][i]:
+            raise SeatStateError("Seat %d is not in section %d of event %d." % (seatID, sectionID, eventID))
+        return not self.map[int(self.index['offset'][i]) + (seatID - 1) // 8] >> ((seatID - 1) % 8) & 1
+
+    def soldSeatIDs(self, eventID, sectionID):
+        sold = np.unpackbits(np.frombuffer(self.bitmap(eventID, sectionID), np.uint8), bitorder='little')
+        return (np.flatnonzero(sold) + 1).tolist()
+
+    def markSold(self, eventID, sectionID, seatIDs):
+        """
+        Marks seats of a section as sold, gives how many of them were free.
+        """
+        i = self.position(eventID, sectionID)
+        seats = np.unique(np.asarray(seatIDs, dtype=np.int64)) - 1
+        if len(seats) and (seats[0] < 0 or seats[-1] >= self.index['size'][i]):
+            raise SeatStateError("Seats out of section %d of event %d." % (sectionID, eventID))
+        positions = int(self.index['offset'][i]) + seats // 8
+        masks = np.left_shift(1, seats % 8).astype(np.uint8)
+        newlySold = int(np.count_nonzero(self.bytes[positions] & masks == 0))
+        np.bitwise_or.at(self.bytes, positions, masks)
+        self.index['sold'][i] += newlySold
+        return newlySold
+
+    def mergeBitmap(self, eventID, sectionID, firstSeatID, data):
+        """
+        Marks as sold the seats set in `data`, a bitmap of the seats from `firstSeatID` on
+        (1 plus a multiple of 8), and counts the sold seats of the section again.
+        """
+        i = self.position(eventID, sectionID)
+        if (firstSeatID - 1) % 8:
+            raise SeatStateError("Bitmaps must start on a byte, at seatID 1 plus a multiple of 8.")
+        offset, length = int(self.index['offset'][i]), bitmapBytes(int(self.index['size'][i]))
+        start = (firstSeatID - 1) // 8
+        data = np.frombuffer(data, np.uint8)[:length - start]
+        self.bytes[offset + start:offset + start + len(data)] |= data
+        self.index['sold'][i] = int(np.unpackbits(self.bytes[offset:offset + length]).sum())
+
+    def setLastBlock(self, block):
+        LAST_BLOCK.pack_into(self.map, LAST_BLOCK_OFFSET, block)
+
+    def flush(self):
+        self.map.flush()
+
+
+def loadSoldSeats(state, service, block='latest', rangeSeats=SOLD_SEATS_RANGE, batch=RPC_BATCH):
+    """
+    Marks the seats sold at `block` in every section of `state`, with soldSeats() calls of
+    `rangeSeats` seats (a multiple of 8) sent in JSON-RPC batches.
+    """
+    calls = [(eventID, sectionID, first, min(rangeSeats, size - first + 1))
+             for eventID, sectionID, size in state.sections() for first in range(1, size + 1, rangeSeats)]
+    for calls in chunks(calls, batch):
+        for (eventID, sectionID, first, _), words in zip(calls, service.callBatch('soldSeats', calls, block)):
+            state.mergeBitmap(eventID, sectionID, first, b''.join(word.to_bytes(32, 'little') for word in words))
+
+
+def build(path, rpc, address, block=None, rangeSeats=SOLD_SEATS_RANGE, batch=RPC_BATCH):
+    """
+    Writes the seat-state file of the service at `address` at `block`, the latest by default:
+    sections from eventInfo() and sectionSize(), sold seats from soldSeats(). The file is
+    written next to `path` and renamed over it. Gives the block.
+    """
+    service = EventMasterClient(rpc, address)
+    block = int(rpc.request('eth_blockNumber'), 16) if block is None else block
+    tag = hex(block)
+    sections = []
+    for eventIDs in chunks(list(range(1, service.call('numberOfEvents', block=tag) + 1)), batch):
+        infos = service.callBatch('eventInfo', [(eventID,) for eventID in eventIDs], tag)
+        pairs = [(eventID, sectionID) for eventID, info in zip(eventIDs, infos) for sectionID in range(1, info[2] + 1)]
+        for pairs in chunks(pairs, batch):
+            sections.extend(pair + (size,) for pair, size in zip(pairs, service.callBatch('sectionSize', pairs, tag)))
+    create(path + '.tmp', address.lower(), sections, block)
+    with SeatState(path + '.tmp', writable=True) as state:
+        loadSoldSeats(state, service, tag, rangeSeats, batch)
+    os.replace(path + '.tmp', path)
+    return block
+
+
+def sync(state, rpc, toBlock=None, confirmations=0, batch=RPC_BATCH):
+    """
+    Marks the seats sold after the last synced block of `state` (opened writable), decoded from
+    the transactions of the ReceivedTokens logs of the service. Purchases that cannot be decoded
+    (made through another contract) load every section again with soldSeats(). Seats of sections
+    not in the file are counted as missing, build() a new file to get them.
+    """
+    service = EventMasterClient(rpc, state.address)
+    decoder = PurchaseDecoder(service)
+    topics = {event['name']: topic for topic, event in service.events.items()}
+    head = int(rpc.request('eth_blockNumber'), 16) - confirmations
+    if toBlock is not None:
+        head = min(head, toBlock)
+    stats = {'blocks': 0, 'seats': 0, 'missing': 0, 'reloaded': 0}
+    for firstBlock in range(state.lastBlock + 1, head + 1, SYNC_BLOCKS):
+        lastBlock = min(firstBlock + SYNC_BLOCKS - 1, head)
+        logs = rpc.request('eth_getLogs', [{'address': state.address, 'fromBlock': hex(firstBlock),
+                                            'toBlock': hex(lastBlock), 'topics': [topics['ReceivedTokens']]}])
+        undecoded = False
+        for logs in chunks(logs, batch):
+            for tx in rpc.batch('eth_getTransactionByHash', [[log['transactionHash']] for log in logs]):
+                purchase = decoder.decode(tx)
+                if purchase is None:
+                    undecoded = True
+                    continue
+                eventID, seats = purchase
+                sections = {}
+                for sectionID, seatID in seats:
+                    sections.setdefault(sectionID, []).append(seatID)
+                for sectionID, seatIDs in sections.items():
+                    if state.hasSection(eventID, sectionID):
+                        stats['seats'] += state.markSold(eventID, sectionID, seatIDs)
+                    else:
+                        stats['missing'] += len(seatIDs)
+        if undecoded:
+            loadSoldSeats(state, service, hex(lastBlock), batch=batch)
+            stats['reloaded'] += 1
+        state.setLastBlock(lastBlock)
+        stats['blocks'] += lastBlock - firstBlock + 1
+    state.flush()
+    return stats
@@ -0,0 +1,250 @@
+"""
+Encoding and signing of EventMasterService calls.
+
+Feeless meta-transactions are signed by the ticket buyer and sent to
+performFeelessTransaction() by any relayer, FeelessSigner picks nonce
+lanes so many of them can be in flight at once. Seats can also be packed
+tightly for buyTicketsPackedWithTokens() and
+buyTicketRangesPackedWithTokens(), which saves most of the calldata of
+big carts (ABI encoding pads every uint16 to 32 bytes).
+
+Purchases can carry an EIP-2612 permit of the currency token, so the buyer
+does not send an approve() transaction first, FeelessSigner.signWithPermit()
+signs the permit and the meta-transaction wrapping the purchase together.
+"""
+import struct
+import threading
+
+import web3
+import eth_abi
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from eth_keys import keys
+
+# Calldata gas per byte (Petersburg rules, same as ganache on brownie-config.json).
+CALLDATA_ZERO_BYTE_GAS = 4
+CALLDATA_NONZERO_BYTE_GAS = 68
+
+PACKED_SEAT_FORMAT = '>HH'
+PACKED_RANGE_FORMAT = '>HHH'
+MAX_SEATS_PER_RANGE = 2**16 - 1
+
+SECP256K1_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+# Feeless nonces: upper 192 bits lane key, lower 64 bits sequence in the lane.
+NONCE_SEQUENCE_BITS = 64
+
+PERMIT_TYPEHASH = web3.Web3.keccak(
+    text='Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)')
+EIP712_DOMAIN_TYPEHASH = web3.Web3.keccak(
+    text='EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)')
+PERMIT_VERSION = '1'
+PERMIT_ARG_TYPES = ['uint256', 'uint256', 'uint8', 'bytes32', 'bytes32']
+
+
+def encodeABI(fname, lstTypes, lstValues):
+    hashsign = web3.Web3.keccak(text='%s(%s)' % (fname,','.join(lstTypes) ))[:4]
+    vals = eth_abi.encode_abi(lstTypes,lstValues)
+    return hashsign + vals
+
+
+def signFeelessTx(privateKey, contractAddress, abiData, nonce, expiryDateSecs):
+    """
+    Signs `abiData` to be executed on `contractAddress` through performFeelessTransaction().
+    Returns the 65 bytes signature.
+    """
+    nonceToHex = "{0:0{1}x}".format(nonce,64)
+    expiryToHex = "{0:0{1}x}".format(expiryDateSecs,64)
+    textToHash = contractAddress + abiData.hex() + nonceToHex + expiryToHex
+    txHash = web3.Web3.keccak( hexstr = textToHash )
+    txHash = txHash.hex()[2:]
+    msghash = encode_defunct(hexstr=txHash)
+    txSig = Account.sign_message(msghash, private_key=toPrivateKey(privateKey).to_bytes())
+    assert len(txSig.signature) == 65
+    return txSig.signature
+
+
+def toPrivateKey(privateKey):
+    """
+    Gives the eth_keys private key of a hex string or raw 32 bytes key.
+    """
+    if isinstance(privateKey, str):
+        privateKey = bytes.fromhex(privateKey[2:] if privateKey.startswith('0x') else privateKey)
+    return keys.PrivateKey(privateKey)
+
+
+def permitDomainSeparator(tokenName, chainId, tokenAddress):
+    """
+    EIP-712 domain separator of ERC20Permit tokens, same as DOMAIN_SEPARATOR() on chain.
+    """
+    return web3.Web3.keccak(eth_abi.encode_abi(
+        ['bytes32', 'bytes32', 'bytes32', 'uint256', 'address'],
+        [EIP712_DOMAIN_TYPEHASH, web3.Web3.keccak(text=tokenName), web3.Web3.keccak(text=PERMIT_VERSION),
+         chainId, tokenAddress]))
+
+
+def signPermit(privateKey, domainSeparator, owner, spender, value, nonce, deadline):
+    """
+    Signs an EIP-2612 permit of `value` tokens from `owner` to `spender`, returns (v, r, s).
+    """
+    if isinstance(domainSeparator, str):
+        domainSeparator = bytes.fromhex(domainSeparator[2:] if domainSeparator.startswith('0x') else domainSeparator)
+    structHash = web3.Web3.keccak(eth_abi.encode_abi(
+        ['bytes32', 'address', 'address', 'uint256', 'uint256', 'uint256'],
+        [PERMIT_TYPEHASH, owner, spender, value, nonce, deadline]))
+    digest = web3.Web3.keccak(b'\x19\x01' + bytes(domainSeparator) + structHash)
+    sig = toPrivateKey(privateKey).sign_msg_hash(digest)
+    return sig.v + 27, sig.r.to_bytes(32, 'big'), sig.s.to_bytes(32, 'big')
+
+
+def malleateSignature(signature):
+    """
+    Gives the (r, n - s, v ^ 1) twin of a 65 bytes signature, valid for the same signer
+    on plain ecrecover but rejected by the contracts (only low `s` is accepted).
+    """
+    r, s, v = signature[:32], int.from_bytes(signature[32:64], 'big'), signature[64]
+    return r + (SECP256K1_ORDER - s).to_bytes(32, 'big') + bytes([55 - v if v >= 27 else 1 - v])
+
+
+def encodeNonce(key, sequence):
+    return (key << NONCE_SEQUENCE_BITS) | sequence
+
+
+def decodeNonce(nonce):
+    """
+    Gives the (key, sequence) pair of a feeless nonce.
+    """
+    return nonce >> NONCE_SEQUENCE_BITS, nonce & (2**NONCE_SEQUENCE_BITS - 1)
+
+
+class NonceLanes:
+    """
+    Picks feeless nonce lanes for one signer so several meta-transactions can be in flight.
+
+    Each in-flight meta-transaction holds one lane until release() is called, so the
+    sequence enforced by the contract within a lane is never out of order. `fetchNonce`
+    gives the current nonce of a lane key on chain, e.g. `lambda key: es.getNonce(addr, key)`.
+    New lanes are opened when all known ones are busy, up to `maxLanes`.
+    """
+
+    def __init__(self, fetchNonce, maxLanes=2**16):
+        self.fetchNonce = fetchNonce
+        self.maxLanes = maxLanes
+        self.sequences = {}
+        self.busy = set()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Reserves an idle lane and gives the nonce to sign on it.
+        """
+        with self.lock:
+            key = next((k for k in sorted(self.sequences) if k not in self.busy), None)
+            if key is None:
+                key = len(self.sequences)
+                assert key < self.maxLanes, "All nonce lanes are busy."
+                self.sequences[key] = decodeNonce(self.fetchNonce(key))[1]
+            self.busy.add(key)
+            return encodeNonce(key, self.sequences[key])
+
+    def release(self, nonce, executed=True):
+        """
+        Frees the lane of `nonce`, its sequence moves on only if the meta-transaction was executed.
+        """
+        key, sequence = decodeNonce(nonce)
+        with self.lock:
+            if executed:
+                self.sequences[key] = sequence + 1
+            self.busy.discard(key)
+
+
+class FeelessSigner:
+    """
+    Signs meta-transactions of one account, choosing nonce lanes automatically.
+    """
+
+    def __init__(self, privateKey, contractAddress, fetchNonce, maxLanes=2**16):
+        self.privateKey = privateKey
+        self.contractAddress = contractAddress
+        self.lanes = NonceLanes(fetchNonce, maxLanes)
+
+    def sign(self, fname, lstTypes, lstValues, expiryDateSecs):
+        """
+        Returns (abiData, nonce, signature), call release() with the nonce once executed or dropped.
+        """
+        abiData = encodeABI(fname, lstTypes, lstValues)
+        nonce = self.lanes.acquire()
+        return abiData, nonce, signFeelessTx(self.privateKey, self.contractAddress, abiData, nonce, expiryDateSecs)
+
+    def signWithPermit(self, fname, lstTypes, lstValues, domainSeparator, permitNonce, value, deadline, expiryDateSecs):
+        """
+        Signs a *WithPermit purchase: the token permit of `value` for the contract is signed first
+        and its (value, deadline, v, r, s) appended to `lstValues`, then the meta-transaction.
+        `permitNonce` is nonces(owner) on the token, permits of one owner are consumed in order.
+        Returns (abiData, nonce, signature) as sign().
+        """
+        owner = toPrivateKey(self.privateKey).public_key.to_checksum_address()
+        v, r, s = signPermit(self.privateKey, domainSeparator, owner, self.contractAddress,
+                             value, permitNonce, deadline)
+        return self.sign(fname, list(lstTypes) + PERMIT_ARG_TYPES, list(lstValues) + [value, deadline, v, r, s],
+                         expiryDateSecs)
+
+    def release(self, nonce, executed=True):
+        self.lanes.release(nonce, executed)
+
+
+def packSeats(sectionIDs, seatIDs):
+    """
+    Packs seats for buyTicketsPackedWithTokens(), 4 bytes per seat.
+    """
+    if len(sectionIDs) != len(seatIDs):
+        raise ValueError("Section and Seat lists must have the same length.")
+    return b''.join(struct.pack(PACKED_SEAT_FORMAT, sectionID, seatID) for sectionID, seatID in zip(sectionIDs, seatIDs))
+
+
+def unpackSeats(packedSeats):
+    """
+    Inverse of packSeats(), gives the lists of sectionIDs and seatIDs.
+    """
+    if len(packedSeats) % 4:
+        raise ValueError("Packed seats length must be a multiple of 4 bytes.")
+    pairs = list(struct.iter_unpack(PACKED_SEAT_FORMAT, packedSeats))
+    return [p[0] for p in pairs], [p[1] for p in pairs]
+
+
+def seatsToRanges(sectionIDs, seatIDs):
+    """
+    Run-length encodes seats as (sectionID, firstSeatID, count) ranges of adjacent seats.
+    Seat order is not kept, seats are grouped per section and sorted. Raises ValueError on a
+    seat listed twice, the contracts revert on it and ranges must not buy fewer seats.
+    """
+    if len(sectionIDs) != len(seatIDs):
+        raise ValueError("Section and Seat lists must have the same length.")
+    seats = sorted(zip(sectionIDs, seatIDs))
+    for previous, seat in zip(seats, seats[1:]):
+        if previous == seat:
+            raise ValueError("Seat %d of section %d is listed twice." % (seat[1], seat[0]))
+    ranges = []
+    for sectionID, seatID in seats:
+        if ranges:
+            lastSection, firstSeat, count = ranges[-1]
+            if lastSection == sectionID and firstSeat + count == seatID and count < MAX_SEATS_PER_RANGE:
+                ranges[-1] = (lastSection, firstSeat, count + 1)
+                continue
+        ranges.append((sectionID, seatID, 1))
+    return ranges
+
+
+def packSeatRanges(ranges):
+    """
+    Packs (sectionID, firstSeatID, count) ranges for buyTicketRangesPackedWithTokens(), 6 bytes per range.
+    """
+    return b''.join(struct.pack(PACKED_RANGE_FORMAT, *r) for r in ranges)
+
+
+def calldataGas(data):
+    """
+    Gas paid for `data` as transaction calldata.
+    """
+    zeros = data.count(0)
+    return zeros * CALLDATA_ZERO_BYTE_GAS + (len(data) - zeros) * CALLDATA_NONZERO_BYTE_GAS
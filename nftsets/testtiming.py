@@ -0,0 +1,194 @@
+"""
+Wall time of a test session, registered by tests/conftest.py with --timing-report.
+
+SessionTiming is a pytest plugin that records the setup and teardown time
+of every fixture, the setup, call and teardown time of every test, and every
+RPC request sent through the web3 provider (count and time per method, so
+the evm_snapshot/evm_revert calls of fn_isolation show up on their own).
+Compilation and node start happen before the tests: they are timed when
+they run after the plugin is registered, otherwise the time from process
+start to the first test is reported as startup.
+
+The report is written as PREFIX.json and PREFIX.csv, and the slowest
+fixtures, tests and RPC methods are printed at the end of the session.
+"""
+import collections
+import csv
+import json
+import os
+import time
+
+import pytest
+
+SNAPSHOT_METHODS = ('evm_snapshot', 'evm_revert')
+
+
+def processStartTime():
+    """
+    Wall clock time the process started at, None when it can not be read.
+    """
+    try:
+        import psutil
+        return psutil.Process().create_time()
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/stat') as f:
+            ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            bootTime = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return bootTime + ticks / os.sysconf('SC_CLK_TCK')
+    except (IOError, OSError, ValueError, StopIteration):
+        return None
+
+
+class Timings:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+
+
+class SessionTiming:
+    def __init__(self, prefix, top=10):
+        self.prefix = prefix
+        self.top = top
+        self.start = time.time()
+        self.phases = collections.OrderedDict()
+        # (fixture, scope) -> {'setup': Timings, 'teardown': Timings}
+        self.fixtures = collections.defaultdict(lambda: {'setup': Timings(), 'teardown': Timings()})
+        # nodeid -> {'setup': s, 'call': s, 'teardown': s}
+        self.tests = collections.OrderedDict()
+        self.rpc = collections.defaultdict(Timings)
+        self.teardownStarts = {}
+        self.provider = None
+        self.wrapBrownie()
+
+    def timePhase(self, name, function):
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phases[name] = self.phases.get(name, 0.0) + time.time() - start
+        return timed
+
+    def wrapBrownie(self):
+        """
+        Times compilation and node start if brownie has not done them yet.
+        """
+        try:
+            from brownie import network, project
+        except ImportError:
+            return
+        if hasattr(project, 'load'):
+            project.load = self.timePhase('compile', project.load)
+        if hasattr(network, 'is_connected') and not network.is_connected():
+            network.connect = self.timePhase('node start', network.connect)
+
+    def wrapProvider(self):
+        """
+        Counts and times the RPC requests of the current web3 provider. Brownie replaces it on connect.
+        """
+        try:
+            from brownie import web3
+        except ImportError:
+            return
+        provider = getattr(web3, 'provider', None)
+        if provider is None or provider is self.provider:
+            return
+        self.provider = provider
+        makeRequest = provider.make_request
+
+        def timedRequest(method, params):
+            start = time.time()
+            try:
+                return makeRequest(method, params)
+            finally:
+                self.rpc[method].add(time.time() - start)
+        provider.make_request = timedRequest
+
+    def pytest_sessionstart(self, session):
+        self.wrapProvider()
+
+    def pytest_runtest_setup(self, item):
+        if 'startup' not in self.phases and not self.tests:
+            processStart = processStartTime()
+            timed = sum(self.phases.values())
+            if processStart is not None:
+                self.phases['startup'] = time.time() - processStart - timed
+        self.wrapProvider()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        start = time.time()
+        key = (fixturedef.argname, fixturedef.scope)
+        yield
+        self.fixtures[key]['setup'].add(time.time() - start)
+        # Finalizers run last added first, this one before the teardown code of the fixture.
+        fixturedef.addfinalizer(lambda: self.teardownStarts.__setitem__(key, time.time()))
+
+    def pytest_fixture_post_finalizer(self, fixturedef, request):
+        key = (fixturedef.argname, fixturedef.scope)
+        start = self.teardownStarts.pop(key, None)
+        if start is not None:
+            self.fixtures[key]['teardown'].add(time.time() - start)
+
+    def pytest_runtest_logreport(self, report):
+        self.tests.setdefault(report.nodeid, {'setup': 0.0, 'call': 0.0, 'teardown': 0.0})[report.when] = \
+            report.duration
+
+    def report(self):
+        fixtures = [{'fixture': name, 'scope': scope, 'setups': t['setup'].count, 'setup': t['setup'].seconds,
+                     'teardowns': t['teardown'].count, 'teardown': t['teardown'].seconds}
+                    for (name, scope), t in self.fixtures.items()]
+        return {
+            'elapsed': time.time() - self.start,
+            'phases': dict(self.phases),
+            'fixtures': sorted(fixtures, key=lambda f: -(f['setup'] + f['teardown'])),
+            'tests': [dict(test=nodeid, **times) for nodeid, times in self.tests.items()],
+            'rpc': {method: {'count': t.count, 'seconds': t.seconds} for method, t in sorted(self.rpc.items())},
+        }
+
+    def write(self, report):
+        with open(self.prefix + '.json', 'w') as f:
+            json.dump(report, f, indent=1)
+        with open(self.prefix + '.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'name', 'phase', 'count', 'seconds'])
+            for name, seconds in report['phases'].items():
+                writer.writerow(['phase', name, '', 1, '%.6f' % seconds])
+            for fixture in report['fixtures']:
+                name = '%s (%s)' % (fixture['fixture'], fixture['scope'])
+                writer.writerow(['fixture', name, 'setup', fixture['setups'], '%.6f' % fixture['setup']])
+                writer.writerow(['fixture', name, 'teardown', fixture['teardowns'], '%.6f' % fixture['teardown']])
+            for test in report['tests']:
+                for phase in ('setup', 'call', 'teardown'):
+                    writer.writerow(['test', test['test'], phase, 1, '%.6f' % test[phase]])
+            for method, rpc in report['rpc'].items():
+                writer.writerow(['rpc', method, '', rpc['count'], '%.6f' % rpc['seconds']])
+
+    def pytest_terminal_summary(self, terminalreporter):
+        report = self.report()
+        self.write(report)
+        write = terminalreporter.write_line
+        terminalreporter.section('session timing')
+        write('session %.2fs, %s' % (report['elapsed'], ', '.join(
+            '%s %.2fs' % item for item in report['phases'].items())))
+        write('slowest fixtures (setup + teardown):')
+        for fixture in report['fixtures'][:self.top]:
+            write('  %8.3fs  %4dx  %s (%s)' % (fixture['setup'] + fixture['teardown'], fixture['setups'],
+                                               fixture['fixture'], fixture['scope']))
+        write('slowest tests (call):')
+        for test in sorted(report['tests'], key=lambda t: -t['call'])[:self.top]:
+            write('  %8.3fs  %s' % (test['call'], test['test']))
+        rpc = report['rpc']
+        write('%d RPC requests, %.2fs:' % (sum(r['count'] for r in rpc.values()),
+                                          sum(r['seconds'] for r in rpc.values())))
+        for method, r in sorted(rpc.items(), key=lambda item: -item[1]['seconds'])[:self.top]:
+            marker = '  (isolation)' if method in SNAPSHOT_METHODS else ''
+            write('  %8.3fs  %6dx  %s%s' % (r['seconds'], r['count'], method, marker))
+        write('report written to %s.json and %s.csv' % (self.prefix, self.prefix))
@@ -0,0 +1,239 @@
+"""
+Workload traces: record the transactions sent to the contracts, replay them on a fresh chain.
+
+TraceRecorder wraps deployed contracts (or deploys them) and appends one
+JSON line per deployment and per transaction to the trace, in the order
+they were mined. Contract addresses in arguments are written as
+{"contract": label} and bytes as {"bytes": "0x.."}, so a replay maps them
+to its own deployments.
+
+replayTrace() deploys and sends everything again from the same senders as
+fast as possible: transactions get explicit nonces and gas limits, so
+there is no gas estimation and up to `depth` of them are in flight before
+their receipts are read. GasReport gives calls, reverts, gas and send time
+per function, and compareReports() puts two builds side by side.
+"""
+import collections
+import json
+import threading
+import time
+
+# Gas limit of replayed transactions, the ganache block gas limit on brownie-config.json.
+REPLAY_GAS_LIMIT = 6721975
+# Transactions sent before waiting for the receipt of the oldest one.
+PIPELINE_DEPTH = 64
+
+
+def encodeArg(value, labels):
+    if isinstance(value, (list, tuple)):
+        return [encodeArg(v, labels) for v in value]
+    if isinstance(value, (bytes, bytearray)):
+        return {'bytes': '0x' + bytes(value).hex()}
+    if hasattr(value, 'address'):
+        value = value.address
+    if isinstance(value, str) and value.lower() in labels:
+        return {'contract': labels[value.lower()]}
+    return value
+
+
+def decodeArg(value, addresses):
+    if isinstance(value, list):
+        return [decodeArg(v, addresses) for v in value]
+    if isinstance(value, dict) and 'bytes' in value:
+        return bytes.fromhex(value['bytes'][2:])
+    if isinstance(value, dict) and 'contract' in value:
+        return addresses[value['contract']]
+    return value
+
+
+class TraceRecorder:
+    """
+    Appends the deployments and transactions made through it to the JSON Lines file at `path`.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.lock = threading.Lock()
+        self.seq = 0
+        # Lowercase address -> label.
+        self.labels = {}
+
+    def write(self, record):
+        with self.lock:
+            record['seq'] = self.seq
+            self.seq += 1
+            self.file.write(json.dumps(record) + '\n')
+            self.file.flush()
+
+    def label(self, name):
+        count = sum(1 for label in self.labels.values() if label.split('#')[0] == name)
+        return name if not count else '%s#%d' % (name, count + 1)
+
+    def deploy(self, account, container, *args):
+        """
+        Deploys `container` from `account` and records it, returns the wrapped contract.
+        """
+        contract = account.deploy(container, *args)
+        label = self.label(container._name)
+        self.write({'deploy': container._name, 'as': label, 'args': encodeArg(list(args), self.labels),
+                    'from': account.address})
+        self.labels[contract.address.lower()] = label
+        return RecordedContract(self, contract, label)
+
+    def wrap(self, contract, name=None):
+        """
+        Records the transactions of an already deployed contract. Replays need it deployed by the trace.
+        """
+        label = self.labels.setdefault(contract.address.lower(), self.label(name or contract._name))
+        return RecordedContract(self, contract, label)
+
+    def close(self):
+        self.file.close()
+
+
+class RecordedContract:
+    def __init__(self, recorder, contract, label):
+        self._recorder = recorder
+        self._contract = contract
+        self._label = label
+
+    def __getattr__(self, name):
+        method = getattr(self._contract, name)
+        if getattr(method, 'abi', {}).get('stateMutability') not in ('nonpayable', 'payable'):
+            return method
+
+        def transact(*args):
+            txArgs, tx = list(args), args[-1] if args and isinstance(args[-1], dict) else {}
+            if tx:
+                txArgs = txArgs[:-1]
+            record = {'contract': self._label, 'function': name, 'args': encodeArg(txArgs, self._recorder.labels),
+                      'from': str(tx['from']), 'value': int(tx.get('value', 0))}
+            try:
+                receipt = method(*args)
+            except Exception:
+                record.update(status=0)
+                self._recorder.write(record)
+                raise
+            record.update(status=1, gasUsed=receipt.gas_used)
+            self._recorder.write(record)
+            return receipt
+        return transact
+
+
+def readTrace(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+Sent = collections.namedtuple('Sent', 'function txHash sendTime')
+
+
+def replayTrace(path, containers, web3, privateKeys=None, depth=PIPELINE_DEPTH):
+    """
+    Replays the trace at `path` on the chain of `web3`. `containers` maps contract names to
+    brownie ContractContainers, `privateKeys` maps sender addresses that are not unlocked on
+    the node to their keys. Transactions of different senders are mined in trace order only
+    on an automining node such as ganache. Returns a GasReport.
+    """
+    from brownie import accounts
+
+    privateKeys = {address.lower(): key for address, key in (privateKeys or {}).items()}
+    addresses, contracts, nonces = {}, {}, {}
+    pending = collections.deque()
+    report = GasReport()
+
+    def settle(count):
+        while len(pending) > count:
+            sent = pending.popleft()
+            receipt = web3.eth.waitForTransactionReceipt(sent.txHash)
+            report.add(sent.function, receipt['gasUsed'], receipt['status'] == 1, sent.sendTime)
+
+    start = time.time()
+    for record in readTrace(path):
+        if 'deploy' in record:
+            settle(0)
+            sender = record['from']
+            deployed = accounts.at(sender).deploy(containers[record['deploy']], *decodeArg(record['args'], addresses))
+            addresses[record['as']] = deployed.address
+            contracts[record['as']] = web3.eth.contract(address=deployed.address, abi=deployed.abi)
+            nonces[sender.lower()] = web3.eth.getTransactionCount(sender)
+            continue
+
+        sender = record['from']
+        if sender.lower() not in nonces:
+            nonces[sender.lower()] = web3.eth.getTransactionCount(sender)
+        function = getattr(contracts[record['contract']].functions, record['function'])
+        tx = function(*decodeArg(record['args'], addresses)).buildTransaction({
+            'from': sender, 'value': record['value'], 'gas': REPLAY_GAS_LIMIT,
+            'gasPrice': web3.eth.gasPrice, 'nonce': nonces[sender.lower()]})
+        nonces[sender.lower()] += 1
+
+        sendStart = time.time()
+        try:
+            if sender.lower() in privateKeys:
+                signed = web3.eth.account.signTransaction(tx, privateKeys[sender.lower()])
+                txHash = web3.eth.sendRawTransaction(signed.rawTransaction)
+            else:
+                txHash = web3.eth.sendTransaction(tx)
+        except ValueError as e:
+            # ganache mines reverting transactions but answers with an error keyed by the tx hash.
+            data = e.args[0].get('data') if e.args and isinstance(e.args[0], dict) else None
+            txHash = next((key for key in (data or {}) if key.startswith('0x')), None)
+            if txHash is None:
+                raise
+        pending.append(Sent('%s.%s' % (record['contract'].split('#')[0], record['function']), txHash,
+                            time.time() - sendStart))
+        settle(depth)
+    settle(0)
+    report.elapsed = time.time() - start
+    return report
+
+
+class GasReport:
+    """
+    Calls, reverts, gas used and send time per function ("Contract.function").
+    """
+    def __init__(self, functions=None, elapsed=0.0):
+        self.functions = functions or {}
+        self.elapsed = elapsed
+
+    def add(self, function, gasUsed, succeeded, sendTime):
+        stats = self.functions.setdefault(function, {'calls': 0, 'reverts': 0, 'gas': 0, 'sendTime': 0.0})
+        stats['calls'] += 1
+        stats['reverts'] += 0 if succeeded else 1
+        stats['gas'] += gasUsed
+        stats['sendTime'] += sendTime
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'functions': self.functions, 'elapsed': self.elapsed}, f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['functions'], data['elapsed'])
+
+    def printReport(self):
+        print('%-50s %7s %7s %12s %10s %9s' % ('function', 'calls', 'reverts', 'gas', 'avg gas', 'avg ms'))
+        for function, s in sorted(self.functions.items()):
+            print('%-50s %7d %7d %12d %10d %9.2f' % (function, s['calls'], s['reverts'], s['gas'],
+                                                    s['gas'] // s['calls'], 1000 * s['sendTime'] / s['calls']))
+        print('%d transactions in %.2fs' % (sum(s['calls'] for s in self.functions.values()), self.elapsed))
+
+
+def compareReports(baseline, candidate):
+    """
+    Prints average gas and send time per function of two replays of the same trace.
+    """
+    print('%-50s %10s %10s %8s %9s %9s' % ('function', 'base gas', 'new gas', 'delta %', 'base ms', 'new ms'))
+    for function in sorted(set(baseline.functions) | set(candidate.functions)):
+        base, new = baseline.functions.get(function), candidate.functions.get(function)
+        baseGas = base['gas'] // base['calls'] if base else 0
+        newGas = new['gas'] // new['calls'] if new else 0
+        print('%-50s %10d %10d %8.2f %9.2f %9.2f' % (function, baseGas, newGas,
+              100.0 * (newGas - baseGas) / baseGas if baseGas else 0.0,
+              1000 * base['sendTime'] / base['calls'] if base else 0.0,
+              1000 * new['sendTime'] / new['calls'] if new else 0.0))
+    print('wall time %.2fs -> %.2fs' % (baseline.elapsed, candidate.elapsed))
@@ -0,0 +1,119 @@
+"""
+Venue layout import for EventMasterService.
+
+A seat map (CSV, JSON or JSON Lines) is streamed row by row and grouped in
+sections, then the event is created with createEventWithSections() and the
+remaining sections appended with addSectionsBatch(). The sections are split
+in chunks so every transaction fits in the block gas limit.
+
+Rows have a `section` name and a `price`, plus either a `size` (one row per
+section) or nothing (one row per seat, consecutive seats of a section are
+counted). Seats of a section must be contiguous in the file.
+"""
+import csv
+import json
+
+# Ganache block gas limit on brownie-config.json.
+BLOCK_GAS_LIMIT = 6721975
+# Share of the block gas limit a setup transaction may use.
+GAS_LIMIT_FILL = 0.9
+# Upper bounds of the gas of the setup calls without sections, and of each
+# section: a new 20000 gas SSTORE (5000 more if its two fields are stored
+# separately) plus loop, ABI decoding and calldata of two words.
+CREATE_EVENT_BASE_GAS = 120000
+ADD_SECTIONS_BASE_GAS = 60000
+SECTION_GAS = 26000
+
+MAX_SECTION_SIZE = 2**16 - 1
+
+
+class VenueLayoutError(ValueError):
+    pass
+
+
+def readSeatMap(path):
+    """
+    Yields the rows of a seat map as dicts. CSV and JSON Lines files are streamed,
+    a JSON file must hold a list of rows or an object with a "sections" list.
+    """
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                yield row
+    elif path.endswith('.jsonl'):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+        for row in (data['sections'] if isinstance(data, dict) else data):
+            yield row
+    else:
+        raise VenueLayoutError("Unknown seat map format: %s" % path)
+
+
+def iterSections(rows):
+    """
+    Groups seat map rows in (section, size, price) tuples, in file order.
+    """
+    seen = set()
+    current = None
+    for row in rows:
+        name, price = str(row['section']), int(row['price'])
+        size = int(row['size']) if row.get('size') not in (None, '') else 1
+        if current is not None and current[0] == name:
+            if current[2] != price:
+                raise VenueLayoutError("Section %s has seats with different prices." % name)
+            current = (name, current[1] + size, price)
+        else:
+            if current is not None:
+                yield checkSection(current)
+            if name in seen:
+                raise VenueLayoutError("Section %s is not contiguous in the seat map." % name)
+            seen.add(name)
+            current = (name, size, price)
+    if current is not None:
+        yield checkSection(current)
+
+
+def checkSection(section):
+    if not 0 < section[1] <= MAX_SECTION_SIZE:
+        raise VenueLayoutError("Section %s size must be between 1 and %d seats." % (section[0], MAX_SECTION_SIZE))
+    return section
+
+
+def chunkSections(sections, gasLimit=BLOCK_GAS_LIMIT):
+    """
+    Splits sections in lists that fit one transaction each, the first one for
+    createEventWithSections() and the rest for addSectionsBatch().
+    """
+    budget = int(gasLimit * GAS_LIMIT_FILL)
+    chunk, gas = [], CREATE_EVENT_BASE_GAS
+    for section in sections:
+        if chunk and gas + SECTION_GAS > budget:
+            yield chunk
+            chunk, gas = [], ADD_SECTIONS_BASE_GAS
+        chunk.append(section)
+        gas += SECTION_GAS
+    if chunk:
+        yield chunk
+
+
+def importVenue(events, owner, path, startSellingDate, startWithdrawalDate, platID=1, gasLimit=BLOCK_GAS_LIMIT):
+    """
+    Creates an event with all the sections of the seat map at `path`, sent from `owner`.
+    Returns (eventID, section names in sectionID order, transactions).
+    """
+    eventID, names, txs = None, [], []
+    for chunk in chunkSections(iterSections(readSeatMap(path)), gasLimit):
+        sizes, prices = [c[1] for c in chunk], [c[2] for c in chunk]
+        if eventID is None:
+            tx = events.createEventWithSections(platID, startSellingDate, startWithdrawalDate, sizes, prices, {'from': owner})
+            eventID = tx.return_value
+        else:
+            tx = events.addSectionsBatch(eventID, sizes, prices, {'from': owner})
+        names.extend(c[0] for c in chunk)
+        txs.append(tx)
+    return eventID, names, txs
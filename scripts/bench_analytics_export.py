@@ -0,0 +1,92 @@
+"""
+Throughput of the Parquet export of nftsets.analytics on a chain with TICKETS tickets sold
+(1M by default), bought in ranges of 100 seats by 4 buyers with a transfer every 100 purchases.
+Reports a cold export, a rerun with nothing new and an incremental run after one purchase,
+with the size of the files and the peak RSS of the process. Filling the chain takes most of the
+time: use ganache with a block gas limit of at least 6721975.
+
+    TICKETS=1000000 EXPORT_DIR=/tmp/analytics brownie run bench_analytics_export
+"""
+import os
+import resource
+import tempfile
+import time
+
+from brownie import accounts, web3
+
+from nftsets.analytics import Exporter
+from nftsets.client import HttpRpc
+from nftsets.signer import packSeatRanges
+from scripts.benchmark_setup import deployTicketing
+
+TICKETS = 10**6
+SECTION_SIZE = 1000
+SECTIONS_PER_EVENT = 60
+SEATS_PER_PURCHASE = 100
+BUYERS = 4
+TRANSFER_EVERY = 100
+PRICE = 10000
+FEES = 100
+
+
+def sellTickets(events, token, owner, buyers, tickets):
+    purchases = 0
+    for buyer in buyers:
+        token.transfer(buyer, tickets * 2 * PRICE, {'from': owner})
+        token.approve(events.address, tickets * 2 * PRICE, {'from': buyer})
+    sold = 0
+    while sold < tickets:
+        tx = events.createEventWithSections(1, 0, 0, [SECTION_SIZE] * SECTIONS_PER_EVENT,
+                                            [PRICE] * SECTIONS_PER_EVENT, {'from': owner})
+        for sectionID in range(1, SECTIONS_PER_EVENT + 1):
+            for firstSeatID in range(1, SECTION_SIZE + 1, SEATS_PER_PURCHASE):
+                if sold >= tickets:
+                    return
+                count = min(SEATS_PER_PURCHASE, tickets - sold)
+                buyer = buyers[purchases % len(buyers)]
+                events.buyTicketRangesPackedWithTokens(tx.return_value, packSeatRanges([(sectionID, firstSeatID, count)]),
+                                                       {'from': buyer})
+                purchases += 1
+                sold += count
+                if purchases % TRANSFER_EVERY == 0:
+                    events.safeTransferFrom(buyer, owner, events.getTicketID(tx.return_value, sectionID, firstSeatID),
+                                            1, "", {'from': buyer})
+                if purchases % 1000 == 0:
+                    print('%d tickets sold' % sold)
+
+
+def directorySize(directory):
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(directory) for name in names)
+
+
+def report(name, manifest, seconds):
+    run = manifest['lastRun']
+    print('%-12s %8d blocks %9d tickets %6d transfers %8.1fs  %9.0f tickets/s' % (
+        name, run['blocks'], run['rows']['tickets'], run['rows']['transfers'], seconds,
+        run['rows']['tickets'] / seconds if seconds else 0))
+
+
+def main():
+    tickets = int(os.environ.get('TICKETS', TICKETS))
+    directory = os.environ.get('EXPORT_DIR') or tempfile.mkdtemp(prefix='analytics-')
+    owner = accounts[0]
+    buyers = accounts[1:BUYERS + 1]
+    firstBlock = web3.eth.blockNumber + 1
+    deployed = deployTicketing(owner, users=[owner] + list(buyers), basicPointFees=FEES)
+    events = deployed['events']
+
+    start = time.time()
+    sellTickets(events, deployed['token'], owner, buyers, tickets)
+    print('Sold %d tickets in %.0fs, exporting to %s' % (tickets, time.time() - start, directory))
+
+    exporter = Exporter(HttpRpc(web3.provider.endpoint_uri), events.address, directory, fromBlock=firstBlock)
+    for name in ('cold', 'rerun', 'incremental'):
+        if name == 'incremental':
+            tx = events.createEventWithSections(1, 0, 0, [1], [PRICE], {'from': owner})
+            deployed['token'].approve(events.address, 2 * PRICE, {'from': owner})
+            events.buyTicketWithTokens(tx.return_value, 1, 1, {'from': owner})
+        start = time.time()
+        manifest = exporter.run(log=lambda line: None)
+        report(name, manifest, time.time() - start)
+    print('Parquet files: %.1f MB, peak RSS %.0f MB' % (directorySize(directory) / 1e6,
+                                                        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
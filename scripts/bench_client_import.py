@@ -0,0 +1,57 @@
+"""
+Import time of the lean client against brownie and web3, each in a fresh interpreter, and
+latency of the first call of a fresh process: one view call to a deployed EventMasterService,
+and one signed purchase (which imports eth_account).
+
+    brownie run bench_client_import
+"""
+import subprocess
+import sys
+
+from brownie import accounts, web3
+
+from scripts.benchmark_setup import deployTicketing, createEventWithSection, privateKeys
+
+RUNS = 5
+IMPORTS = ['nftsets.client', 'web3', 'eth_abi', 'brownie']
+
+FIRST_CALL = '''
+import time
+start = time.time()
+from nftsets.client import HttpRpc, EventMasterClient
+imported = time.time()
+events = EventMasterClient(HttpRpc(%r), %r, privateKey=%r)
+events.ticketIsAvailable(%d, %d, 1)
+called = time.time()
+events.buyTicketWithTokens(%d, %d, 1)
+print(imported - start, called - imported, time.time() - called)
+'''
+
+
+def python(code):
+    return subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True).stdout.decode()
+
+
+def importTime(module):
+    code = 'import time; start = time.time(); import %s; print(time.time() - start)' % module
+    return min(float(python(code)) for _ in range(RUNS))
+
+
+def main():
+    for module in IMPORTS:
+        print('import %-16s %8.1f ms' % (module, 1000 * importTime(module)))
+
+    buyer = accounts[1]
+    deployed = deployTicketing(users=[accounts[0], buyer])
+    events, token = deployed['events'], deployed['token']
+    token.transfer(buyer, 100 * RUNS, {'from': accounts[0]})
+    token.approve(events.address, 100 * RUNS, {'from': buyer})
+    url = web3.provider.endpoint_uri
+    results = []
+    for _ in range(RUNS):
+        eventID, sectionID = createEventWithSection(events, accounts[0], 1, 100)
+        code = FIRST_CALL % (url, events.address, privateKeys()[1], eventID, sectionID, eventID, sectionID)
+        results.append([float(t) for t in python(code).split()])
+    imported, called, bought = (min(r[i] for r in results) for i in range(3))
+    print('fresh process: import %.1f ms, first view call %.1f ms, first signed purchase %.1f ms' % (
+        1000 * imported, 1000 * called, 1000 * bought))
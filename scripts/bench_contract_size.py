@@ -0,0 +1,38 @@
+"""
+Bytecode size of the contracts against the EIP-170 limit, and deploy gas of EventMasterService
+with the PurchaseChecks library: one library shared by every service, against one library per
+service. Run it on the build of another commit (sizes only when it has no library) to compare.
+
+    brownie run bench_contract_size
+"""
+from brownie import accounts, history, DefaultIdentityResolverService, IdentityMasterService, SimpleToken, EventMasterService, PurchaseChecks
+
+from scripts.benchmark_setup import deployTicketing
+
+# EIP-170 limit on the runtime code of a contract.
+MAX_CODE_SIZE = 24576
+SERVICES = (1, 3, 10)
+
+
+def codeSize(container, key):
+    # Unlinked library placeholders take 40 hex characters, the size of the address they stand for.
+    return len(container._build[key]) // 2
+
+
+def main():
+    owner = accounts[0]
+    print("%-32s %10s %10s %10s" % ("contract", "runtime", "initcode", "headroom"))
+    for container in (EventMasterService, PurchaseChecks, IdentityMasterService, DefaultIdentityResolverService, SimpleToken):
+        runtime = codeSize(container, 'deployedBytecode')
+        print("%-32s %10d %10d %10d" % (container._name, runtime, codeSize(container, 'bytecode'), MAX_CODE_SIZE - runtime))
+
+    owner.deploy(PurchaseChecks)
+    libraryGas = history[-1].gas_used
+    master = deployTicketing(owner, users=[])['master']
+    owner.deploy(EventMasterService, master.address, 0, 0)
+    serviceGas = history[-1].gas_used
+    print()
+    print("deploy gas: PurchaseChecks %d, EventMasterService %d" % (libraryGas, serviceGas))
+    print("%-10s %16s %16s" % ("services", "shared library", "library each"))
+    for n in SERVICES:
+        print("%-10d %16d %16d" % (n, libraryGas + n * serviceGas, n * (libraryGas + serviceGas)))
@@ -0,0 +1,56 @@
+"""
+Per-call latency of the ganache process against the in-process py-evm backend: a raw RPC
+request, a view call, a purchase transaction and a snapshot/revert pair. For the total suite
+time run `pytest tests --timing-report ganache` and `pytest tests --evm-backend pyevm
+--timing-report pyevm` and compare the two reports.
+
+    brownie run bench_evm_backend
+"""
+import time
+
+from brownie import accounts, rpc, web3
+
+from nftsets.evmbackend import createTester, connectInProcess
+from scripts.benchmark_setup import deployTicketing, createEventWithSection, privateKeys
+
+CALLS = 200
+PRICE = 100
+
+
+def perCall(function):
+    start = time.time()
+    for i in range(CALLS):
+        function(i)
+    return 1000 * (time.time() - start) / CALLS
+
+
+def measure():
+    owner = accounts[0]
+    start = time.time()
+    deployed = deployTicketing(users=[owner])
+    deployTime = time.time() - start
+    events, token = deployed['events'], deployed['token']
+    eventID, sectionID = createEventWithSection(events, owner, CALLS, PRICE)
+    token.approve(events.address, CALLS * PRICE, {'from': owner})
+
+    def snapshotRevert(i):
+        rpc.snapshot()
+        rpc.revert()
+
+    return {
+        'deploy (s)': deployTime,
+        'eth_blockNumber': perCall(lambda i: web3.eth.blockNumber),
+        'view call': perCall(lambda i: events.ticketIsAvailable(eventID, sectionID, i + 1)),
+        'purchase tx': perCall(lambda i: events.buyTicketWithTokens(eventID, sectionID, i + 1, {'from': owner})),
+        'snapshot+revert': perCall(snapshotRevert),
+    }
+
+
+def main():
+    ganache = measure()
+    connectInProcess(web3, createTester(privateKeys()))
+    accounts._reset()
+    pyevm = measure()
+    print('%-16s %10s %10s %8s' % ('ms per call', 'ganache', 'py-evm', 'speedup'))
+    for name in ganache:
+        print('%-16s %10.3f %10.3f %7.1fx' % (name, ganache[name], pyevm[name], ganache[name] / pyevm[name]))
@@ -0,0 +1,30 @@
+"""
+Gas of identity registration and of the permission checks made on every purchase.
+View figures are eth_estimateGas, so they include the 21000 intrinsic gas.
+
+    brownie run bench_identity_record
+"""
+from brownie import accounts, DefaultIdentityResolverService
+
+from scripts.benchmark_setup import ALL_PERMISSIONS
+
+
+def main():
+    owner = accounts[0]
+    resolver = owner.deploy(DefaultIdentityResolverService)
+
+    txnew = resolver.newIdentity(accounts[1], ALL_PERMISSIONS, {'from': owner})
+    identity = txnew.return_value
+    txreg = resolver.registerAddress(identity, accounts[2], {'from': owner})
+    txreg2 = resolver.registerAddress(identity, accounts[3], {'from': owner})
+
+    for name, gasUsed in [
+            ('newIdentity', txnew.gas_used),
+            ('registerAddress (2nd)', txreg.gas_used),
+            ('registerAddress (3rd)', txreg2.gas_used),
+            ('existsIdentity', resolver.existsIdentity.estimate_gas(identity)),
+            ('resolvePermissions', resolver.resolvePermissions.estimate_gas(identity)),
+            ('canBuyTicket', resolver.canBuyTicket.estimate_gas(identity)),
+            ('canResellTicket', resolver.canResellTicket.estimate_gas(identity)),
+            ('canCreateEvent', resolver.canCreateEvent.estimate_gas(identity))]:
+        print('%-22s %7d' % (name, gasUsed))
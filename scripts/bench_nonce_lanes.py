@@ -0,0 +1,74 @@
+"""
+One user signs 50 ticket purchases at once and several relayers submit them concurrently,
+all on nonce lane 0 (sequence must arrive in order) against one lane per meta-transaction.
+
+    brownie run bench_nonce_lanes
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from brownie import accounts
+from brownie.exceptions import VirtualMachineError
+
+from nftsets.signer import encodeABI, encodeNonce, signFeelessTx, FeelessSigner
+from scripts.benchmark_setup import deployTicketing, createEventWithSection, privateKeys, EXPIRY_DATE
+
+META_TXS = 50
+PRICE = 100
+
+
+def submitConcurrently(events, user, signed, relayers):
+    """
+    Sends the signed meta-transactions round-robin from `relayers`, one thread each.
+    Returns (executed gas list, reverted count, wall time).
+    """
+    queues = [signed[i::len(relayers)] for i in range(len(relayers))]
+
+    def relay(relayer, queue):
+        gasUsed, reverted = [], 0
+        for abiData, nonce, signature in queue:
+            try:
+                tx = events.performFeelessTransaction(user.address, events.address, abiData, nonce, EXPIRY_DATE, signature, {'from': relayer})
+                gasUsed.append(tx.gas_used)
+            except VirtualMachineError:
+                reverted += 1
+        return gasUsed, reverted
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=len(relayers)) as pool:
+        results = list(pool.map(relay, relayers, queues))
+    elapsed = time.time() - start
+    return [g for r in results for g in r[0]], sum(r[1] for r in results), elapsed
+
+
+def report(name, gasUsed, reverted, elapsed):
+    avgGas = sum(gasUsed) // len(gasUsed) if gasUsed else 0
+    print('%-12s executed %3d  reverted %3d  %6.2fs  %5.1f mtx/s  avg gas %d' %
+          (name, len(gasUsed), reverted, elapsed, len(gasUsed) / elapsed, avgGas))
+
+
+def main():
+    user, relayers = accounts[0], list(accounts[1:])
+    key = privateKeys()[0]
+    deployed = deployTicketing()
+    events, token = deployed['events'], deployed['token']
+    token.approve(events.address, 2 * META_TXS * PRICE, {'from': user})
+
+    # Single lane: nonces 0..49 on lane 0, relayers deliver them out of order.
+    eventID, sectionID = createEventWithSection(events, user, META_TXS, PRICE)
+    signed = []
+    for seatID in range(1, META_TXS + 1):
+        abiData = encodeABI('buyTicketWithTokens', ['uint32','uint16','uint16'], [eventID, sectionID, seatID])
+        nonce = encodeNonce(0, seatID - 1)
+        signed.append((abiData, nonce, signFeelessTx(key, events.address, abiData, nonce, EXPIRY_DATE)))
+    random.shuffle(signed)
+    report('single lane', *submitConcurrently(events, user, signed, relayers))
+
+    # Lanes picked by FeelessSigner, every meta-transaction is independent.
+    eventID, sectionID = createEventWithSection(events, user, META_TXS, PRICE)
+    signer = FeelessSigner(key, events.address, lambda k: events.getNonce(user, k))
+    signed = [signer.sign('buyTicketWithTokens', ['uint32','uint16','uint16'], [eventID, sectionID, seatID], EXPIRY_DATE)
+              for seatID in range(1, META_TXS + 1)]
+    random.shuffle(signed)
+    report('nonce lanes', *submitConcurrently(events, user, signed, relayers))
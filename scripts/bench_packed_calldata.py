@@ -0,0 +1,38 @@
+"""
+Calldata gas of buyTicketsBatchWithTokens() against the packed purchase entry points,
+called directly and nested inside performFeelessTransaction().
+
+    brownie run bench_packed_calldata
+"""
+from nftsets.signer import encodeABI, packSeats, packSeatRanges, seatsToRanges, calldataGas
+
+CART_SIZES = [10, 100, 500]
+SECTION_SIZE = 200
+EXPIRY_DATE = 2000000000
+
+
+def feelessCalldata(abiData):
+    return encodeABI('performFeelessTransaction', ['address','address','bytes','uint256','uint256','bytes'],
+                     ['0x'+'11'*20, '0x'+'22'*20, abiData, 1, EXPIRY_DATE, b'\x33'*65])
+
+
+def cartCalldata(seats):
+    sectionIDs = [1 + i // SECTION_SIZE for i in range(seats)]
+    seatIDs = [1 + i % SECTION_SIZE for i in range(seats)]
+    return {
+        'abi': encodeABI('buyTicketsBatchWithTokens', ['uint32','uint16[]','uint16[]'], [1, sectionIDs, seatIDs]),
+        'packed': encodeABI('buyTicketsPackedWithTokens', ['uint32','bytes'], [1, packSeats(sectionIDs, seatIDs)]),
+        'ranges': encodeABI('buyTicketRangesPackedWithTokens', ['uint32','bytes'],
+                            [1, packSeatRanges(seatsToRanges(sectionIDs, seatIDs))]),
+    }
+
+
+def main():
+    print('%6s %8s %8s %10s %10s' % ('seats', 'format', 'bytes', 'gas', 'mtx gas'))
+    for seats in CART_SIZES:
+        for fmt, data in cartCalldata(seats).items():
+            print('%6d %8s %8d %10d %10d' % (seats, fmt, len(data), calldataGas(data), calldataGas(feelessCalldata(data))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Purchases per block of the approve-then-buy flow against a single buyTicketWithPermit()
+transaction, signed directly and through a feeless meta-transaction.
+
+    brownie run bench_permit_purchase
+"""
+import time
+
+from brownie import accounts
+
+from nftsets.signer import signPermit, permitDomainSeparator, FeelessSigner
+from scripts.benchmark_setup import deployTicketing, createEventWithSection, privateKeys, EXPIRY_DATE, CHAIN_ID
+
+PURCHASES = 30
+PRICE = 100
+# Ganache block gas limit on brownie-config.json.
+BLOCK_GAS_LIMIT = 6721975
+
+
+def report(name, txs, gasUsed, elapsed):
+    gasPerPurchase = sum(gasUsed) // PURCHASES
+    print('%-14s %4.1f tx/purchase  %6d gas/purchase  %3d purchases/block  %6.2fs' %
+          (name, txs / PURCHASES, gasPerPurchase, BLOCK_GAS_LIMIT // gasPerPurchase, elapsed))
+
+
+def main():
+    buyers, relayer = list(accounts[1:]), accounts[0]
+    keys = privateKeys()[1:]
+    deployed = deployTicketing()
+    events, token = deployed['events'], deployed['token']
+    domainSeparator = permitDomainSeparator('SimpleToken', CHAIN_ID, token.address)
+    for buyer in buyers:
+        token.transfer(buyer, 3 * PURCHASES * PRICE, {'from': accounts[0]})
+
+    # Two transactions per purchase: approve() then buyTicketWithTokens().
+    eventID, sectionID = createEventWithSection(events, accounts[0], PURCHASES, PRICE)
+    gasUsed, start = [], time.time()
+    for seatID in range(1, PURCHASES + 1):
+        buyer = buyers[seatID % len(buyers)]
+        gasUsed.append(token.approve(events.address, PRICE, {'from': buyer}).gas_used)
+        gasUsed.append(events.buyTicketWithTokens(eventID, sectionID, seatID, {'from': buyer}).gas_used)
+    report('approve+buy', 2 * PURCHASES, gasUsed, time.time() - start)
+
+    # One transaction per purchase, the permit is signed off-chain.
+    eventID, sectionID = createEventWithSection(events, accounts[0], PURCHASES, PRICE)
+    gasUsed, start = [], time.time()
+    for seatID in range(1, PURCHASES + 1):
+        n = seatID % len(buyers)
+        v, r, s = signPermit(keys[n], domainSeparator, buyers[n].address, events.address, PRICE,
+                             token.nonces(buyers[n]), EXPIRY_DATE)
+        tx = events.buyTicketWithPermit(eventID, sectionID, seatID, PRICE, EXPIRY_DATE, v, r, s, {'from': buyers[n]})
+        gasUsed.append(tx.gas_used)
+    report('permit', PURCHASES, gasUsed, time.time() - start)
+
+    # One relayed transaction per purchase, buyers hold no ether.
+    eventID, sectionID = createEventWithSection(events, accounts[0], PURCHASES, PRICE)
+    signers = [FeelessSigner(k, events.address, lambda key, b=b: events.getNonce(b, key)) for k, b in zip(keys, buyers)]
+    gasUsed, start = [], time.time()
+    for seatID in range(1, PURCHASES + 1):
+        n = seatID % len(buyers)
+        abiData, nonce, signature = signers[n].signWithPermit(
+            'buyTicketWithPermit', ['uint32','uint16','uint16'], [eventID, sectionID, seatID],
+            domainSeparator, token.nonces(buyers[n]), PRICE, EXPIRY_DATE, EXPIRY_DATE)
+        tx = events.performFeelessTransaction(buyers[n].address, events.address, abiData, nonce, EXPIRY_DATE, signature, {'from': relayer})
+        signers[n].release(nonce)
+        gasUsed.append(tx.gas_used)
+    report('permit mtx', PURCHASES, gasUsed, time.time() - start)
@@ -0,0 +1,36 @@
+"""
+Gas of registerPlatform and of the platform lookups made by a ticket purchase.
+View figures are eth_estimateGas, so they include the 21000 intrinsic gas.
+
+    brownie run bench_platform_record
+"""
+from brownie import accounts
+
+from scripts.benchmark_setup import deployTicketing, createEventWithSection
+
+PRICE = 100
+
+
+def main():
+    owner = accounts[0]
+    deployed = deployTicketing(users=[owner])
+    master, events, token = deployed['master'], deployed['events'], deployed['token']
+
+    txreg = master.registerPlatform(deployed['resolver'].address, token.address, 2**16 - 1, {'from': owner})
+    eventID, sectionID = createEventWithSection(events, owner, 10, PRICE)
+    token.approve(events.address, 2 * PRICE, {'from': owner})
+    txbuy = events.buyTicketWithTokens(eventID, sectionID, 1, {'from': owner})
+    txbatch = events.buyTicketsBatchWithTokens(eventID, [sectionID], [2], {'from': owner})
+
+    platID = deployed['platID']
+    for name, gasUsed in [
+            ('registerPlatform', txreg.gas_used),
+            ('buyTicketWithTokens', txbuy.gas_used),
+            ('buyTicketsBatchWithTokens (1)', txbatch.gas_used),
+            ('getPlatform', master.getPlatform.estimate_gas(platID)),
+            ('existsPlatform', master.existsPlatform.estimate_gas(platID)),
+            ('resolveCurrencyForPlatform', master.resolveCurrencyForPlatform.estimate_gas(platID)),
+            ('resolveMaxSeatsForPlatform', master.resolveMaxSeatsForPlatform.estimate_gas(platID)),
+            ('resolveIdentityOnPlatform', master.resolveIdentityOnPlatform.estimate_gas(platID, owner)),
+            ('canBuyTicketOnPlatform', master.canBuyTicketOnPlatform.estimate_gas(platID, 1))]:
+        print('%-30s %7d' % (name, gasUsed))
@@ -0,0 +1,67 @@
+"""
+On-sale rush: every round each buyer picks a seat from the hot front rows using the
+availability it read at the start of the round, so buyers collide on the same seats.
+Blind buyers send anyway and pay for the reverts. Pre-flight buyers call checkPurchase()
+right before sending and pick another seat when theirs is gone. With ganache automine the
+pre-flight view is never stale, so its figures are a lower bound of the wasted gas.
+
+    brownie run bench_purchase_contention
+"""
+import random
+
+from brownie import accounts, history
+from brownie.exceptions import VirtualMachineError
+
+from scripts.benchmark_setup import deployTicketing
+
+SEATS = 60
+HOT_SEATS = 20
+ROUNDS = 4
+PRICE = 100
+PURCHASE_OK = 0
+
+
+def freeSeats(events, eventID, seats):
+    return [s for s in seats if events.ticketIsAvailable(eventID, 1, s)]
+
+
+def rush(events, eventID, buyers, preflight, rng):
+    bought, reverted, wasted = 0, 0, []
+    for _ in range(ROUNDS):
+        stale = freeSeats(events, eventID, range(1, SEATS + 1))
+        for buyer in buyers:
+            if not stale:
+                break
+            seat = rng.choice(stale[:HOT_SEATS])
+            if preflight:
+                codes, _ = events.checkPurchase(buyer, eventID, [1], [seat])
+                if codes[0] != PURCHASE_OK:
+                    fresh = freeSeats(events, eventID, stale)
+                    if not fresh:
+                        continue
+                    seat = fresh[0]
+            try:
+                events.buyTicketWithTokens(eventID, 1, seat, {'from': buyer})
+                bought += 1
+            except VirtualMachineError:
+                reverted += 1
+                wasted.append(history[-1].gas_used)
+    return bought, reverted, wasted
+
+
+def main():
+    owner = accounts[0]
+    buyers = list(accounts[1:])
+    deployed = deployTicketing(owner)
+    events, token = deployed['events'], deployed['token']
+    for buyer in buyers:
+        token.transfer(buyer, 2 * SEATS * PRICE, {'from': owner})
+        token.approve(events.address, 2 * SEATS * PRICE, {'from': buyer})
+
+    print('%-10s %7s %8s %12s %12s' % ('mode', 'bought', 'reverted', 'wasted gas', 'gas/revert'))
+    for preflight in (False, True):
+        tx = events.createEventWithSections(1, 0, 0, [SEATS], [PRICE], {'from': owner})
+        bought, reverted, wasted = rush(events, tx.return_value, buyers, preflight, random.Random(7))
+        print('%-10s %7d %8d %12d %12d' % ('preflight' if preflight else 'blind', bought, reverted,
+                                           sum(wasted), sum(wasted) // reverted if reverted else 0))
+    print('%-24s %7d' % ('checkPurchase (1 seat)', events.checkPurchase.estimate_gas(buyers[0], tx.return_value, [1], [1])))
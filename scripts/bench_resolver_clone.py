@@ -0,0 +1,76 @@
+"""
+Onboarding of platforms with a full DefaultIdentityResolverService deploy plus registerPlatform,
+against one registerPlatformClone transaction, and the gas a cloned resolver adds to the calls
+that go through it (the proxy delegatecall). View figures are eth_estimateGas, so they include
+the 21000 intrinsic gas.
+
+    brownie run bench_resolver_clone
+"""
+import time
+
+from brownie import accounts, history, DefaultIdentityResolverService
+
+from scripts.benchmark_setup import deployTicketing, ALL_PERMISSIONS, MAX_SEATS
+
+PLATFORMS = 20
+PRICE = 100
+
+
+def onboardFull(owner, master, token):
+    resolver = owner.deploy(DefaultIdentityResolverService)
+    deployGas = history[-1].gas_used
+    tx = master.registerPlatform(resolver.address, token.address, MAX_SEATS, {'from': owner})
+    return tx.return_value, resolver, deployGas + tx.gas_used
+
+
+def onboardClone(owner, master, token, implementation):
+    tx = master.registerPlatformClone(implementation.address, owner, token.address, MAX_SEATS, {'from': owner})
+    platID, resolver = tx.return_value
+    return platID, DefaultIdentityResolverService.at(resolver), tx.gas_used
+
+
+def buyOnPlatform(owner, events, token, platID):
+    txev = events.createEvent(platID, 0, 0, {'from': owner})
+    txsec = events.addSection(txev.return_value, 10, PRICE, {'from': owner})
+    token.approve(events.address, PRICE, {'from': owner})
+    return events.buyTicketWithTokens(txev.return_value, txsec.return_value, 1, {'from': owner}).gas_used
+
+
+def main():
+    owner, buyer = accounts[0], accounts[1]
+    deployed = deployTicketing(users=[owner])
+    master, events, token, implementation = deployed['master'], deployed['events'], deployed['token'], deployed['resolver']
+
+    start = time.time()
+    full = [onboardFull(owner, master, token) for _ in range(PLATFORMS)]
+    fullSeconds = time.time() - start
+    start = time.time()
+    clones = [onboardClone(owner, master, token, implementation) for _ in range(PLATFORMS)]
+    cloneSeconds = time.time() - start
+
+    print('Onboarding %d platforms' % PLATFORMS)
+    print('%-36s %12s %12s' % ('', 'full', 'clone'))
+    print('%-36s %12d %12d' % ('gas per platform', full[0][2], clones[0][2]))
+    print('%-36s %12d %12d' % ('gas total', sum(f[2] for f in full), sum(c[2] for c in clones)))
+    print('%-36s %12d %12d' % ('transactions', 2 * PLATFORMS, PLATFORMS))
+    print('%-36s %12.2f %12.2f' % ('wall time s', fullSeconds, cloneSeconds))
+
+    fullID, fullResolver, _ = full[0]
+    cloneID, cloneResolver, _ = clones[0]
+    rows = []
+    for name, call in [
+            ('newIdentity', lambda resolver: resolver.newIdentity(buyer, ALL_PERMISSIONS, {'from': owner}).gas_used),
+            ('newIdentity (owner)', lambda resolver: resolver.newIdentity(owner, ALL_PERMISSIONS, {'from': owner}).gas_used)]:
+        rows.append((name, call(fullResolver), call(cloneResolver)))
+    for name, call in [
+            ('resolveIdentityOnPlatform', lambda platID: master.resolveIdentityOnPlatform.estimate_gas(platID, buyer)),
+            ('canBuyTicketOnPlatform', lambda platID: master.canBuyTicketOnPlatform.estimate_gas(platID, 1)),
+            ('resolvePermissionsOnPlatform', lambda platID: master.resolvePermissionsOnPlatform.estimate_gas(platID, 1)),
+            ('buyTicketWithTokens', lambda platID: buyOnPlatform(owner, events, token, platID))]:
+        rows.append((name, call(fullID), call(cloneID)))
+
+    print()
+    print('Per call overhead of the clone')
+    print('%-36s %12s %12s %8s' % ('', 'full', 'clone', 'diff'))
+    for name, fullGas, cloneGas in rows:
+        print('%-36s %12d %12d %+8d' % (name, fullGas, cloneGas, cloneGas - fullGas))
@@ -0,0 +1,96 @@
+"""
+Buyers in several threads order 2 seats at a time of one 200-seat section until it sells out.
+Without the allocator each buyer takes the best free seats of a seat map refreshed in the
+background, like a web page would, and collides with the others on chain. With the allocator
+each buyer holds distinct seats before sending. Reports collision rate and purchases per second.
+
+    brownie run bench_seat_allocator
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from brownie import accounts
+from brownie.exceptions import VirtualMachineError
+
+from nftsets.allocator import SeatAllocator, SeatsUnavailable
+from scripts.benchmark_setup import deployTicketing
+
+SEATS = 200
+SEATS_PER_ORDER = 2
+PRICE = 100
+REFRESH_SECONDS = 0.5
+PURCHASE_SOLD = 6
+
+
+class SeatMap:
+    """
+    Free seats as last read with one checkPurchase() call, refreshed every REFRESH_SECONDS.
+    """
+    def __init__(self, events, eventID, reader):
+        self.events, self.eventID, self.reader = events, eventID, reader
+        self.free = list(range(1, SEATS + 1))
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.refresh)
+        self.thread.start()
+
+    def refresh(self):
+        while not self.stopped.wait(REFRESH_SECONDS):
+            codes, _ = self.events.checkPurchase(self.reader, self.eventID, [1] * SEATS, list(range(1, SEATS + 1)))
+            self.free = [seat for seat, code in zip(range(1, SEATS + 1), codes) if code != PURCHASE_SOLD]
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def rush(events, eventID, buyers, allocator=None):
+    seatMap = None if allocator else SeatMap(events, eventID, buyers[0])
+    lock = threading.Lock()
+    stats = {'purchases': 0, 'reverts': 0}
+
+    def buyer(account):
+        while True:
+            try:
+                if allocator:
+                    try:
+                        hold = allocator.hold(1, SEATS_PER_ORDER)
+                    except SeatsUnavailable:
+                        return
+                    allocator.buy(events, eventID, hold, account)
+                else:
+                    seats = seatMap.free[:SEATS_PER_ORDER]
+                    if len(seats) < SEATS_PER_ORDER:
+                        return
+                    events.buyTicketsBatchWithTokens(eventID, [1] * len(seats), seats, {'from': account})
+                key = 'purchases'
+            except VirtualMachineError:
+                key = 'reverts'
+            with lock:
+                stats[key] += 1
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=len(buyers)) as pool:
+        list(pool.map(buyer, buyers))
+    elapsed = time.time() - start
+    if seatMap:
+        seatMap.stop()
+    return stats['purchases'], stats['reverts'], elapsed
+
+
+def main():
+    owner = accounts[0]
+    buyers = list(accounts[1:])
+    deployed = deployTicketing(owner)
+    events, token = deployed['events'], deployed['token']
+    for account in buyers:
+        token.transfer(account, 2 * SEATS * PRICE, {'from': owner})
+        token.approve(events.address, 2 * SEATS * PRICE, {'from': account})
+
+    print('%-16s %9s %8s %10s %12s' % ('mode', 'purchases', 'reverts', 'collisions', 'purchases/s'))
+    for useAllocator in (False, True):
+        eventID = events.createEventWithSections(1, 0, 0, [SEATS], [PRICE], {'from': owner}).return_value
+        allocator = SeatAllocator.fromChain(events, eventID) if useAllocator else None
+        purchases, reverts, elapsed = rush(events, eventID, buyers, allocator)
+        print('%-16s %9d %8d %9.1f%% %12.2f' % ('allocator' if useAllocator else 'stale seat map', purchases, reverts,
+                                               100.0 * reverts / max(1, purchases + reverts), purchases / elapsed))
@@ -0,0 +1,54 @@
+"""
+Query time of the best adjacent seats search on 100k seats with 70% of them sold:
+one 100k-seat section, and an event of 50 sections of 2000 seats searched within a
+price limit. Also the time of a query right after a sale updates the availability.
+
+    brownie run bench_seat_search
+"""
+import time
+
+import numpy as np
+
+from nftsets.seatsearch import SectionSeats, EventSeats
+
+SEATS = 100000
+SECTIONS = 50
+ROW_LENGTH = 100
+SOLD_SHARE = 0.7
+QUERIES = 1000
+
+
+def timeQueries(query):
+    query()
+    times = []
+    for i in range(QUERIES):
+        start = time.perf_counter()
+        query(i)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1e6
+    return np.median(times), np.percentile(times, 99)
+
+
+def main():
+    rng = np.random.default_rng(1)
+    free = rng.random(SEATS) > SOLD_SHARE
+
+    section = SectionSeats(1, free, rowLength=ROW_LENGTH)
+    sectionSize = SEATS // SECTIONS
+    event = EventSeats([SectionSeats(i + 1, free[i * sectionSize:(i + 1) * sectionSize], price=100 + i,
+                                     rowLength=ROW_LENGTH // 2) for i in range(SECTIONS)])
+
+    def sellAndQuery(i=0):
+        seatID = int(rng.integers(1, SEATS + 1))
+        section.markSold([seatID, seatID + 1 if seatID < SEATS else seatID])
+        section.bestRuns(4)
+
+    print('%-40s %10s %10s' % ('query', 'median us', 'p99 us'))
+    for name, query in [
+            ('section 100k, best 2', lambda i=0: section.bestRuns(2)),
+            ('section 100k, best 6', lambda i=0: section.bestRuns(6)),
+            ('section 100k, top 10 runs of 4', lambda i=0: section.bestRuns(4, limit=10)),
+            ('section 100k, sale + best 4', sellAndQuery),
+            ('event 50x2000, best 4', lambda i=0: event.bestRuns(4)),
+            ('event 50x2000, best 4, price <= 124', lambda i=0: event.bestRuns(4, maxPrice=124))]:
+        print('%-40s %10.1f %10.1f' % ((name,) + timeQueries(query)))
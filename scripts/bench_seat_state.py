@@ -0,0 +1,141 @@
+"""
+Cold start of the seat-state file of nftsets.seatstate with SEATS seats (10M by default) in
+sections of 5000 seats, half of them sold:
+    - writing the file and marking the seats sold,
+    - opening it in a new process with the file out of the page cache, then answering one
+      availability query and loading the EventSeats of one event,
+    - RSS and PSS of WORKERS processes (4 by default) reading every bitmap of the same file,
+    - per-seat ticketIsAvailable() calls against soldSeats() batches and build() on a chain
+      with CHAIN_SEATS seats (2000 by default), extrapolated to SEATS.
+
+    SEATS=10000000 WORKERS=4 brownie run bench_seat_state
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from brownie import accounts, web3
+
+from nftsets.client import HttpRpc, EventMasterClient
+from nftsets.seatstate import SeatState, create, build, loadSoldSeats
+from scripts.benchmark_setup import deployTicketing
+
+SEATS = 10**7
+WORKERS = 4
+CHAIN_SEATS = 2000
+SECTION_SIZE = 5000
+SECTIONS_PER_EVENT = 10
+PRICE = 10000
+
+# Run in new processes, prints timings and /proc/self/smaps_rollup figures as JSON.
+WORKER = """
+import json, sys, time
+start = time.perf_counter()
+import numpy as np
+from nftsets.seatstate import SeatState
+from nftsets.seatsearch import EventSeats
+imported = time.perf_counter()
+state = SeatState(sys.argv[1])
+opened = time.perf_counter()
+state.isAvailable(1, 1, 1)
+queried = time.perf_counter()
+EventSeats.fromSeatState(state, 1)
+loaded = time.perf_counter()
+if sys.argv[2] == 'scan':
+    sum(int(np.frombuffer(state.bitmap(eventID, sectionID), np.uint8).sum()) for eventID, sectionID, _ in state.sections())
+memory = {}
+with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+        name, _, value = line.partition(':')
+        if name in ('Rss', 'Pss', 'Shared_Clean', 'Private_Dirty'):
+            memory[name] = int(value.split()[0]) / 1024
+print(json.dumps({'import': imported - start, 'open': opened - imported, 'query': queried - opened,
+                  'event': loaded - queried, 'memory': memory}))
+"""
+
+
+def runWorker(path, mode, env):
+    return subprocess.Popen([sys.executable, '-c', WORKER, path, mode], env=env, stdout=subprocess.PIPE)
+
+
+def dropCache(path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def writeFile(path, seats):
+    sections = [(1 + i // SECTIONS_PER_EVENT, 1 + i % SECTIONS_PER_EVENT, SECTION_SIZE)
+                for i in range(seats // SECTION_SIZE)]
+    start = time.perf_counter()
+    create(path, '0x' + '00' * 20, sections)
+    created = time.perf_counter()
+    random = np.random.default_rng(1)
+    with SeatState(path, writable=True) as state:
+        for eventID, sectionID, size in sections:
+            state.markSold(eventID, sectionID, random.choice(size, size // 2, replace=False) + 1)
+        state.setLastBlock(1)
+    marked = time.perf_counter()
+    print('File of %d seats in %d sections: %.1f MB, created in %.3fs, %d seats marked sold in %.1fs (%.0f seats/s)' % (
+        seats, len(sections), os.path.getsize(path) / 1e6, created - start, seats // 2, marked - created,
+        seats // 2 / (marked - created)))
+
+
+def coldStart(path, workers, env):
+    dropCache(path)
+    cold = json.loads(runWorker(path, 'query', env).communicate()[0])
+    print('Cold start: imports %.3fs, open %.2fms, first query %.2fms, EventSeats of one event %.1fms, RSS %.0f MB' % (
+        cold['import'], cold['open'] * 1000, cold['query'] * 1000, cold['event'] * 1000, cold['memory']['Rss']))
+    processes = [runWorker(path, 'scan', env) for _ in range(workers)]
+    for i, process in enumerate(processes):
+        memory = json.loads(process.communicate()[0])['memory']
+        print('Worker %d reading every bitmap: RSS %.1f MB, PSS %.1f MB, shared clean %.1f MB, private dirty %.1f MB' % (
+            i + 1, memory['Rss'], memory['Pss'], memory['Shared_Clean'], memory['Private_Dirty']))
+
+
+def chainBaseline(seats, extrapolateTo, directory):
+    owner = accounts[0]
+    deployed = deployTicketing(owner, users=[owner])
+    events = deployed['events']
+    sectionsCount = max(1, seats // 1000)
+    tx = events.createEventWithSections(1, 0, 0, [1000] * sectionsCount, [PRICE] * sectionsCount, {'from': owner})
+    rpc = HttpRpc(web3.provider.endpoint_uri)
+    service = EventMasterClient(rpc, events.address)
+    seats = 1000 * sectionsCount
+
+    start = time.perf_counter()
+    for sectionID in range(1, sectionsCount + 1):
+        for seatID in range(1, 1001):
+            service.ticketIsAvailable(tx.return_value, sectionID, seatID)
+    perSeat = time.perf_counter() - start
+
+    path = os.path.join(directory, 'chain.bin')
+    start = time.perf_counter()
+    build(path, rpc, events.address)
+    built = time.perf_counter() - start
+    with SeatState(path, writable=True) as state:
+        start = time.perf_counter()
+        loadSoldSeats(state, service)
+        batched = time.perf_counter() - start
+
+    scale = extrapolateTo / seats
+    for name, seconds in (('ticketIsAvailable() per seat', perSeat), ('soldSeats() batches', batched),
+                          ('build()', built)):
+        print('%-30s %d seats in %7.2fs, %9.0f seats/s, %8.0fs for %d seats' % (
+            name, seats, seconds, seats / seconds, seconds * scale, extrapolateTo))
+
+
+def main():
+    seats = int(os.environ.get('SEATS', SEATS))
+    workers = int(os.environ.get('WORKERS', WORKERS))
+    directory = tempfile.mkdtemp(prefix='seatstate-')
+    path = os.path.join(directory, 'seats.bin')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    writeFile(path, seats)
+    coldStart(path, workers, env)
+    chainBaseline(int(os.environ.get('CHAIN_SEATS', CHAIN_SEATS)), seats, directory)
@@ -0,0 +1,51 @@
+"""
+Gas per event of withdrawFunds against withdrawFundsBatch, and gas per platform of
+withdrawFees against withdrawFeesBatch, for 1, 10 and 100 events/platforms with sold tickets.
+
+    brownie run bench_settlement
+"""
+from brownie import accounts
+
+from scripts.benchmark_setup import deployTicketing
+
+SIZES = [1, 10, 100]
+PRICE = 100
+FEES = 500
+
+
+def sellEvents(events, token, owner, count, platID=1):
+    eventIDs = []
+    for _ in range(count):
+        tx = events.createEventWithSections(platID, 0, 0, [1], [PRICE], {'from': owner})
+        token.approve(events.address, 2 * PRICE, {'from': owner})
+        events.buyTicketsBatchWithTokens(tx.return_value, [1], [1], {'from': owner})
+        eventIDs.append(tx.return_value)
+    return eventIDs
+
+
+def report(name, count, gasUsed):
+    print('%-18s %4d  %9d gas  %7d gas/item' % (name, count, gasUsed, gasUsed // count))
+
+
+def main():
+    owner = accounts[0]
+    deployed = deployTicketing(users=[owner], basicPointFees=FEES)
+    events, token, master = deployed['events'], deployed['token'], deployed['master']
+
+    for count in SIZES:
+        eventIDs = sellEvents(events, token, owner, count)
+        report('withdrawFunds', count, sum(events.withdrawFunds(e, {'from': owner}).gas_used for e in eventIDs))
+        eventIDs = sellEvents(events, token, owner, count)
+        report('withdrawFundsBatch', count, events.withdrawFundsBatch(eventIDs, {'from': owner}).gas_used)
+
+    platIDs = [deployed['platID']]
+    while len(platIDs) < max(SIZES):
+        tx = master.registerPlatform(deployed['resolver'].address, token.address, 2**16 - 1, {'from': owner})
+        platIDs.append(tx.return_value)
+    for count in SIZES:
+        for platID in platIDs[:count]:
+            sellEvents(events, token, owner, 1, platID)
+        report('withdrawFees', count, sum(events.withdrawFees(p, {'from': owner}).gas_used for p in platIDs[:count]))
+        for platID in platIDs[:count]:
+            sellEvents(events, token, owner, 1, platID)
+        report('withdrawFeesBatch', count, events.withdrawFeesBatch(platIDs[:count], {'from': owner}).gas_used)
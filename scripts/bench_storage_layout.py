@@ -0,0 +1,38 @@
+"""
+Gas of the event storage writes and of the views read on every purchase.
+View figures are eth_estimateGas, so they include the 21000 intrinsic gas.
+
+    brownie run bench_storage_layout
+"""
+from brownie import accounts
+
+from scripts.benchmark_setup import deployTicketing
+
+PRICE = 100
+SIZE = 20
+
+
+def main():
+    owner = accounts[0]
+    deployed = deployTicketing(users=[owner])
+    events, token = deployed['events'], deployed['token']
+
+    txev = events.createEvent(1, 0, 0, {'from': owner})
+    eventID = txev.return_value
+    txsec = events.addSection(eventID, SIZE, PRICE, {'from': owner})
+    sectionID = txsec.return_value
+    txsec2 = events.addSection(eventID, SIZE, PRICE, {'from': owner})
+    token.approve(events.address, PRICE, {'from': owner})
+    txbuy = events.buyTicketWithTokens(eventID, sectionID, 1, {'from': owner})
+
+    for name, gasUsed in [
+            ('createEvent', txev.gas_used),
+            ('addSection (1st)', txsec.gas_used),
+            ('addSection (2nd)', txsec2.gas_used),
+            ('buyTicketWithTokens', txbuy.gas_used),
+            ('existsEvent', events.existsEvent.estimate_gas(eventID)),
+            ('numberOfSections', events.numberOfSections.estimate_gas(eventID)),
+            ('sectionSize', events.sectionSize.estimate_gas(eventID, sectionID)),
+            ('sectionPrice', events.sectionPrice.estimate_gas(eventID, sectionID)),
+            ('sectionFee', events.sectionFee.estimate_gas(eventID, sectionID))]:
+        print('%-20s %7d' % (name, gasUsed))
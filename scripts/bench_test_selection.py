@@ -0,0 +1,57 @@
+"""
+Wall time of `brownie test` for a single test, a subset and whole modules, optionally against
+the same selections on a baseline revision checked out in a temporary git worktree. Run it
+outside brownie, each selection starts its own ganache:
+
+    python scripts/bench_test_selection.py          # current tree
+    python scripts/bench_test_selection.py HEAD~1   # and the baseline revision
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SELECTIONS = [
+    ('single projection test', ['tests/test_events.py::test_get_ticket_id_good']),
+    ('single gas test', ['tests/test_events.py::test_gas_used_withdraw_funds']),
+    ('withdraw subset', ['tests/test_events.py', '-k', 'withdraw']),
+    ('identity module', ['tests/test_identity.py']),
+    ('events module', ['tests/test_events.py']),
+]
+
+
+def timeSelections(directory):
+    times = {}
+    for name, args in SELECTIONS:
+        start = time.time()
+        result = subprocess.run(['brownie', 'test'] + args, cwd=directory, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        times[name] = (time.time() - start, result.returncode)
+    return times
+
+
+def main(baseline=None):
+    current = timeSelections(os.getcwd())
+    before = {}
+    if baseline:
+        directory = tempfile.mkdtemp()
+        worktree = os.path.join(directory, 'baseline')
+        subprocess.run(['git', 'worktree', 'add', '--detach', worktree, baseline], check=True)
+        try:
+            before = timeSelections(worktree)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', worktree])
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print('%-24s %12s %12s' % ('selection', 'baseline s', 'current s'))
+    for name, _ in SELECTIONS:
+        seconds, code = current[name]
+        baseSeconds, baseCode = before.get(name, (0.0, 0))
+        print('%-24s %12s %12s' % (name, '%.1f%s' % (baseSeconds, '' if not baseCode else ' (failed)') if before else '-',
+                                   '%.1f%s' % (seconds, '' if not code else ' (failed)')))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
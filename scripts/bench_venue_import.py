@@ -0,0 +1,49 @@
+"""
+Setup of a 300-section venue from a per-seat CSV seat map with the venue importer
+(createEventWithSections + addSectionsBatch chunks) against createEvent plus one
+addSection per section.
+
+    brownie run bench_venue_import
+"""
+import os
+import tempfile
+import time
+
+from brownie import accounts
+
+from nftsets.venue import importVenue, iterSections, readSeatMap
+from scripts.benchmark_setup import deployTicketing
+
+SECTIONS = 300
+SECTION_SIZE = 200
+PRICE = 100
+
+
+def writeSeatMap(path):
+    with open(path, 'w', newline='') as f:
+        f.write('section,row,seat,price\n')
+        for section in range(SECTIONS):
+            for seat in range(SECTION_SIZE):
+                f.write('Zone %d,%d,%d,%d\n' % (section, seat // 20, seat % 20, PRICE + section))
+
+
+def report(name, txs, elapsed):
+    print('%-22s %4d txs  %9d gas  %6.2fs' % (name, len(txs), sum(tx.gas_used for tx in txs), elapsed))
+
+
+def main():
+    owner = accounts[0]
+    events = deployTicketing(users=[owner])['events']
+    path = os.path.join(tempfile.mkdtemp(), 'venue.csv')
+    writeSeatMap(path)
+
+    start = time.time()
+    eventID, names, txs = importVenue(events, owner, path, 0, 0)
+    report('importer (batched)', txs, time.time() - start)
+    assert events.numberOfSections(eventID) == SECTIONS
+
+    start = time.time()
+    txs = [events.createEvent(1, 0, 0, {'from': owner})]
+    for _, size, price in iterSections(readSeatMap(path)):
+        txs.append(events.addSection(txs[0].return_value, size, price, {'from': owner}))
+    report('createEvent+addSection', txs, time.time() - start)
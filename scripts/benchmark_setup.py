@@ -0,0 +1,44 @@
+"""
+Deployment shared by the benchmark scripts, same contracts as the tests fixtures.
+"""
+from brownie import accounts, DefaultIdentityResolverService, IdentityMasterService, SimpleToken, EventMasterService, PurchaseChecks
+
+from secret_keys_testing_to_hex import getGanacheAccountsHex
+
+ALL_PERMISSIONS = 0x7
+MAX_SEATS = 2**16 - 1
+EXPIRY_DATE = 2000000000
+# Chain id of the permit signatures domain, any value as long as signers use the same.
+CHAIN_ID = 1337
+
+
+def deployTicketing(owner=None, users=None, maxSeats=MAX_SEATS, basicPointFees=0, basicPointGaslessPremium=0):
+    """
+    Deploys resolver, token, identity master and event service, registers platform #1 and
+    gives all permissions to `users` (all the local accounts by default). The PurchaseChecks
+    library is deployed once and shared by the event services of later calls.
+    """
+    owner = owner or accounts[0]
+    resolver = owner.deploy(DefaultIdentityResolverService)
+    token = owner.deploy(SimpleToken, CHAIN_ID)
+    master = owner.deploy(IdentityMasterService)
+    master.registerPlatform(resolver.address, token.address, maxSeats, {'from': owner})
+    if len(PurchaseChecks) == 0:
+        owner.deploy(PurchaseChecks)
+    events = owner.deploy(EventMasterService, master.address, basicPointFees, basicPointGaslessPremium)
+    for account in (users if users is not None else accounts):
+        resolver.newIdentity(account, ALL_PERMISSIONS, {'from': owner})
+    return {'resolver': resolver, 'token': token, 'master': master, 'events': events, 'platID': 1}
+
+
+def createEventWithSection(events, owner, size, price):
+    """
+    Creates an event on sale now with one section, returns (eventID, sectionID).
+    """
+    tx = events.createEvent(1, 0, 0, {'from': owner})
+    txsec = events.addSection(tx.return_value, size, price, {'from': owner})
+    return tx.return_value, txsec.return_value
+
+
+def privateKeys():
+    return [k['secretKey'] for k in getGanacheAccountsHex()]
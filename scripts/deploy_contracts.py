@@ -1,5 +1,6 @@
 ir = accounts[0].deploy(DefaultIdentityResolverService)
+tk = accounts[0].deploy(SimpleToken, 1337)
 im = accounts[0].deploy(IdentityMasterService)
-im.registerPlatform(ir.address,{'from': accounts[0]})
-es = accounts[0].deploy(EventMasterService, im.address)
-import time; time.sleep(10**6)
+im.registerPlatform(ir.address, tk.address, 2**16 - 1, {'from': accounts[0]})
+accounts[0].deploy(PurchaseChecks)
+es = accounts[0].deploy(EventMasterService, im.address, 0, 0)
@@ -0,0 +1,38 @@
+"""
+Writes the ABIs of the compiled contracts, with function selectors and event topics, to the
+bundled nftsets/client/abis.json of the client. Run it after changing a contract interface.
+
+    brownie run export_client_abis
+"""
+import json
+
+from brownie import web3, EventMasterService, IdentityMasterService, DefaultIdentityResolverService
+
+from nftsets.client.abi import ABIS_PATH
+
+
+def signature(item):
+    return '%s(%s)' % (item['name'], ','.join(i['type'] for i in item['inputs']))
+
+
+def clientAbi(abi):
+    functions, events = [], []
+    for item in abi:
+        if item['type'] == 'function':
+            functions.append({'type': 'function', 'name': item['name'], 'stateMutability': item['stateMutability'],
+                              'inputs': [{'name': i['name'], 'type': i['type']} for i in item['inputs']],
+                              'outputs': [{'name': o['name'], 'type': o['type']} for o in item['outputs']],
+                              'selector': '0x' + bytes(web3.keccak(text=signature(item))[:4]).hex()})
+        elif item['type'] == 'event':
+            events.append({'type': 'event', 'name': item['name'],
+                           'inputs': [{'name': i['name'], 'type': i['type'], 'indexed': i['indexed']}
+                                      for i in item['inputs']],
+                           'topic': '0x' + bytes(web3.keccak(text=signature(item))).hex()})
+    return sorted(functions, key=lambda f: f['name']) + sorted(events, key=lambda e: e['name'])
+
+
+def main():
+    abis = {c._name: clientAbi(c.abi) for c in (EventMasterService, IdentityMasterService, DefaultIdentityResolverService)}
+    with open(ABIS_PATH, 'w') as f:
+        json.dump(abis, f, indent=1, sort_keys=True)
+    print('Wrote %s' % ABIS_PATH)
@@ -0,0 +1,45 @@
+"""
+Opcode level gas profile of the purchase paths: buyTicketWithTokens(), a batch of 4 seats with
+buyTicketsBatchWithTokens() and the same batch as a feeless meta-transaction. Prints the gas per
+function, source line and external call, and writes one folded stacks file per path to
+GAS_PROFILE_DIR (gas-profiles by default), for flamegraph.pl or speedscope.
+
+    brownie run gas_profile
+"""
+import os
+
+from brownie import accounts, web3
+
+from nftsets.gasprofile import GasProfiler
+from nftsets.signer import FeelessSigner
+from scripts.benchmark_setup import deployTicketing, createEventWithSection, privateKeys, EXPIRY_DATE
+
+PRICE = 100
+
+
+def main():
+    directory = os.environ.get('GAS_PROFILE_DIR', 'gas-profiles')
+    os.makedirs(directory, exist_ok=True)
+    owner, buyer, relayer = accounts[0], accounts[1], accounts[2]
+    deployed = deployTicketing(users=[owner, buyer])
+    events, token = deployed['events'], deployed['token']
+    token.transfer(buyer, 10 * PRICE, {'from': owner})
+    token.approve(events.address, 10 * PRICE, {'from': buyer})
+    eventID, sectionID = createEventWithSection(events, owner, 20, PRICE)
+    signer = FeelessSigner(privateKeys()[1], events.address, lambda lane: events.getNonce(buyer, lane))
+
+    txs = {'buyTicketWithTokens': events.buyTicketWithTokens(eventID, sectionID, 1, {'from': buyer}),
+           'buyTicketsBatchWithTokens': events.buyTicketsBatchWithTokens(eventID, [sectionID] * 4, [2, 3, 4, 5],
+                                                                         {'from': buyer})}
+    abiData, nonce, signature = signer.sign('buyTicketsBatchWithTokens', ['uint32', 'uint16[]', 'uint16[]'],
+                                            [eventID, [sectionID] * 4, [6, 7, 8, 9]], EXPIRY_DATE)
+    txs['performFeelessTransaction'] = events.performFeelessTransaction(buyer.address, events.address, abiData, nonce,
+                                                                        EXPIRY_DATE, signature, {'from': relayer})
+
+    profiler = GasProfiler(web3, [deployed[name] for name in ('resolver', 'token', 'master', 'events')])
+    for name, tx in txs.items():
+        print('\n== %s ==' % name)
+        profile = profiler.profile(tx)
+        profile.printReport()
+        profile.writeFolded(os.path.join(directory, name + '.folded'))
+    print('\nFolded stacks written to %s' % directory)
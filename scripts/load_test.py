@@ -0,0 +1,66 @@
+"""
+On-sale load test: buyers rush the sections of one event with direct and feeless purchases.
+
+    brownie run load_test              # the 10 ganache accounts of ganache-accounts.json
+    brownie run load_test generated    # GENERATED_BUYERS new keys, funded and registered first
+
+Change WORKLOAD to shape the rush (skew, seats per order, meta-tx ratio, concurrency).
+"""
+from brownie import accounts
+from eth_account import Account
+
+from nftsets.loadtest import Workload, generateOrders, runLoad, LoadReport
+from scripts.benchmark_setup import deployTicketing, privateKeys, ALL_PERMISSIONS, EXPIRY_DATE
+
+WORKLOAD = Workload(orders=1000, sections=4, sectionSize=500, popularitySkew=1.2,
+                    batchSizes={1: 0.5, 2: 0.3, 4: 0.2}, metaTxRatio=0.3, concurrency=16)
+GENERATED_BUYERS = 200
+PRICE = 100
+BUYER_ETHER = '1 ether'
+
+
+def buyerTokens(orders, buyers):
+    """
+    Tokens each buyer index needs to pay all its orders, the event has no fees.
+    """
+    tokens = [0] * buyers
+    for order in orders:
+        tokens[order.buyer] += len(order.seatIDs) * PRICE
+    return tokens
+
+
+def fundBuyers(deployed, owner, buyers, tokens, register):
+    token, events = deployed['token'], deployed['events']
+    for buyer, amount in zip(buyers, tokens):
+        if register:
+            deployed['resolver'].newIdentity(buyer, ALL_PERMISSIONS, {'from': owner})
+            owner.transfer(buyer, BUYER_ETHER)
+        if buyer != owner:
+            token.transfer(buyer, amount, {'from': owner})
+        token.approve(events.address, amount, {'from': buyer})
+
+
+def run(buyers, keys, relayers, deployed, owner, register):
+    events = deployed['events']
+    orders = generateOrders(WORKLOAD, len(buyers))
+    # Funded from the orders, so no purchase fails on balance or allowance.
+    fundBuyers(deployed, owner, buyers, buyerTokens(orders, len(buyers)), register)
+    sizes = [WORKLOAD.sectionSize] * WORKLOAD.sections
+    eventID = events.createEventWithSections(1, 0, 0, sizes, [PRICE] * WORKLOAD.sections, {'from': owner}).return_value
+    results, elapsed = runLoad(events, eventID, orders, buyers, keys, relayers, WORKLOAD.concurrency, EXPIRY_DATE)
+    LoadReport(results, elapsed).printReport()
+
+
+def main():
+    owner = accounts[0]
+    deployed = deployTicketing(owner)
+    buyers = list(accounts)
+    run(buyers, privateKeys(), buyers, deployed, owner, register=False)
+
+
+def generated():
+    owner = accounts[0]
+    deployed = deployTicketing(owner)
+    keys = [Account.create().key.hex() for _ in range(GENERATED_BUYERS)]
+    buyers = [accounts.add(key) for key in keys]
+    run(buyers, keys, list(accounts[:10]), deployed, owner, register=True)
@@ -0,0 +1,44 @@
+"""
+Records a fixed on-sale workload to a JSON Lines trace: deployment, identities, funding,
+an event with sections, load-test purchases (direct and feeless, sent one at a time so
+the trace keeps chain order) and the funds withdrawal. Replay it with replay_trace.
+
+    TRACE=workload-trace.jsonl brownie run record_trace
+"""
+import os
+
+from brownie import accounts, DefaultIdentityResolverService, IdentityMasterService, SimpleToken, EventMasterService, PurchaseChecks
+
+from nftsets.loadtest import Workload, generateOrders, runLoad
+from nftsets.trace import TraceRecorder
+from scripts.benchmark_setup import privateKeys, ALL_PERMISSIONS, CHAIN_ID, EXPIRY_DATE, MAX_SEATS
+
+TRACE_PATH = 'workload-trace.jsonl'
+WORKLOAD = Workload(orders=300, sections=4, sectionSize=200, metaTxRatio=0.3, concurrency=1)
+PRICE = 100
+
+
+def main():
+    recorder = TraceRecorder(os.environ.get('TRACE', TRACE_PATH))
+    owner = accounts[0]
+    resolver = recorder.deploy(owner, DefaultIdentityResolverService)
+    token = recorder.deploy(owner, SimpleToken, CHAIN_ID)
+    master = recorder.deploy(owner, IdentityMasterService)
+    master.registerPlatform(resolver.address, token.address, MAX_SEATS, {'from': owner})
+    recorder.deploy(owner, PurchaseChecks)
+    events = recorder.deploy(owner, EventMasterService, master.address, 0, 0)
+
+    buyers = list(accounts)
+    for buyer in buyers:
+        resolver.newIdentity(buyer.address, ALL_PERMISSIONS, {'from': owner})
+        if buyer != owner:
+            token.transfer(buyer.address, 100 * PRICE, {'from': owner})
+        token.approve(events.address, 100 * PRICE, {'from': buyer})
+
+    sizes = [WORKLOAD.sectionSize] * WORKLOAD.sections
+    eventID = events.createEventWithSections(1, 0, 0, sizes, [PRICE] * WORKLOAD.sections, {'from': owner}).return_value
+    orders = generateOrders(WORKLOAD, len(buyers))
+    runLoad(events, eventID, orders, buyers, privateKeys(), buyers, WORKLOAD.concurrency, EXPIRY_DATE)
+    events.withdrawFundsBatch([eventID], {'from': owner})
+    recorder.close()
+    print('Recorded %d records to %s' % (recorder.seq, recorder.file.name))
@@ -0,0 +1,26 @@
+"""
+Replays a trace recorded by record_trace on a fresh chain and prints gas and send time per
+function. The report is saved to REPORT; if BASELINE points to the report of another build
+replaying the same trace, both are compared. Start the chain with the same accounts as the
+recording so senders and contract addresses (signed in meta-transactions) match.
+
+    TRACE=workload-trace.jsonl REPORT=new.json BASELINE=old.json brownie run replay_trace
+"""
+import os
+
+from brownie import web3, DefaultIdentityResolverService, IdentityMasterService, SimpleToken, EventMasterService, PurchaseChecks
+
+from nftsets.trace import replayTrace, GasReport, compareReports
+
+TRACE_PATH = 'workload-trace.jsonl'
+REPORT_PATH = 'workload-report.json'
+
+
+def main():
+    containers = {c._name: c for c in (DefaultIdentityResolverService, IdentityMasterService, SimpleToken, PurchaseChecks, EventMasterService)}
+    report = replayTrace(os.environ.get('TRACE', TRACE_PATH), containers, web3)
+    report.printReport()
+    report.save(os.environ.get('REPORT', REPORT_PATH))
+    if os.environ.get('BASELINE'):
+        print()
+        compareReports(GasReport.load(os.environ['BASELINE']), report)
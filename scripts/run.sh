@@ -1,3 +1,10 @@
 #!/bin/bash
 
-cat ./scripts/deploy_contracts.py | brownie console
+# Starts ganache with the test accounts, deploys the contracts to it and keeps it running.
+ganache-cli --port 8545 --gasLimit 6721975 --accounts 10 --hardfork petersburg --mnemonic brownie --acctKeys ./ganache-accounts.json > ganache.log &
+GANACHE=$!
+trap "kill $GANACHE" EXIT
+until (echo > /dev/tcp/127.0.0.1/8545) 2>/dev/null; do sleep 0.5; done
+brownie compile
+python -m nftsets.deploy --rpc http://127.0.0.1:8545 --manifest deployments/development.json
+wait $GANACHE
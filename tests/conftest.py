@@ -0,0 +1,77 @@
+"""
+Gas profiling of the tests transactions, see nftsets/gasprofile.py.
+
+Tests marked with @pytest.mark.gas_profile print the gas profile of their
+transactions. `brownie test --gas-profile DIR` profiles every test and writes
+DIR/<test>.folded (flamegraph input) and DIR/<test>.txt (report).
+
+`brownie test --timing-report PREFIX` records the wall time of fixtures, tests
+and RPC requests, see nftsets/testtiming.py.
+
+`pytest tests --evm-backend pyevm` runs the tests on an in-process py-evm chain
+instead of ganache, see nftsets/evmbackend.py.
+"""
+import contextlib
+import io
+import os
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption('--gas-profile', metavar='DIR', default=None,
+                     help="profile the transactions of every test, write folded stacks and reports to DIR")
+    parser.addoption('--timing-report', metavar='PREFIX', default=None,
+                     help="time fixtures, tests and RPC requests, write PREFIX.json and PREFIX.csv")
+    parser.addoption('--timing-top', metavar='N', type=int, default=10,
+                     help="slowest fixtures, tests and RPC methods shown by --timing-report")
+    parser.addoption('--evm-backend', choices=('ganache', 'pyevm'), default='ganache',
+                     help="chain the tests run on: the ganache process or an in-process py-evm")
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'gas_profile: print the gas profile of the transactions of the test')
+    prefix = config.getoption('--timing-report')
+    if prefix is not None:
+        from nftsets.testtiming import SessionTiming
+        config.pluginmanager.register(SessionTiming(prefix, config.getoption('--timing-top')), 'session-timing')
+    # Before brownie connects, which is when it would launch ganache.
+    if config.getoption('--evm-backend') == 'pyevm':
+        from nftsets.evmbackend import createTester, attachBrownie
+        from secret_keys_testing_to_hex import getGanacheAccountsHex
+
+        attachBrownie(createTester([k['secretKey'] for k in getGanacheAccountsHex()]))
+
+
+# Requests fn_isolation so it is torn down, and traces the transactions, before the chain is reverted.
+# Tests that do not use the chain (no fn_isolation) are not profiled and do not need brownie.
+@pytest.fixture(autouse=True)
+def gas_profile(request):
+    directory = request.config.getoption('--gas-profile')
+    if 'fn_isolation' not in request.fixturenames or \
+            directory is None and request.node.get_closest_marker('gas_profile') is None:
+        yield
+        return
+    request.getfixturevalue('fn_isolation')
+    from brownie import history, web3
+    from nftsets.gasprofile import GasProfiler, GasProfile
+
+    first = len(history)
+    yield
+    # Contracts and containers among the test arguments are mapped to source.
+    contracts = [value for value in request.node.funcargs.values() if hasattr(value, '_build')]
+    profiler = GasProfiler(web3, contracts)
+    profile = GasProfile()
+    for tx in list(history)[first:]:
+        profile.merge(profiler.profile(tx))
+    if directory is None:
+        profile.printReport()
+        return
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.join(directory, request.node.name)
+    profile.writeFolded(name + '.folded')
+    report = io.StringIO()
+    with contextlib.redirect_stdout(report):
+        profile.printReport()
+    with open(name + '.txt', 'w') as f:
+        f.write(report.getvalue())
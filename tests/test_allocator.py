@@ -0,0 +1,26 @@
+import pytest
+
+from nftsets.allocator import SeatAllocator, SeatsUnavailable
+
+# Off-chain holds on distinct seats, without a chain.
+def test_seat_allocator_holds():
+    now = [0]
+    allocator = SeatAllocator({1: 600, 2: 5}, sold=[(2, 2)], holdSeconds=10, stripeSize=256, clock=lambda: now[0])
+    hold = allocator.hold(2, 4)
+    assert hold.seatIDs == [1, 3, 4, 5]
+    with pytest.raises(SeatsUnavailable):
+        allocator.hold(2, 1)
+    # Expired holds are given to the next buyer, releasing them afterwards is a no-op.
+    now[0] = 11
+    assert allocator.hold(2, 2).seatIDs == [1, 3]
+    allocator.release(hold)
+    assert allocator.available(2) == 2
+    # Holds spanning several stripes never share a seat.
+    holds = [allocator.hold(1, 50) for _ in range(12)]
+    seats = [seat for h in holds for seat in h.seatIDs]
+    assert len(seats) == len(set(seats)) == 600
+    with pytest.raises(SeatsUnavailable):
+        allocator.hold(1, 1)
+    allocator.confirm(holds[0])
+    allocator.release(holds[1])
+    assert allocator.available(1) == 50
@@ -0,0 +1,62 @@
+import os
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from nftsets.analytics import ParquetPart, currentOwners, eventRanges, arrowSchema
+
+# Owners of the tickets computed from hand-written tickets and transfers parts, without a chain.
+BUYER = '0x' + '11'*20
+OTHER = '0x' + '22'*20
+THIRD = '0x' + '33'*20
+
+def writePart(directory, table, name, rows):
+    part = ParquetPart(os.path.join(directory, table, name), table)
+    for row in rows:
+        part.append(row)
+    part.close()
+    return table + '/' + name
+
+def ticketRow(block, logIndex, eventID, seatID, buyer):
+    ticketID = (eventID << 32) | (1 << 16) | seatID
+    return (block, block, '0x' + '00'*32, logIndex, ticketID, eventID, 1, seatID, buyer, 100)
+
+def transferRow(block, logIndex, eventID, seatID, sender, recipient):
+    ticketID = (eventID << 32) | (1 << 16) | seatID
+    return (block, block, '0x' + '00'*32, logIndex, ticketID, eventID, 1, seatID, sender, sender, recipient, 1)
+
+def test_event_ranges():
+    # A single event larger than a pass is one range.
+    assert eventRanges({1: 3, 2: 2, 3: 1, 5: 4}, 4) == [(1, 1), (2, 3), (5, 5)]
+    assert eventRanges({3: 1, 1: 1}, 10) == [(1, 3)]
+    assert eventRanges({}, 10) == []
+
+def test_current_owners(tmp_path):
+    directory = str(tmp_path)
+    manifest = {'parts': {
+        'tickets': [writePart(directory, 'tickets', 'a.parquet', [ticketRow(1, 0, 1, 1, BUYER), ticketRow(1, 1, 1, 2, BUYER),
+                                                                  ticketRow(2, 0, 2, 1, OTHER)]),
+                    writePart(directory, 'tickets', 'b.parquet', [ticketRow(5, 0, 3, 1, THIRD)])],
+        # Ticket 1 of event 1 moves twice in the same block, the highest logIndex wins.
+        'transfers': [writePart(directory, 'transfers', 'a.parquet', [transferRow(3, 0, 1, 1, BUYER, OTHER),
+                                                                      transferRow(3, 1, 1, 1, OTHER, THIRD),
+                                                                      transferRow(4, 0, 2, 1, OTHER, BUYER)])],
+    }}
+    expected = {(1 << 32) | 65537: THIRD, (1 << 32) | 65538: BUYER, (2 << 32) | 65537: BUYER, (3 << 32) | 65537: THIRD}
+    for passRows in (1, 3, 100):
+        owners = currentOwners(directory, manifest, passRows=passRows)
+        assert {o['ticketID']: o['owner'] for o in owners.to_pylist()} == expected
+        assert owners.num_rows == 4
+    assert currentOwners(directory, {'parts': {}}).num_rows == 0
+
+def test_amounts_uint128(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    # The largest section price, and a purchase of a full section at that price.
+    price = 2**128 - 1
+    writePart(str(tmp_path), 'sections', 'a.parquet', [(1, 1, 65535, price, price // 20)])
+    writePart(str(tmp_path), 'purchases', 'a.parquet', [(1, 1, '0x' + '00'*32, 0, 1, BUYER, OTHER, 65535, 65535*price, 65535*price, 0)])
+    assert [int(row['price']) for row in pq.read_table(str(tmp_path / 'sections' / 'a.parquet')).to_pylist()] == [price]
+    purchase = pq.read_table(str(tmp_path / 'purchases' / 'a.parquet')).to_pylist()[0]
+    assert int(purchase['paid']) == int(purchase['price']) == 65535*price
+    with pytest.raises(pa.ArrowInvalid):
+        pa.array([10**76], type=arrowSchema('sections').field('price').type)
@@ -28,15 +28,16 @@ MISSING_GROUP_ID = 2**40
 MISSING_IDENTITY_ID = 2**45
 MISSING_PLATFORM_ID = 2**50
 EXAMPLE_MAX_SEATS = 50
+EXAMPLE_CHAIN_ID = 1337
 
 # fixtures
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="module")
 def identity_resolver(DefaultIdentityResolverService, accounts):
     ir = accounts[0].deploy(DefaultIdentityResolverService)
     yield ir
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="module")
 def identity_resolver_complex(DefaultIdentityResolverService, accounts):
     ir = accounts[0].deploy(DefaultIdentityResolverService)
     txid1 = ir.newIdentity( accounts[-1], 0x3, {'from': accounts[0]})
@@ -45,29 +46,29 @@ def identity_resolver_complex(DefaultIdentityResolverService, accounts):
     txid2 = ir.newIdentity( accounts[-2], 0x3, {'from': accounts[0]})
     _ = ir.registerAddress( txid2.return_value, accounts[-3], {'from': accounts[0]})
     txid3 = ir.newIdentity( accounts[-4], 0x3, {'from': accounts[0]})
-    _ = ir.registerAddress( txid3.return_value, accounts[-4], {'from': accounts[0]})
+    _ = ir.registerAddress( txid3.return_value, accounts[-6], {'from': accounts[0]})
     txg2 = ir.newGroup( txid2.return_value, {'from': accounts[0]})
     _ = ir.registerAddress( txid3.return_value, accounts[-5], {'from': accounts[0]})
     _ = ir.addToGroup( txg2.return_value, txid3.return_value, {'from': accounts[0]})
     yield ir
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="module")
 def simple_token(SimpleToken, accounts):
-    im = accounts[0].deploy(SimpleToken)
+    im = accounts[0].deploy(SimpleToken, EXAMPLE_CHAIN_ID)
     yield im
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="module")
 def identity_master(IdentityMasterService, accounts):
     im = accounts[0].deploy(IdentityMasterService)
     yield im
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="module")
 def identity_master_complex(IdentityMasterService, accounts, identity_resolver, simple_token):
     im = accounts[0].deploy(IdentityMasterService)
     _ = im.registerPlatform( identity_resolver.address, simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
     yield im
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="module")
 def zero_address():
     yield brownie.convert.to_address("0x"+"0"*40)
 
@@ -248,6 +249,10 @@ def test_new_identity_badinput(identity_resolver, accounts, zero_address):
     with pytest.reverts("Zero-account address(0) address not allowed."):
         identity_resolver.newIdentity( zero_address, 0, {'from': accounts[0]})
     
+def test_new_identity_badinput2(identity_resolver, accounts):
+    with pytest.reverts("Permissions must fit in 128 bits."):
+        identity_resolver.newIdentity( accounts[0], 2**128, {'from': accounts[0]})
+
 def test_new_identity_notowner(identity_resolver, accounts):
     with pytest.reverts("Only contract owner can do this operation."):
         identity_resolver.newIdentity( accounts[1], 0, {'from': accounts[1]})
@@ -255,6 +260,8 @@ def test_new_identity_notowner(identity_resolver, accounts):
 def test_new_identity_gasusedlimit(identity_resolver, accounts):
     tx = identity_resolver.newIdentity( accounts[0], 0, {'from': accounts[0]})
     assert tx.gas_used < MAX_GAS_USED_PER_TX
+    # One identity word and the reverse mapping, no address array.
+    assert tx.gas_used < 80000
 
 
 # existsIdentity
@@ -292,14 +299,40 @@ def test_register_address_badinput2(identity_resolver, accounts, zero_address):
     with pytest.reverts("Zero-account address(0) address not allowed."):
         identity_resolver.registerAddress( tx.return_value, zero_address, {'from': accounts[0]})
     
+def test_register_address_twice(identity_resolver, accounts):
+    tx = identity_resolver.newIdentity( accounts[0], 0, {'from': accounts[0]})
+    identity_resolver.registerAddress( tx.return_value, accounts[1], {'from': accounts[0]})
+    with pytest.reverts("Address has been registered before."):
+        identity_resolver.registerAddress( tx.return_value, accounts[1], {'from': accounts[0]})
+    with pytest.reverts("Address has been registered before."):
+        identity_resolver.registerAddress( tx.return_value, accounts[0], {'from': accounts[0]})
+    assert identity_resolver.addressCount( tx.return_value ) == 2
+
 def test_register_address_notowner(identity_resolver, accounts):
     with pytest.reverts("Only contract owner can do this operation."):
         identity_resolver.registerAddress( 0, accounts[1], {'from': accounts[1]})
     
 def test_register_address_gasusedlimit(identity_resolver, accounts):
     tx = identity_resolver.newIdentity( accounts[0], 0x3, {'from': accounts[0]})
-    tx = identity_resolver.registerAddress( tx.return_value, accounts[0], {'from': accounts[0]})
+    tx = identity_resolver.registerAddress( tx.return_value, accounts[1], {'from': accounts[0]})
     assert tx.gas_used < MAX_GAS_USED_PER_TX
+    # The address count shares the identity word, only the reverse mapping is a new slot.
+    assert tx.gas_used < 60000
+
+# addressCount
+def test_address_count_good(identity_resolver, accounts):
+    tx = identity_resolver.newIdentity( accounts[0], 0x3, {'from': accounts[0]})
+    assert identity_resolver.addressCount( tx.return_value ) == 1
+    txreg = identity_resolver.registerAddress( tx.return_value, accounts[1], {'from': accounts[0]})
+    _ = identity_resolver.registerAddress( tx.return_value, accounts[2], {'from': accounts[0]})
+    assert identity_resolver.addressCount( tx.return_value ) == 3
+    assert identity_resolver.resolvePermissions( tx.return_value ) == 0x3
+    assert txreg.events['AddressRegistered']['identity'] == tx.return_value
+    assert txreg.events['AddressRegistered']['addr'] == accounts[1]
+
+def test_address_count_bad(identity_resolver, accounts):
+    with pytest.reverts("Account has not been registered before."):
+        identity_resolver.addressCount( MISSING_IDENTITY_ID )
 
 # newGroup
 def test_new_group_good(identity_resolver, accounts):
@@ -384,9 +417,60 @@ def test_register_platform_notowner(identity_master, identity_resolver, accounts
     with pytest.reverts("Only contract owner can do this operation."):
         _ = identity_master.registerPlatform( identity_resolver.address, simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[1]})
 
+def test_register_platform_badinput3(identity_master, identity_resolver, accounts, simple_token):
+    with pytest.reverts("Max seats per event must fit in 64 bits."):
+        _ = identity_master.registerPlatform( identity_resolver.address, simple_token.address, 2**64, {'from': accounts[0]})
+
 def test_register_platform_gasusedlimit(identity_master, accounts, simple_token):
     tx = identity_master.registerPlatform( accounts[0], simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
     assert tx.gas_used < MAX_GAS_USED_PER_TX
+    # Two slots of PlatformRecord instead of four mappings (4 x 20000 gas).
+    assert tx.gas_used < 85000
+
+# registerPlatformClone
+def test_register_platform_clone_good(identity_master, identity_resolver, accounts, simple_token, DefaultIdentityResolverService):
+    tx = identity_master.registerPlatformClone( identity_resolver.address, accounts[1], simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
+    platID, resolver = tx.return_value
+    assert tx.events['ResolverCloned']['resolver'] == resolver
+    assert identity_master.getPlatform( platID ) == (resolver, simple_token.address, EXAMPLE_MAX_SEATS, True)
+    clone = DefaultIdentityResolverService.at(resolver)
+    assert clone.owner() == accounts[1]
+    txid = clone.newIdentity( accounts[2], 0x1, {'from': accounts[1]})
+    assert txid.return_value == 1
+    assert identity_master.resolveIdentityOnPlatform( platID, accounts[2]) == 1
+    assert identity_master.canBuyTicketOnPlatform( platID, 1) == True
+    # The clone has its own storage.
+    assert identity_resolver.existsAddress( accounts[2]) == False
+
+def test_register_platform_clone_notowner(identity_master, identity_resolver, accounts, simple_token):
+    with pytest.reverts("Only contract owner can do this operation."):
+        _ = identity_master.registerPlatformClone( identity_resolver.address, accounts[1], simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[1]})
+
+def test_register_platform_clone_badinput1(identity_master, accounts, simple_token):
+    with pytest.reverts("Resolver implementation must be a contract."):
+        _ = identity_master.registerPlatformClone( accounts[2], accounts[1], simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
+
+def test_register_platform_clone_initialize_bad(identity_master, identity_resolver, accounts, simple_token, DefaultIdentityResolverService):
+    tx = identity_master.registerPlatformClone( identity_resolver.address, accounts[1], simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
+    with pytest.reverts("Resolver has been initialized before."):
+        DefaultIdentityResolverService.at(tx.return_value[1]).initialize( accounts[2], {'from': accounts[2]})
+    with pytest.reverts("Resolver has been initialized before."):
+        identity_resolver.initialize( accounts[2], {'from': accounts[2]})
+
+def test_register_platform_clone_gasusedlimit(identity_master, identity_resolver, accounts, simple_token):
+    tx = identity_master.registerPlatformClone( identity_resolver.address, accounts[1], simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
+    # 45 bytes of clone code, three initialized slots and the platform record, instead of a ~1M gas resolver deploy.
+    assert tx.gas_used < 200000
+
+# getPlatform
+def test_get_platform_good(identity_master, identity_resolver, accounts, simple_token):
+    tx = identity_master.registerPlatform( identity_resolver.address, simple_token.address, EXAMPLE_MAX_SEATS, {'from': accounts[0]})
+    assert identity_master.getPlatform( tx.return_value ) == (identity_resolver.address, simple_token.address, EXAMPLE_MAX_SEATS, True)
+    _ = identity_master.deregisterPlatform( tx.return_value, {'from': accounts[0]})
+    assert identity_master.getPlatform( tx.return_value ) == (identity_resolver.address, simple_token.address, EXAMPLE_MAX_SEATS, False)
+
+def test_get_platform_bad(identity_master, zero_address):
+    assert identity_master.getPlatform( MISSING_PLATFORM_ID ) == (zero_address, zero_address, 0, False)
 
 # deregisterPlatform
 def test_deregister_platform_true(identity_master, identity_resolver, accounts, simple_token):
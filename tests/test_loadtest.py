@@ -0,0 +1,13 @@
+from nftsets.loadtest import Workload, generateOrders
+
+# On-sale load test orders, without a chain.
+def test_load_test_orders():
+    workload = Workload(orders=500, sections=2, sectionSize=50, batchSizes={1: 0.5, 3: 0.5}, metaTxRatio=0.5)
+    orders = generateOrders(workload, 3)
+    assert orders == generateOrders(workload, 3)
+    assert all(len(o.seatIDs) in (1, 3) and 1 <= o.seatIDs[0] and o.seatIDs[-1] <= 50 for o in orders)
+    assert all(o.sectionIDs[0] in (1, 2) and o.buyer in (0, 1, 2) for o in orders)
+    assert {o.kind for o in orders} == {'direct', 'feeless'}
+    # Skewed popularity, the first seat is the most wanted.
+    firstSeats = [o.seatIDs[0] for o in orders]
+    assert max(set(firstSeats), key=firstSeats.count) == 1
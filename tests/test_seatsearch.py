@@ -0,0 +1,16 @@
+from nftsets.seatsearch import SectionSeats
+
+# Best available adjacent seats search, without a chain.
+def test_seat_search_section():
+    section = SectionSeats(1, [True]*20, rowLength=10)
+    # Equal scores keep seat order.
+    assert [run.firstSeatID for run in section.bestRuns(3, limit=4)] == [4, 5, 3, 6]
+    section.markSold([4, 5, 6])
+    assert [run.seatIDs for run in section.bestRuns(3, limit=2)] == [[7, 8, 9], [1, 2, 3]]
+    # Runs never cross rows.
+    assert section.bestRuns(10)[0].seatIDs == list(range(11, 21))
+    assert section.bestRuns(11) == []
+    # Seats 1 and 3 sold in the indexer bitmap.
+    section = SectionSeats.fromBitmap(2, bytes([0b101]), 10, rowLength=5)
+    assert list(section.free) == [False, True, False] + [True]*7
+    assert section.bestRuns(2)[0].seatIDs == [4, 5]
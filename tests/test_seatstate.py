@@ -0,0 +1,35 @@
+import os
+import pytest
+
+from nftsets.allocator import SeatAllocator
+from nftsets.seatsearch import SectionSeats
+from nftsets.seatstate import SeatState, SeatStateError, create
+
+# Memory-mapped seat-state file, without a chain.
+def test_seat_state_file(tmp_path):
+    path = str(tmp_path / 'seats.bin')
+    create(path, '0x' + '12'*20, [(2,1,10), (1,2,100), (1,1,17)], lastBlock=5)
+    with SeatState(path, writable=True) as state:
+        assert state.sections() == [(1,1,17), (1,2,100), (2,1,10)]
+        assert state.markSold(1, 2, [1, 9, 100, 9]) == 3
+        assert state.markSold(1, 2, [9, 50]) == 1
+        # soldSeats() words of seats 9-16 of section 1.
+        state.mergeBitmap(1, 1, 9, bytes([0b11]))
+        state.setLastBlock(42)
+        with pytest.raises(SeatStateError):
+            state.markSold(1, 1, [18])
+    state = SeatState(path)
+    assert (state.lastBlock, state.address) == (42, '0x' + '12'*20)
+    assert state.soldSeatIDs(1, 2) == [1, 9, 50, 100] and state.soldCount(1, 2) == 4
+    assert state.soldSeatIDs(1, 1) == [9, 10] and state.sections(2) == [(2,1,10)]
+    assert state.isAvailable(1, 2, 51) and not state.isAvailable(1, 2, 50)
+    assert not state.hasSection(3, 1)
+    section = SectionSeats.fromBitmap(2, state.bitmap(1, 2), 100)
+    assert [seatID for seatID in range(1, 101) if not section.free[seatID - 1]] == [1, 9, 50, 100]
+    assert SeatAllocator.fromSeatState(state, 1).available(2) == 96
+    # A new file replaces the old one, readers map it again.
+    assert state.reopen() == False
+    create(path + '.new', '0x' + '12'*20, [(1,1,17)])
+    os.replace(path + '.new', path)
+    assert state.reopen() == True and state.totals() == (17, 0)
+    state.close()
@@ -0,0 +1,32 @@
+import pytest
+
+from nftsets.signer import encodeABI, packSeats, packSeatRanges, seatsToRanges, calldataGas
+
+# testing parameters
+
+EXAMPLE_BIG_QUANTITY = 200
+EX_EXPIRY_DATE = 2000000000
+
+# Seat packers and calldata gas, without a chain.
+def test_seats_to_ranges_bad():
+    # Duplicates revert in the batch path, ranges must not silently buy fewer seats.
+    with pytest.raises(ValueError):
+        seatsToRanges([1,1,2], [3,3,3])
+    with pytest.raises(ValueError):
+        seatsToRanges([1,1], [3])
+
+@pytest.mark.parametrize("seats", [10, 100, 500])
+def test_calldata_gas_packed_seats(seats):
+    sectionIDs = [1 + i // EXAMPLE_BIG_QUANTITY for i in range(seats)]
+    seatIDs = [1 + i % EXAMPLE_BIG_QUANTITY for i in range(seats)]
+    abiData = encodeABI('buyTicketsBatchWithTokens', ['uint32','uint16[]','uint16[]'], [1, sectionIDs, seatIDs])
+    packedData = encodeABI('buyTicketsPackedWithTokens', ['uint32','bytes'], [1, packSeats(sectionIDs, seatIDs)])
+    rangesData = encodeABI('buyTicketRangesPackedWithTokens', ['uint32','bytes'], [1, packSeatRanges(seatsToRanges(sectionIDs, seatIDs))])
+    assert len(packedData) < len(abiData)
+    assert calldataGas(packedData) < calldataGas(abiData)
+    assert calldataGas(rangesData) < calldataGas(packedData)
+    # Nested in a meta-transaction the padding is paid again.
+    mtxTypes = ['address','address','bytes','uint256','uint256','bytes']
+    mtxValues = lambda data: ['0x'+'11'*20, '0x'+'22'*20, data, 1, EX_EXPIRY_DATE, b'\x33'*65]
+    assert calldataGas(encodeABI('performFeelessTransaction', mtxTypes, mtxValues(packedData))) < \
+        calldataGas(encodeABI('performFeelessTransaction', mtxTypes, mtxValues(abiData)))
@@ -0,0 +1,20 @@
+import pytest
+
+from nftsets.venue import iterSections, readSeatMap, chunkSections, VenueLayoutError
+
+# Seat maps streamed from CSV/JSON and chunked to the gas limit, without a chain.
+def test_venue_import_sections_json(tmp_path):
+    path = str(tmp_path / 'venue.json')
+    with open(path, 'w') as f:
+        f.write('{"sections": [{"section": "A", "size": 100, "price": 5}, {"section": "B", "size": 50, "price": 7}]}')
+    assert list(iterSections(readSeatMap(path))) == [('A', 100, 5), ('B', 50, 7)]
+    assert [len(c) for c in chunkSections([('A', 1, 1)]*300)] == [228, 72]
+
+def test_venue_import_bad(tmp_path):
+    path = str(tmp_path / 'venue.jsonl')
+    with open(path, 'w') as f:
+        f.write('{"section": "A", "price": 5}\n{"section": "B", "price": 5}\n{"section": "A", "price": 5}\n')
+    with pytest.raises(VenueLayoutError):
+        list(iterSections(readSeatMap(path)))
+    with pytest.raises(VenueLayoutError):
+        list(iterSections([{'section': 'A', 'price': 5}, {'section': 'A', 'price': 6}]))